@@ -0,0 +1,60 @@
+"""
+Running aggregates against keeping every result.
+
+Run with ``python -m benchmarks.bench_aggregate``. Throws an exploding
+expression in batches and, for growing numbers of throws, reports the time
+and peak memory to summarise them two ways: keeping every result and
+recomputing mean, variance and quantiles at the end, and feeding each batch
+to a RollAggregator as it arrives.
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from dice_roller.DiceStats import RollAggregator
+from dice_roller.DiceThrower import DiceThrower
+
+EXPRESSION = '3d6x>=6'
+BATCH = 10_000
+SIZES = [10_000, 100_000, 500_000]
+
+
+def keep_all(dice, count):
+    kept = []
+    rng = random.Random(1)
+    for _ in range(count // BATCH):
+        kept.extend(dice.throw_many(EXPRESSION, BATCH, rng=rng))
+    totals = sorted(result.total for result in kept)
+    return statistics.fmean(totals), statistics.pvariance(totals), totals[len(totals) // 2]
+
+
+def aggregate(dice, count):
+    aggregator = RollAggregator()
+    rng = random.Random(1)
+    for _ in range(count // BATCH):
+        aggregator.add_many(dice.throw_many(EXPRESSION, BATCH, rng=rng))
+    summary = aggregator.summary()
+    return summary['mean'], summary['variance'], summary['percentiles'][50]
+
+
+def measure(run, dice, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    run(dice, count)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2 ** 20
+
+
+def main():
+    dice = DiceThrower()
+    print(f'{"throws":>8} {"keep all (s)":>13} {"peak MiB":>9} {"aggregate (s)":>14} {"peak MiB":>9}')
+    for count in SIZES:
+        old_seconds, old_peak = measure(keep_all, dice, count)
+        new_seconds, new_peak = measure(aggregate, dice, count)
+        print(f'{count:8,} {old_seconds:13.2f} {old_peak:9.1f} {new_seconds:14.2f} {new_peak:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
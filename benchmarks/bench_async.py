@@ -0,0 +1,76 @@
+"""
+Latency benchmark for the asyncio API.
+
+Run with ``python -m benchmarks.bench_async``. Measures p50/p99 latency of
+``athrow('1d20')`` on an idle loop and while heavy analyses run: awaited
+through DiceAsync with a thread or process pool, or called synchronously on
+the loop for comparison. Under the GIL a thread pool still slows the loop down a
+little; a process pool takes the heavy work off this interpreter entirely.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import time
+from dice_roller.DiceAsync import DiceAsync
+
+HEAVY = [('amonte_carlo', '10d6x>=5', 50_000), ('aanalyze', '6d6kh3', None)]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, len(ordered) * q // 100)] * 1000
+
+
+async def plain_rolls(dice, until, latencies):
+    # a roll requested every millisecond; latency runs from the request to the result
+    while not until.done():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        await dice.athrow('1d20')
+        latencies.append(time.perf_counter() - start - 0.001)
+
+
+async def heavy_async(dice):
+    for name, dexp, samples in HEAVY:
+        method = getattr(dice, name)
+        await (method(dexp, samples) if samples else method(dexp))
+
+
+async def heavy_blocking(dice):
+    await asyncio.sleep(0.01)
+    for name, dexp, samples in HEAVY:
+        await asyncio.sleep(0)
+        if samples:
+            dice.probability.monte_carlo(dexp, samples)
+        else:
+            dice.probability.analyze(dexp)
+
+
+async def measure(make_heavy, executor=None):
+    dice = DiceAsync(executor=executor, inline_enumeration=10_000)
+    latencies = []
+    heavy = asyncio.ensure_future(make_heavy(dice))
+    await plain_rolls(dice, heavy, latencies)
+    return latencies
+
+
+async def idle():
+    await asyncio.sleep(1)
+
+
+def main():
+    print(f'{"background":26} {"p50 (ms)":>9} {"p99 (ms)":>9} {"max (ms)":>9}')
+    with ProcessPoolExecutor(max_workers=2) as processes:
+        runs = [
+            ('idle', lambda dice: idle(), None),
+            ('DiceAsync, threads', heavy_async, None),
+            ('DiceAsync, processes', heavy_async, processes),
+            ('blocking calls', heavy_blocking, None),
+        ]
+        results = [(name, asyncio.run(measure(make_heavy, executor))) for name, make_heavy, executor in runs]
+    for name, latencies in results:
+        print(f'{name:26} {percentile(latencies, 50):9.2f} {percentile(latencies, 99):9.2f} '
+              f'{max(latencies) * 1000:9.2f}')
+
+
+if __name__ == '__main__':
+    main()
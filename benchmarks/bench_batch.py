@@ -0,0 +1,40 @@
+"""
+Throughput benchmark: NumPy batch rolling against throwing in a loop.
+
+Run with ``python -m benchmarks.bench_batch``. Reports throws per second for
+``DiceThrower.throw`` called in a loop and for ``DiceRoller.roll_batch``.
+"""
+import time
+from dice_roller.DiceParser import DiceParser
+from dice_roller.DiceRoller import DiceRoller
+from dice_roller.DiceThrower import DiceThrower
+
+EXPRESSIONS = ['3d6', '4d6kh3', '10d6x>=6', '20d10r<2>=7', '6d6xxp>=6kl3']
+
+
+def loop_rate(expression, throws=20_000):
+    dice = DiceThrower()
+    start = time.perf_counter()
+    for _ in range(throws):
+        dice.throw(expression)
+    return throws / (time.perf_counter() - start)
+
+
+def batch_rate(expression, trials=1_000_000):
+    plan = DiceParser().compile(expression)
+    roller = DiceRoller()
+    roller.roll_batch(plan, 10, rng=0)
+    start = time.perf_counter()
+    roller.roll_batch(plan, trials, rng=0)
+    return trials / (time.perf_counter() - start)
+
+
+def main():
+    print(f'{"expression":20} {"loop/s":>12} {"batch/s":>14} {"speedup":>9}')
+    for expression in EXPRESSIONS:
+        loop, batch = loop_rate(expression), batch_rate(expression)
+        print(f'{expression:20} {loop:12,.0f} {batch:14,.0f} {batch / loop:8.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Per-call cost of safe_compare and safe_arithmetic, compiled and not.
+
+Run with ``python -m benchmarks.bench_compare``. For each operator, reports
+nanoseconds per call of the pre-compile implementation (operator lookup and
+operand conversion on every call, kept here for comparison), of the
+``safe_*`` wrappers as they are now (a memoized compile per call), and of a
+closure from ``compile_*`` called directly.
+"""
+import time
+from fractions import Fraction
+from dice_roller.safe_compare import (
+    ARITHMETIC_OPERATORS, COMPARISON_OPERATORS, _to_number, compile_arithmetic, compile_comparison,
+    safe_arithmetic, safe_compare,
+)
+
+COUNT = 200_000
+VALUES = list(range(1, 21)) * (COUNT // 20)
+
+
+def uncompiled_compare(left, op_str, right):
+    op_str = str(op_str).strip()
+    if op_str not in COMPARISON_OPERATORS:
+        raise ValueError(f"Invalid comparison operator: {op_str!r}")
+    return COMPARISON_OPERATORS[op_str](_to_number(left), _to_number(right))
+
+
+def uncompiled_arithmetic(left, op_str, right):
+    op_str = str(op_str).strip()
+    if op_str not in ARITHMETIC_OPERATORS:
+        raise ValueError(f"Invalid arithmetic operator: {op_str!r}")
+    left_val, right_val = _to_number(left), _to_number(right)
+    if op_str == '/':
+        return Fraction(left_val, right_val)
+    return ARITHMETIC_OPERATORS[op_str](left_val, right_val)
+
+
+def ns_per_call(run):
+    start = time.perf_counter()
+    run()
+    return (time.perf_counter() - start) / COUNT * 1e9
+
+
+def report(op, uncompiled, wrapper, compiled):
+    old = ns_per_call(lambda: [uncompiled(value, op, 10) for value in VALUES])
+    wrapped = ns_per_call(lambda: [wrapper(value, op, 10) for value in VALUES])
+    compiled = compiled(op, 10)
+    new = ns_per_call(lambda: [compiled(value) for value in VALUES])
+    print(f'{op:>3} {old:12.0f} {wrapped:11.0f} {new:13.0f} {old / new:7.1f}x')
+
+
+def main():
+    print(f'{"op":>3} {"before (ns)":>12} {"safe_* (ns)":>11} {"compiled (ns)":>13} {"speedup":>8}')
+    for op in ('>=', '<', '=', '!='):
+        report(op, uncompiled_compare, safe_compare, compile_comparison)
+    for op in ('+', '*', '/'):
+        report(op, uncompiled_arithmetic, safe_arithmetic, compile_arithmetic)
+
+
+if __name__ == '__main__':
+    main()
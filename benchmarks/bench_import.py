@@ -0,0 +1,52 @@
+"""
+Cold-start benchmark: cumulative import time of the package entry points.
+
+Run with ``python -m benchmarks.bench_import``. Each module is imported in a
+fresh interpreter under ``python -X importtime``; the best of several runs is
+reported. The test suite enforces IMPORT_BUDGET_RATIO for the throwing path.
+"""
+import subprocess
+import sys
+
+# ``import dice_roller.DiceThrower`` may take at most this share of ``import
+# pyparsing`` (the cost it defers), both measured on the same machine at the
+# same time, so the budget follows the machine's speed and load
+IMPORT_BUDGET_RATIO = 1.0
+
+MODULES = [
+    'dice_roller',
+    'dice_roller.DiceThrower',
+    'dice_roller.DiceProbability',
+    'pyparsing',
+]
+
+
+def import_time_us(module, runs=5):
+    """Best cumulative import time of module in a fresh interpreter, in microseconds."""
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                              capture_output=True, text=True, check=True)
+        for line in proc.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == module:
+                cumulative = int(fields[1])
+                best = cumulative if best is None else min(best, cumulative)
+    return best
+
+
+def import_time_ratio(module, reference='pyparsing'):
+    """Import time of module as a share of reference's."""
+    return import_time_us(module) / import_time_us(reference)
+
+
+def main():
+    print(f'{"module":32} {"cumulative (ms)":>16}')
+    for module in MODULES:
+        print(f'{module:32} {import_time_us(module) / 1000:16.2f}')
+    print(f'dice_roller.DiceThrower / pyparsing: {import_time_ratio("dice_roller.DiceThrower"):.2f} '
+          f'(budget {IMPORT_BUDGET_RATIO:.2f})')
+
+
+if __name__ == '__main__':
+    main()
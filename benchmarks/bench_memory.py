@@ -0,0 +1,36 @@
+"""
+Memory benchmark: legacy result dicts against compact RollResults.
+
+Run with ``python -m benchmarks.bench_memory``. Keeps ``COUNT`` results of
+each kind alive and reports the bytes per result traced by tracemalloc.
+"""
+import gc
+import tracemalloc
+from dice_roller.DiceThrower import DiceThrower
+
+COUNT = 20_000
+EXPRESSIONS = ['3d6', '10d6>=5f<=1', '20d10kh5']
+
+
+def bytes_per_result(make, count=COUNT):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [make() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results
+    return (after - before) / count
+
+
+def main():
+    dice = DiceThrower(rng=0)
+    print(f'{"expression":16} {"dict (B)":>10} {"RollResult (B)":>15} {"saving":>7}')
+    for expression in EXPRESSIONS:
+        legacy = bytes_per_result(lambda: dice.throw(expression))
+        compact = bytes_per_result(lambda: dice.throw_result(expression))
+        print(f'{expression:16} {legacy:10.0f} {compact:15.0f} {1 - compact / legacy:6.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Scaling of parallel Monte Carlo runs.
+
+Run with ``python -m benchmarks.bench_monte_carlo``. Times one seeded
+``monte_carlo`` run of an exploding expression with 1, 2, 4, ... workers up
+to the number of cores, and checks every run gives the same distribution.
+"""
+import os
+import time
+from dice_roller.DiceProbability import DiceProbability
+
+EXPRESSION = '10d6x>=5kh5'
+SAMPLES = 400_000
+SEED = 2024
+
+
+def main():
+    prob = DiceProbability()
+    cores = os.cpu_count() or 1
+    counts = sorted({1, cores} | {2 ** i for i in range(1, cores.bit_length()) if 2 ** i < cores})
+    print(f'{EXPRESSION}, {SAMPLES:,} samples, {cores} cores')
+    print(f'{"workers":>7} {"seconds":>8} {"samples/s":>11} {"speedup":>8}')
+    reference = base = None
+    for workers in counts:
+        start = time.perf_counter()
+        stats = prob.monte_carlo(EXPRESSION, samples=SAMPLES, seed=SEED, workers=workers)
+        seconds = time.perf_counter() - start
+        base = base or seconds
+        if reference is None:
+            reference = stats['distribution']
+        assert stats['distribution'] == reference, 'results differ between worker counts'
+        print(f'{workers:7} {seconds:8.2f} {SAMPLES / seconds:11,.0f} {base / seconds:7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
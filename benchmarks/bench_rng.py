@@ -0,0 +1,50 @@
+"""
+RNG backend benchmark: draw throughput of each backend.
+
+Run with ``python -m benchmarks.bench_rng``. Reports single d10 draws per
+second through ``randint`` and full 200d10 rolls per second through
+``DiceRoller.roll`` for each backend.
+"""
+import random
+import time
+from dice_roller.DiceParser import DiceParser
+from dice_roller.DiceRandom import NumpyRandom, PerThreadRandom
+from dice_roller.DiceRoller import DiceRoller
+
+
+def backends():
+    yield 'random (global)', random
+    yield 'random.Random', random.Random(0)
+    yield 'PerThreadRandom', PerThreadRandom()
+    try:
+        yield 'NumpyRandom', NumpyRandom(0)
+        yield 'PerThreadRandom(Numpy)', PerThreadRandom(NumpyRandom)
+    except ImportError:
+        pass
+
+
+def draw_rate(rng, draws=500_000):
+    randint = rng.randint
+    start = time.perf_counter()
+    for _ in range(draws):
+        randint(1, 10)
+    return draws / (time.perf_counter() - start)
+
+
+def roll_rate(rng, rolls=2_000):
+    plan = DiceParser().compile('200d10')
+    roller = DiceRoller(rng=rng)
+    start = time.perf_counter()
+    for _ in range(rolls):
+        roller.roll(plan)
+    return rolls / (time.perf_counter() - start)
+
+
+def main():
+    print(f'{"backend":24} {"draws/s":>14} {"200d10 rolls/s":>16}')
+    for name, rng in backends():
+        print(f'{name:24} {draw_rate(rng):14,.0f} {roll_rate(rng):16,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Per-die cost of DiceRoller.roll_die.
+
+Run with ``python -m benchmarks.bench_roll``. Compares drawing the pool one
+``Die.roll()`` at a time (how roll_die used to work) with the bulk draw
+roll_die now makes, in nanoseconds per die.
+"""
+import time
+from dice_roller.DiceParser import DiceParser
+from dice_roller.DiceRoller import DiceRoller
+from dice_roller.Die import Die
+
+EXPRESSIONS = ['200d10', '200d10+1', '200d10r<2', '200d10r<=9', '200d10x>=10', '200d{1,2,3,5,8}']
+
+
+def per_die_loop(number, sides, plan):
+    """Draw and finish each die separately through Die, as roll_die used to."""
+    die = Die(sides)
+    natural, modified = [], []
+
+    def face():
+        die.roll()
+        roll = first = die.showing
+        if plan.r is not None:
+            while plan.r.compare(roll, plan.r.val):
+                die.roll()
+                roll = die.showing
+        if plan.b is not None:
+            roll = plan.b.apply(roll, plan.b.val)
+        return first, roll
+
+    for _ in range(number):
+        first, roll = face()
+        natural.append(first)
+        modified.append(roll)
+        while plan.x is not None and plan.x.compare(roll, plan.x.val):
+            _, roll = face()
+            modified.append(roll)
+    return {'natural': natural, 'modified': modified}
+
+
+def ns_per_die(roll, plan, repeats=500):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        roll(plan.number_of_dice, plan.sides, plan)
+    return (time.perf_counter() - start) / (repeats * plan.number_of_dice) * 1e9
+
+
+def main():
+    parser, roller = DiceParser(), DiceRoller()
+    print(f'{"expression":18} {"per die (ns)":>13} {"bulk (ns)":>10} {"speedup":>8}')
+    for expression in EXPRESSIONS:
+        plan = parser.compile(expression)
+        before = ns_per_die(per_die_loop, plan)
+        after = ns_per_die(roller.roll_die, plan)
+        print(f'{expression:18} {before:13.0f} {after:10.0f} {before / after:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
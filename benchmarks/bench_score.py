@@ -0,0 +1,44 @@
+"""
+Scoring cost: DiceScorer.score against a separate pass per counter.
+
+Run with ``python -m benchmarks.bench_score``. Rolls each expression once
+and reports microseconds to score it with ``score`` (each list read once)
+and with ``get_roll_total`` plus one ``get_count`` per counter, as scoring
+used to work.
+"""
+import time
+from dice_roller.DiceScorer import DiceScorer
+from dice_roller.DiceThrower import DiceThrower
+
+COUNT = 20_000
+EXPRESSIONS = ['200d10>=7f1ns10nf1', '100d6>=5f1', '10d6>=5', '4d6kh3', '1d20']
+
+
+def multi_pass(scorer, result, plan):
+    total = scorer.get_roll_total(result['modified'], plan)
+    return (total, scorer.get_count(result['modified'], 's', plan),
+            scorer.get_count(result['modified'], 'f', plan) if plan.f is not None else None,
+            scorer.get_count(result['natural'], 'nf', plan) if plan.nf is not None else None,
+            scorer.get_count(result['natural'], 'ns', plan) if plan.ns is not None else None)
+
+
+def us_per_call(call):
+    start = time.perf_counter()
+    for _ in range(COUNT):
+        call()
+    return (time.perf_counter() - start) / COUNT * 1e6
+
+
+def main():
+    dice, scorer = DiceThrower(rng=0), DiceScorer()
+    print(f'{"expression":20} {"passes (us)":>12} {"score (us)":>11} {"speedup":>8}')
+    for expression in EXPRESSIONS:
+        plan = dice.plan(expression)
+        _, result = dice.roll(plan)
+        old = us_per_call(lambda: multi_pass(scorer, result, plan))
+        new = us_per_call(lambda: scorer.score(result, plan))
+        print(f'{expression:20} {old:12.1f} {new:11.1f} {old / new:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
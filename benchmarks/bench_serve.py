@@ -0,0 +1,74 @@
+"""
+Load test for the local roll service.
+
+Run with ``python -m benchmarks.bench_serve``. Starts ``python -m
+dice_roller.serve`` on a free localhost port in a child process, then opens
+CONNECTIONS keep-alive connections that each send REQUESTS throws, and reports
+requests per second and client-side latency percentiles, followed by the
+server's own /health counters (how many throws each batch held).
+"""
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+CONNECTIONS = 50
+REQUESTS = 200
+EXPRESSIONS = ['1d20', '4d6kh3', '10d6>=5', '3d6']
+
+
+async def call(reader, writer, path, body=None):
+    payload = b'' if body is None else json.dumps(body).encode()
+    method = 'GET' if body is None else 'POST'
+    writer.write(f'{method} {path} HTTP/1.1\r\nContent-Length: {len(payload)}\r\n\r\n'.encode() + payload)
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while (line := await reader.readline()) != b'\r\n':
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+
+async def client(port, index, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for i in range(REQUESTS):
+        start = time.perf_counter()
+        await call(reader, writer, '/throw', {'expression': EXPRESSIONS[(index + i) % len(EXPRESSIONS)]})
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def load(port):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, i, latencies) for i in range(CONNECTIONS)))
+    seconds = time.perf_counter() - start
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    health = await call(reader, writer, '/health')
+    writer.close()
+    return latencies, seconds, health
+
+
+def main():
+    server = subprocess.Popen([sys.executable, '-m', 'dice_roller.serve', '--port', '0'],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(server.stdout.readline().rsplit(':', 1)[1])
+        latencies, seconds, health = asyncio.run(load(port))
+    finally:
+        server.terminate()
+        server.wait()
+
+    ordered = sorted(latencies)
+    n = len(ordered)
+    print(f'{n:,} throws over {CONNECTIONS} connections in {seconds:.2f}s: {n / seconds:,.0f} requests/s')
+    print('latency (ms): ' + ', '.join(f'p{q} {ordered[min(n - 1, n * q // 100)] * 1000:.1f}' for q in (50, 90, 99))
+          + f', max {ordered[-1] * 1000:.1f}')
+    print(f'{health["batches"]:,} batches, {health["batched_throws"] / max(health["batches"], 1):.1f} throws each')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Per-item cost of DiceThrower.stream against repeated throw() calls.
+
+Run with ``python -m benchmarks.bench_stream``. Reports microseconds per
+throw for ``throw`` in a loop, for ``stream`` yielding RollResults and for
+``stream`` yielding only totals, plus the peak memory traced while streaming.
+"""
+import itertools
+import time
+import tracemalloc
+from dice_roller.DiceThrower import DiceThrower
+
+COUNT = 50_000
+EXPRESSIONS = ['1d20', '4d6kh3', '10d6>=5', '20d10x>=10kh5']
+
+
+def us_per_item(items, count=COUNT):
+    start = time.perf_counter()
+    for _ in itertools.islice(items, count):
+        pass
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def peak_kib(items, count=COUNT):
+    tracemalloc.start()
+    for _ in itertools.islice(items, count):
+        pass
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    dice = DiceThrower(rng=0)
+    print(f'{"expression":16} {"throw (us)":>11} {"stream":>8} {"totals":>8} {"peak KiB":>9}')
+    for expression in EXPRESSIONS:
+        loop = us_per_item(dice.throw(expression) for _ in itertools.count())
+        stream = us_per_item(dice.stream(expression))
+        totals = us_per_item(dice.stream(expression, only='total'))
+        peak = peak_kib(dice.stream(expression))
+        print(f'{expression:16} {loop:11.1f} {stream:8.1f} {totals:8.1f} {peak:9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Throughput of one shared DiceThrower across threads.
+
+Run with ``python -m benchmarks.bench_threads``. Throws a mix of expressions
+from 1, 2, 4 and 8 threads sharing one thrower (with a PerThreadRandom), and
+once more building a new DiceThrower per throw as callers had to before
+throwers were reentrant. With the GIL the threads take turns, so throughput
+stays flat; on a free-threaded build it should grow with the number of cores.
+"""
+import sys
+import threading
+import time
+from dice_roller.DiceRandom import PerThreadRandom
+from dice_roller.DiceThrower import DiceThrower
+
+THROWS = 40_000
+EXPRESSIONS = ['1d20', '4d6kh3', '10d6>=5f<=1', '20d10x>=10kh5', '1d20=+1d4']
+
+
+def throws_per_second(threads, throw):
+    per_thread = THROWS // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def run():
+        barrier.wait()
+        for i in range(per_thread):
+            throw(EXPRESSIONS[i % len(EXPRESSIONS)])
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    gil = sys._is_gil_enabled() if hasattr(sys, '_is_gil_enabled') else True
+    print(f'GIL {"enabled" if gil else "disabled"}')
+    shared = DiceThrower(rng=PerThreadRandom())
+    print(f'{"threads":>7} {"shared (throws/s)":>18} {"scaling":>8} {"new per throw":>14}')
+    base = None
+    for threads in (1, 2, 4, 8):
+        rate = throws_per_second(threads, shared.throw_result)
+        base = base or rate
+        fresh = throws_per_second(threads, lambda dexp: DiceThrower().throw_result(dexp))
+        print(f'{threads:7} {rate:18,.0f} {rate / base:7.2f}x {fresh:14,.0f}')
+
+
+if __name__ == '__main__':
+    main()
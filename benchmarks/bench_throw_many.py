@@ -0,0 +1,32 @@
+"""
+Per-throw cost of DiceThrower.throw_many against looping DiceThrower.throw.
+
+Run with ``python -m benchmarks.bench_throw_many``. Reports microseconds per
+throw for a loop of ``throw``, a loop of ``throw_result`` and one
+``throw_many`` call.
+"""
+import time
+from dice_roller.DiceThrower import DiceThrower
+
+COUNT = 20_000
+EXPRESSIONS = ['1d20', '4d6kh3', '10d6>=5f<=1', '20d10x>=10kh5', '1d20=+1d4']
+
+
+def us_per_throw(run, count=COUNT):
+    start = time.perf_counter()
+    run(count)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    dice = DiceThrower(rng=0)
+    print(f'{"expression":16} {"throw (us)":>11} {"throw_result":>13} {"throw_many":>11} {"speedup":>8}')
+    for expression in EXPRESSIONS:
+        loop = us_per_throw(lambda n: [dice.throw(expression) for _ in range(n)])
+        loop_result = us_per_throw(lambda n: [dice.throw_result(expression) for _ in range(n)])
+        many = us_per_throw(lambda n: dice.throw_many(expression, n))
+        print(f'{expression:16} {loop:11.1f} {loop_result:13.1f} {many:11.1f} {loop / many:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+asyncio front end for throwing and analysis.
+
+Cheap work (ordinary throws, small exact analyses) runs inline on the event
+loop, where it costs less than a hop to another thread. Anything the cost
+model says is heavy is sent to an executor, at most ``max_concurrent`` jobs
+at a time, so a big analysis never blocks the loop and plain rolls keep
+their latency.
+
+Executor jobs are module-level functions that build their own thrower or
+analyzer from the limits, so a ``ProcessPoolExecutor`` works as well as a
+thread pool. Monte Carlo runs are split into chunks, and cancelling the
+awaiting task stops the run between chunks.
+"""
+import asyncio
+from collections import Counter
+from functools import partial
+from dice_roller.DiceCost import Limits, estimate_analysis, estimate_throw
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceProbability import SHARD_SAMPLES, DiceProbability, shard_seed
+from dice_roller.DiceThrower import DiceThrower
+
+
+def _throw(limits, dexp):
+    return DiceThrower(limits=limits).throw(dexp)
+
+
+def _throw_string(limits, deq):
+    return DiceThrower(limits=limits).throw_string(deq)
+
+
+def _analyze(limits, dexp):
+    return DiceProbability(limits=limits).analyze(dexp)
+
+
+def _simulate(limits, dexp, samples, rng=None):
+    return DiceProbability(limits=limits).simulate(dexp, samples, rng=rng)
+
+
+def _release(semaphore, job):
+    if not job.cancelled():
+        # retrieved here, so a job whose caller went away doesn't log an unretrieved exception
+        job.exception()
+    semaphore.release()
+
+
+class DiceAsync:
+    """
+    Coroutine versions of DiceThrower and DiceProbability calls.
+
+    Args:
+        limits: Limits shared by inline and executor work
+        executor: concurrent.futures executor for heavy work (the loop's
+            default thread pool if None)
+        max_concurrent: Most heavy jobs running at once; others wait their turn
+        inline_draws: Throws expected to draw at most this many dice run inline
+        inline_enumeration: Exact analyses enumerating at most this many
+            outcomes run inline
+        chunk_samples: Monte Carlo samples per executor job
+    """
+
+    def __init__(self, limits=None, executor=None, max_concurrent=4, inline_draws=2_000,
+                 inline_enumeration=50_000, chunk_samples=10_000):
+        self.limits = Limits() if limits is None else limits
+        self.executor = executor
+        self.max_concurrent = max_concurrent
+        self.inline_draws = inline_draws
+        self.inline_enumeration = inline_enumeration
+        self.chunk_samples = chunk_samples
+        self.thrower = DiceThrower(limits=self.limits)
+        self.probability = DiceProbability(limits=self.limits)
+        self._semaphore = None
+
+    @property
+    def semaphore(self):
+        # created on first use so it belongs to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    async def run_heavy(self, func, *args):
+        """
+        Run func(*args) in the executor once a concurrency slot is free.
+
+        The slot is held until the job itself finishes, not until the caller
+        stops waiting: a cancelled caller's job keeps running in the executor,
+        so it keeps counting against max_concurrent.
+        """
+        semaphore = self.semaphore
+        await semaphore.acquire()
+        try:
+            job = asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args))
+        except BaseException:
+            semaphore.release()
+            raise
+        job.add_done_callback(partial(_release, semaphore))
+        # shielded, so cancelling the caller doesn't mark the job done while it still runs
+        return await asyncio.shield(job)
+
+    def is_cheap_throw(self, plans):
+        try:
+            return sum(estimate_throw(plan).expected_draws for plan in plans) <= self.inline_draws
+        except (DiceException, ValueError):
+            # bad expressions fail fast inline
+            return True
+
+    async def athrow(self, dexp='1d1'):
+        """DiceThrower.throw, inline unless the roll is expected to be expensive."""
+        try:
+            plans = [self.thrower.plan(dexp)]
+        except DiceException:
+            plans = []
+        if self.is_cheap_throw(plans):
+            return self.thrower.throw(dexp)
+        return await self.run_heavy(_throw, self.limits, dexp)
+
+    async def athrow_string(self, deq):
+        """DiceThrower.throw_string, inline unless its terms are expected to be expensive."""
+        try:
+            plans = [term.plan for term in self.thrower.parser.compile_equation(deq).terms]
+        except DiceException:
+            plans = []
+        if self.is_cheap_throw(plans):
+            return self.thrower.throw_string(deq)
+        return await self.run_heavy(_throw_string, self.limits, deq)
+
+    async def aanalyze(self, dexp):
+        """
+        DiceProbability.analyze, in the executor when the enumeration is large.
+
+        Cancelling the caller stops waiting at once; the analysis finishes in
+        the background and holds its concurrency slot until it does.
+        """
+        try:
+            enumeration = estimate_analysis(self.probability.parser.parse_input(dexp)).enumeration
+        except DiceException:
+            enumeration = 0
+        if enumeration <= self.inline_enumeration:
+            return self.probability.analyze(dexp)
+        return await self.run_heavy(_analyze, self.limits, dexp)
+
+    async def amonte_carlo(self, dexp, samples=100000, seed=None):
+        """
+        DiceProbability.monte_carlo, simulated in executor chunks.
+
+        Chunks are queued one after another, so cancelling the caller stops
+        the run after the chunk in progress. With a seed the chunks are the
+        seeded shards monte_carlo uses, so the result matches
+        ``monte_carlo(dexp, samples, seed=seed)``.
+        """
+        self.limits.admit_monte_carlo(self.probability.parser.parse_input(dexp), samples)
+        size = self.chunk_samples if seed is None else SHARD_SAMPLES
+        results = Counter()
+        for index, start in enumerate(range(0, samples, size)):
+            rng = None if seed is None else shard_seed(seed, index)
+            results.update(await self.run_heavy(_simulate, self.limits, dexp, min(size, samples - start), rng))
+        stats = self.probability.monte_carlo_stats(dexp, results, samples)
+        if seed is not None:
+            stats['seed'] = seed
+        return stats
@@ -0,0 +1,239 @@
+"""
+Vectorized batch rolling with NumPy.
+
+``roll_batch`` rolls one compiled expression ``trials`` times at once. Faces
+are drawn for every die of every trial in a single Generator call, and the
+boost, reroll, explode and keep/drop steps run as array operations, looping
+only once per reroll or explosion round rather than once per die.
+
+NumPy is an optional dependency; it is imported when this module is loaded,
+which ``DiceRoller.roll_batch`` defers until the first batch.
+"""
+import numpy as np
+from dice_roller.DiceCost import estimate_throw
+from dice_roller.DiceException import DiceException
+from dice_roller.RollPlan import compile_plan
+
+# Most reroll rounds before a batch gives up
+MAX_ROUNDS = 1000
+
+
+def _at(value, index):
+    """A per-trial value (array) picked out for each die, or a plain value as-is."""
+    return value[index] if isinstance(value, np.ndarray) else value
+
+
+def _bind_subrolls(plan, trials, rng):
+    """Replace each Subroll with an array holding its value for every trial."""
+    bound = {'subrolls': ()}
+    for key in plan.subrolls:
+        node = getattr(plan, key)
+        value = np.full(trials, node.val.offset, dtype=np.int64)
+        for op, number, sides in node.val.terms:
+            result = rng.integers(1, sides + 1, size=(trials, number)).sum(axis=1)
+            value += -result if op == '=-' else result
+        bound[key] = node._replace(val=value)
+    return plan._replace(**bound)
+
+
+class _Dice:
+    """Draws faces and applies reroll and boost for a flat batch of dice."""
+
+    def __init__(self, plan, rng):
+        self.plan = plan
+        self.rng = rng
+        self.faces = np.asarray(plan.sides)
+
+    def draw(self, size):
+        return self.faces[self.rng.integers(0, len(self.faces), size=size)]
+
+    def roll(self, trial):
+        """Roll one die per entry of trial; returns (natural, modified before explosions)."""
+        plan = self.plan
+        natural = self.draw(trial.size)
+        value = natural.copy()
+
+        reroll = plan.r
+        if reroll is not None and not reroll.once and reroll.keep:
+            # one draw from the faces that don't match, however wide the reroll band
+            pending = np.flatnonzero(reroll.compare(value, reroll.val))
+            keep = np.asarray(reroll.keep)
+            value[pending] = keep[self.rng.integers(0, len(keep), size=pending.size)]
+        elif reroll is not None:
+            pending = np.flatnonzero(reroll.compare(value, _at(reroll.val, trial)))
+            rounds = 0
+            while pending.size:
+                rounds += 1
+                if rounds > MAX_ROUNDS:
+                    raise DiceException('Unable to perform roll', 'Reroll never finished')
+                value[pending] = self.draw(pending.size)
+                if reroll.once:
+                    break
+                still = reroll.compare(value[pending], _at(reroll.val, trial[pending]))
+                pending = pending[still]
+
+        boost = plan.b
+        if boost is not None:
+            if boost.operator == '/':
+                value = np.true_divide(value, _at(boost.val, trial))
+            else:
+                value = boost.apply(value, _at(boost.val, trial))
+
+        return natural, value
+
+    def explodes(self, value, trial):
+        return np.asarray(self.plan.x.compare(value, _at(self.plan.x.val, trial)), dtype=bool)
+
+
+def _explode(dice, trial, die, value, trials, max_chain, max_total_dice):
+    """
+    Roll explosion chains for every die that explodes.
+
+    Returns the flat (trial, die, depth, value) arrays of every modified entry
+    (the original dice at depth 0 and, unless the explosion compounds, each
+    extra die at the depth of its chain), then the per-trial explosion counts
+    and deepest chains. Like DiceRoller.roll_die, each trial may roll at most
+    max_total_dice dice, explosions included.
+    """
+    explode = dice.plan.x
+    explosions = np.zeros(trials, dtype=np.int64)
+    deepest = np.zeros(trials, dtype=np.int64)
+    penetrate = 1 if explode.penetrate else 0
+    trial_list, dies, depths, values = [trial], [die], [np.zeros(trial.size, dtype=np.int64)], [value]
+
+    active = np.flatnonzero(dice.explodes(value, trial))
+    depth = 0
+    while active.size:
+        depth += 1
+        chain_trial = trial[active]
+        explosions += np.bincount(chain_trial, minlength=trials)
+        deepest[chain_trial] = depth
+        if depth > max_chain:
+            raise DiceException('The dice have exploded out of control ruining everything', {
+                'reason': 'Explosion chain too long',
+                'explosions': int(explosions.sum()),
+                'deepest_chain': depth,
+            })
+        over = np.flatnonzero(dice.plan.number_of_dice + explosions > max_total_dice)
+        if over.size:
+            worst = over[0]
+            raise DiceException('The dice have exploded out of control ruining everything', {
+                'reason': 'Too many dice rolled',
+                'explosions': int(explosions[worst]),
+                'deepest_chain': int(deepest[worst]),
+            })
+        _natural, child = dice.roll(chain_trial)
+        again = dice.explodes(child, chain_trial)
+        if explode.compound:
+            values[0][active] += child - penetrate
+        else:
+            trial_list.append(chain_trial)
+            dies.append(die[active])
+            depths.append(np.full(active.size, depth, dtype=np.int64))
+            values.append(child - penetrate)
+        # indexes into the original dice, so compound totals and chain order both follow the parent
+        active = active[again]
+
+    return (np.concatenate(trial_list), np.concatenate(dies),
+            np.concatenate(depths), np.concatenate(values), explosions, deepest)
+
+
+def _rank(key):
+    """Position of each entry when its row is sorted by key (stable)."""
+    order = np.argsort(key, axis=1, kind='stable')
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(key.shape[1])[None, :], axis=1)
+    return rank
+
+
+def _select(modified, among, count, lowest):
+    """Mask of the count lowest (or highest) entries of each row, chosen from among."""
+    count = np.asarray(count)
+    values = modified.astype(float)
+    key = np.where(among, values if lowest else -values, np.inf)
+    limit = count[:, None] if count.ndim else count
+    return among & (_rank(key) < limit)
+
+
+def _keep_drop(plan, modified, valid):
+    kept = valid
+    if plan.k is not None:
+        kept = _select(modified, kept, plan.k.val, lowest=plan.k.layer == 'low')
+    if plan.d is not None:
+        remaining = kept.sum(axis=1) - plan.d.val
+        # dropping the lowest means keeping the highest of what is left
+        kept = _select(modified, kept, np.maximum(remaining, 0), lowest=plan.d.layer == 'high')
+    return kept
+
+
+def roll_batch(methods, trials, rng=None, max_chain=1000, max_total_dice=10_000):
+    """
+    Roll an expression many times at once.
+
+    Args:
+        methods: Parsed methods dict or RollPlan
+        trials: Number of independent throws
+        rng: numpy.random.Generator, or a seed for one (fresh entropy if None)
+        max_chain: Most extra dice one exploding die may add
+        max_total_dice: Most dice one trial may roll, explosions included
+
+    Returns:
+        dict: 'natural' (trials x dice) first faces rolled, as DiceRoller.roll
+        reports them; 'modified' (trials x width) each die after reroll, boost
+        and explosions, with extra exploded dice following the die that
+        caused them and rows padded to the longest; 'valid' marks the entries
+        that are real dice; 'kept' marks the entries kept by keep/drop.
+        Exploding rolls also report per-trial 'explosions' and 'deepest_chain'.
+        A '/' boost gives float results instead of Fractions.
+
+    Raises:
+        DiceException: If the roll can never finish, a chain runs away or a
+            trial rolls more than max_total_dice dice
+    """
+    plan = compile_plan(methods)
+    rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+    n = plan.number_of_dice
+    dice = _Dice(plan, rng)
+
+    if plan.types != 'int':
+        natural = dice.draw((trials, n))
+        valid = np.ones((trials, n), dtype=bool)
+        return {'natural': natural, 'modified': natural.copy(), 'valid': valid, 'kept': valid.copy()}
+
+    if not estimate_throw(plan).terminates:
+        raise DiceException('Unable to perform roll', 'Roll can never finish')
+
+    plan = _bind_subrolls(plan, trials, rng)
+    dice.plan = plan
+
+    trial = np.repeat(np.arange(trials), n)
+    die = np.tile(np.arange(n), trials)
+    natural, value = dice.roll(trial)
+
+    if plan.x is None:
+        modified = value.reshape(trials, n)
+        valid = np.ones((trials, n), dtype=bool)
+    else:
+        trial, die, depth, value, explosions, deepest = _explode(
+            dice, trial, die, value, trials, max_chain, max_total_dice)
+        order = np.lexsort((depth, die, trial))
+        trial, value = trial[order], value[order]
+        counts = np.bincount(trial, minlength=trials)
+        width = int(counts.max()) if trials else n
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        column = np.arange(trial.size) - starts[trial]
+        modified = np.zeros((trials, width), dtype=value.dtype)
+        modified[trial, column] = value
+        valid = np.zeros((trials, width), dtype=bool)
+        valid[trial, column] = True
+
+    result = {
+        'natural': natural.reshape(trials, n),
+        'modified': modified,
+        'valid': valid,
+        'kept': _keep_drop(plan, modified, valid),
+    }
+    if plan.x is not None:
+        result['explosions'] = explosions
+        result['deepest_chain'] = deepest
+    return result
@@ -0,0 +1,291 @@
+"""
+Cost model and admission limits for dice expressions.
+
+``estimate_throw`` and ``estimate_analysis`` predict how much work an
+expression costs before anything is rolled or enumerated: dice drawn
+(including rerolls, explosions and subrolls), how deep explosion chains are
+likely to go, and how many outcomes ``DiceProbability.analyze`` would
+enumerate. A ``Limits`` object turns those predictions into admission
+decisions for a thrower or analyzer.
+"""
+import copy
+import math
+from collections import namedtuple
+from fractions import Fraction
+from dice_roller.DiceException import DiceException
+from dice_roller.RollPlan import Subroll, compile_plan
+
+CostEstimate = namedtuple('CostEstimate', [
+    'dice',                 # dice in the main pool
+    'expected_draws',       # expected die rolls per throw, subrolls included
+    'worst_case_draws',     # math.inf when rerolls/explosions are unbounded
+    'reroll_probability',   # chance a fresh die triggers r/ro
+    'explode_probability',  # chance any die (original or exploded) explodes
+    'expected_explosions',  # expected extra dice from explosions per throw
+    'likely_max_depth',     # longest explosion chain, exceeded in < 0.1% of throws
+    'terminates',           # False if a reroll or explosion can never stop
+    'may_hang',             # True if some subroll outcome makes it never stop
+    'enumeration',          # outcomes enumerated by exact analysis (0 for throws)
+])
+
+# Tail probability used for likely_max_depth
+DEPTH_TAIL = 0.001
+
+
+def _value_range(value):
+    """Smallest and largest value a plain int or Subroll can take."""
+    if not isinstance(value, Subroll):
+        return value, value
+    low = high = value.offset
+    for op, number, sides in value.terms:
+        if op == '=-':
+            low, high = low - number * sides, high - number
+        else:
+            low, high = low + number, high + number * sides
+    return low, high
+
+
+def _candidates(value, faces):
+    """
+    Values worth trying for a threshold or boost that may be a subroll.
+
+    Matching probabilities only change at face values, so the range ends plus
+    every face value and its neighbours inside the range cover every case.
+    """
+    low, high = _value_range(value)
+    if low == high:
+        return [low]
+    points = {low, high}
+    for face in faces:
+        points.update(p for p in (face - 1, face, face + 1) if low <= p <= high)
+    return sorted(points)
+
+
+def _subroll_draws(plan):
+    draws = 0
+    for key in plan.subrolls:
+        draws += sum(number for _op, number, _sides in getattr(plan, key).val.terms)
+    return draws
+
+
+def _face_weights(plan, reroll_val):
+    """Exact probability of each face after the reroll step, and the chance a reroll triggers."""
+    faces = plan.sides
+    share = Fraction(1, len(faces))
+    if plan.r is None:
+        return [(face, share) for face in faces], Fraction(0)
+    matching = [plan.r.compare(face, reroll_val) for face in faces]
+    p_reroll = Fraction(sum(matching), len(faces))
+    if plan.r.once:
+        # a matching die is rolled once more, uniformly
+        return [(face, share * ((not hit) + p_reroll)) for face, hit in zip(faces, matching)], p_reroll
+    if p_reroll == 1:
+        return [], p_reroll
+    # rerolled until it misses: uniform over the faces that don't match
+    kept = Fraction(1, len(faces) - sum(matching))
+    return [(face, kept) for face, hit in zip(faces, matching) if not hit], p_reroll
+
+
+def _probabilities(plan):
+    """
+    Reroll and explode probabilities over every value a subroll could take.
+
+    Returns (p_reroll, p_explode, may_hang, can_finish): the worst probabilities
+    among outcomes that finish, whether some outcome never finishes, and
+    whether any outcome finishes at all.
+    """
+    faces = plan.sides
+    p_reroll = p_explode = Fraction(0)
+    may_hang = can_finish = False
+    boosts = _candidates(plan.b.val, faces) if plan.b is not None else [None]
+
+    def boosted(face, boost):
+        return plan.b.apply(face, boost) if boost is not None else face
+
+    for reroll_val in (_candidates(plan.r.val, faces) if plan.r is not None else [None]):
+        weights, p_r = _face_weights(plan, reroll_val)
+        p_reroll = max(p_reroll, p_r)
+        if not weights:
+            may_hang = True
+            continue
+        if plan.x is None:
+            can_finish = True
+            continue
+        for boost in boosts:
+            values = [(boosted(face, boost), weight) for face, weight in weights]
+            for explode_val in _candidates(plan.x.val, {value for value, _ in values}):
+                p_x = sum((weight for value, weight in values if plan.x.compare(value, explode_val)), Fraction(0))
+                if p_x == 1:
+                    may_hang = True
+                else:
+                    can_finish = True
+                    p_explode = max(p_explode, p_x)
+
+    return p_reroll, p_explode, may_hang, can_finish
+
+
+def estimate_throw(methods):
+    """
+    Predict the work of one throw.
+
+    Args:
+        methods: Parsed methods dict or RollPlan
+
+    Returns:
+        CostEstimate. Thresholds and boosts that are subrolls use the most
+        expensive outcome that still finishes; may_hang flags the others.
+    """
+    plan = compile_plan(methods)
+    n = plan.number_of_dice or 0
+    subroll_draws = _subroll_draws(plan)
+
+    if plan.types != 'int' or not plan.sides:
+        return CostEstimate(n, n + subroll_draws, n + subroll_draws, 0.0, 0.0, 0.0, 0, True, False, 0)
+
+    p_reroll, p_explode, may_hang, can_finish = _probabilities(plan)
+
+    if not can_finish:
+        return CostEstimate(n, math.inf, math.inf, float(p_reroll), float(p_explode),
+                            math.inf, math.inf, False, True, 0)
+
+    # a matching die is redrawn once, whether it rerolls once or until it misses
+    draws_per_die = 1 + p_reroll
+    dice_per_die = 1 / (1 - p_explode)
+    expected_draws = n * draws_per_die * dice_per_die + subroll_draws
+
+    if p_explode > 0:
+        worst_case = math.inf
+    else:
+        worst_case = n * (2 if p_reroll > 0 else 1) + subroll_draws
+
+    if p_explode > 0 and n > 0:
+        # P(some chain in the throw reaches depth L) ~= n * p^L
+        likely_max_depth = max(0, math.ceil(math.log(DEPTH_TAIL / n) / math.log(p_explode)))
+    else:
+        likely_max_depth = 0
+
+    return CostEstimate(n, float(expected_draws), worst_case, float(p_reroll), float(p_explode),
+                        float(n * (dice_per_die - 1)), likely_max_depth, True, may_hang, 0)
+
+
+def estimate_analysis(methods):
+    """
+    Predict the work of ``DiceProbability.analyze`` for an expression.
+
+    Keep/drop is solved by enumerating every ordered roll (twice: once for the
+    totals and once for the success counts); plain pools are convolved.
+    """
+    plan = compile_plan(methods)
+    estimate = estimate_throw(plan)
+    n = plan.number_of_dice or 0
+    faces = len(plan.sides) if plan.sides else 0
+
+    keep_n = None
+    if plan.k is not None and not isinstance(plan.k.val, Subroll):
+        keep_n = plan.k.val
+    elif plan.d is not None and not isinstance(plan.d.val, Subroll):
+        keep_n = n - plan.d.val
+
+    if keep_n is not None and 0 < keep_n < n:
+        enumeration = 2 * faces ** n
+    else:
+        # convolution i combines a distribution of ~i * faces values with one die
+        enumeration = sum(i * faces * faces for i in range(1, n))
+
+    return estimate._replace(enumeration=enumeration)
+
+
+class Limits:
+    """
+    Admission limits for a DiceThrower or DiceProbability instance.
+
+    Args:
+        max_dice: Most dice in one pool (main roll or subroll)
+        max_sides: Most faces on one die
+        max_expected_draws: Most expected die rolls for a single throw
+        max_enumeration: Most outcomes exact analysis may enumerate
+        max_simulation_draws: Most expected die rolls for a whole Monte Carlo run
+        max_chain: Most extra dice one exploding die may add before the roll is stopped
+        max_total_dice: Most dice, original and exploded, one roll may use
+        max_pool_dice: Most dice, original and exploded, in a counted pool
+            (DiceThrower.throw_pool)
+        max_pool_sides: Most faces on one die in a counted pool
+        downgrade: If True, analysis over max_enumeration falls back to Monte Carlo
+            with downgrade_samples samples instead of being rejected
+        downgrade_samples: Samples used for a downgraded analysis
+    """
+
+    def __init__(self, max_dice=200, max_sides=100, max_expected_draws=10_000,
+                 max_enumeration=10 ** 7, max_simulation_draws=10 ** 8,
+                 max_chain=1000, max_total_dice=10_000,
+                 max_pool_dice=10 ** 9, max_pool_sides=10_000,
+                 downgrade=False, downgrade_samples=10_000):
+        self.max_dice = max_dice
+        self.max_sides = max_sides
+        self.max_expected_draws = max_expected_draws
+        self.max_enumeration = max_enumeration
+        self.max_simulation_draws = max_simulation_draws
+        self.max_chain = max_chain
+        self.max_total_dice = max_total_dice
+        self.max_pool_dice = max_pool_dice
+        self.max_pool_sides = max_pool_sides
+        self.downgrade = downgrade
+        self.downgrade_samples = downgrade_samples
+
+    def for_pools(self):
+        """These limits with the pool sizes of counted pools in place of max_dice and max_sides."""
+        limits = copy.copy(self)
+        limits.max_dice = self.max_pool_dice
+        limits.max_sides = self.max_pool_sides
+        return limits
+
+    def check_size(self, methods):
+        """Reject pools and subrolls with too many dice or faces."""
+        self._check_pool(int(methods['number_of_dice']), len(methods['sides']))
+        for value in methods.values():
+            if isinstance(value, dict) and isinstance(value.get('val'), Subroll):
+                for _op, number, sides in value['val'].terms:
+                    self._check_pool(number, sides)
+
+    def _check_pool(self, number, sides):
+        if sides > self.max_sides:
+            raise DiceException('Unable to perform roll', 'Too many dice faces')
+        elif number > self.max_dice:
+            raise DiceException('Unable to perform roll', 'Too many dice requested')
+
+    def admit_throw(self, methods):
+        """Return the throw's CostEstimate, or raise DiceException if it is too expensive."""
+        estimate = estimate_throw(methods)
+        if not estimate.terminates:
+            raise DiceException('Unable to perform roll', 'Roll can never finish')
+        if estimate.expected_draws > self.max_expected_draws:
+            raise DiceException('Unable to perform roll', 'Roll too expensive')
+        if estimate.likely_max_depth > self.max_chain:
+            # the roller would stop this chain part way
+            raise DiceException('Unable to perform roll', 'Explosion chain too long')
+        return estimate
+
+    def admit_analysis(self, methods):
+        """
+        Decide how to analyze an expression.
+
+        Returns:
+            tuple: ('exact' or 'monte_carlo', CostEstimate)
+
+        Raises:
+            DiceException: If exact analysis is too expensive and downgrade is off
+        """
+        estimate = estimate_analysis(methods)
+        if estimate.enumeration <= self.max_enumeration:
+            return 'exact', estimate
+        if self.downgrade:
+            self.admit_monte_carlo(methods, self.downgrade_samples)
+            return 'monte_carlo', estimate
+        raise DiceException('Unable to analyze roll', 'Analysis too expensive')
+
+    def admit_monte_carlo(self, methods, samples):
+        """Return the per-throw CostEstimate, or raise DiceException if the run is too expensive."""
+        estimate = self.admit_throw(methods)
+        if estimate.expected_draws * samples > self.max_simulation_draws:
+            raise DiceException('Unable to analyze roll', 'Simulation too expensive')
+        return estimate
@@ -0,0 +1,147 @@
+"""
+Compiled arithmetic over dice terms, for ``DiceThrower.throw_string``.
+
+An equation such as ``(2d6 + 3) * 2 + 1d8 - 1d4`` is compiled once into a
+small tree: numbers, dice terms, unary minus and the four binary operators,
+with ``*`` and ``/`` binding tighter than ``+`` and ``-`` and parentheses
+grouping as usual. Dice terms are found by the parser's equation scan, so
+inside a term the dice grammar applies: ``2d6+3`` is one term with a per-die
+boost, while ``2d6 + 3`` adds 3 to the total.
+
+Evaluating walks the tree with the totals of the rolled terms; nothing is
+rewritten as text and nothing is passed to ``eval``. Numbers are exact: a
+literal like ``1.5`` becomes a Fraction and ``/`` divides exactly, as the
+per-die and total modifiers do.
+"""
+import re
+from collections import namedtuple
+from fractions import Fraction
+from dice_roller.DiceException import DiceException
+from dice_roller.RollPlan import compile_plan
+from dice_roller.safe_compare import ARITHMETIC_OPERATORS
+
+Number = namedtuple('Number', ['value'])
+# index is the term's position in Equation.terms, where its total is found
+Term = namedtuple('Term', ['index', 'text', 'start', 'stop', 'methods', 'plan'])
+Negate = namedtuple('Negate', ['operand'])
+BinaryOp = namedtuple('BinaryOp', ['operator', 'apply', 'left', 'right'])
+Equation = namedtuple('Equation', ['source', 'root', 'terms'])
+
+# Division keeps exact precision, as the roll plans do
+_APPLY = {**ARITHMETIC_OPERATORS, '/': Fraction}
+
+_TOKEN = re.compile(r'\s*(?:(\d+\.?\d*|\.\d+)|([-+*/()]))')
+_SPACE = re.compile(r'\s*')
+
+
+def _tokens(source, terms):
+    """Numbers, operators and Term nodes in source order."""
+    tokens = []
+    pos = 0
+    for term in [*terms, None]:
+        end = len(source) if term is None else term.start
+        while True:
+            pos = _SPACE.match(source, pos, end).end()
+            if pos >= end:
+                break
+            match = _TOKEN.match(source, pos, end)
+            if match is None:
+                raise DiceException('Unable to parse expression', f'Unexpected {source[pos]!r} in equation')
+            number, symbol = match.groups()
+            tokens.append(Number(Fraction(number) if '.' in number else int(number)) if number else symbol)
+            pos = match.end()
+        if term is not None:
+            tokens.append(term)
+            pos = term.stop
+    return tokens
+
+
+class _Reader:
+    """Recursive descent over the token list, one method per precedence level."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise DiceException('Unable to parse expression', 'Equation ends too soon')
+        self.pos += 1
+        return token
+
+    def sum(self):
+        node = self.product()
+        while self.peek() in ('+', '-'):
+            operator = self.take()
+            node = BinaryOp(operator, _APPLY[operator], node, self.product())
+        return node
+
+    def product(self):
+        node = self.unary()
+        while self.peek() in ('*', '/'):
+            operator = self.take()
+            node = BinaryOp(operator, _APPLY[operator], node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == '-':
+            self.take()
+            return Negate(self.unary())
+        if self.peek() == '+':
+            self.take()
+            return self.unary()
+        token = self.take()
+        if token == '(':
+            node = self.sum()
+            if self.take() != ')':
+                raise DiceException('Unable to parse expression', 'Unbalanced parentheses')
+            return node
+        if isinstance(token, (Number, Term)):
+            return token
+        raise DiceException('Unable to parse expression', f'Unexpected {token!r} in equation')
+
+
+def compile_equation(source, scanned):
+    """
+    Compile an equation into an Equation tree.
+
+    Args:
+        source: Equation text, tabs expanded as the equation scan reports positions
+        scanned: (term, start, stop, methods) for each dice term, in order
+
+    Returns:
+        Equation: source, root node and the Term nodes in source order
+
+    Raises:
+        DiceException: If the text between the terms isn't valid arithmetic
+    """
+    terms = tuple(Term(index, text, start, stop, methods, compile_plan(methods))
+                  for index, (text, start, stop, methods) in enumerate(scanned))
+    reader = _Reader(_tokens(source, terms))
+    root = reader.sum()
+    if reader.peek() is not None:
+        raise DiceException('Unable to parse expression', f'Unexpected {reader.peek()!r} in equation')
+    return Equation(source, root, terms)
+
+
+def evaluate(node, totals):
+    """
+    Value of a compiled node, given the total rolled for each term.
+
+    Raises:
+        DiceException: On division by zero
+    """
+    if isinstance(node, BinaryOp):
+        left, right = evaluate(node.left, totals), evaluate(node.right, totals)
+        if node.operator == '/' and right == 0:
+            raise DiceException('Unable to perform roll', 'Division by zero')
+        return node.apply(left, right)
+    if isinstance(node, Term):
+        return totals[node.index]
+    if isinstance(node, Negate):
+        return -evaluate(node.operand, totals)
+    return node.value
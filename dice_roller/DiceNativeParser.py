@@ -0,0 +1,240 @@
+"""
+Hand-written, dependency-free parser for the dice grammar.
+
+Mirrors the pyparsing grammar built by ``DiceParser.get_expression`` token for
+token, including its quirks (whitespace between tokens, trailing text being
+ignored, ``=`` never starting a ``=+``/``=-`` total modifier). It produces the
+same named fields as the pyparsing results, so ``DiceParser.clean_methods``
+turns either into an identical ``methods`` dict.
+
+Each token is tried once at the current position and never revisited, so a
+parse is a single left-to-right pass over the input.
+"""
+import re
+import string
+from dice_roller.DiceException import DiceException
+
+WHITESPACE = ' \t\n\r'
+DIGITS = frozenset(string.digits)
+FACE_CHARS = frozenset(string.ascii_letters + string.digits + ',-')
+ARITHMETIC_OPERATORS = frozenset('+-/*')
+
+# A subroll (dice in a value position, e.g. the 1d4 in 1d20=+1d4). The negative
+# lookahead stops a die-modifying method (x, r, k, d) being read into the value.
+SUBROLL_PATTERN = re.compile(r'(\d+)d(\d+)(?![xrkd])')
+
+
+class ParsedRoll:
+    """Named fields of one parsed dice expression; unmatched fields are ''."""
+
+    __slots__ = ('number_of_dice', 'sides', 'dice_modifier', 'dice_boost', 'total_modifiers',
+                 'success_evaluator', 'success_threshhold', 'methods', 'total_check_op', 'total_check_val')
+
+    def __init__(self):
+        self.number_of_dice = ''
+        self.sides = ''
+        self.dice_modifier = ''
+        self.dice_boost = ''
+        self.total_modifiers = []
+        self.success_evaluator = ''
+        self.success_threshhold = ''
+        self.methods = []
+        self.total_check_op = ''
+        self.total_check_val = ''
+
+
+class ParsedMethod:
+    __slots__ = ('method_name', 'method_operator', 'method_value')
+
+    def __init__(self, method_name, method_operator='', method_value=''):
+        self.method_name = method_name
+        self.method_operator = method_operator
+        self.method_value = method_value
+
+
+class ParsedTotalModifier:
+    __slots__ = ('mod_op', 'mod_val')
+
+    def __init__(self, mod_op, mod_val):
+        self.mod_op = mod_op
+        self.mod_val = mod_val
+
+
+class DiceNativeParser:
+
+    def __init__(self, method_list):
+        self.method_names = frozenset(method_list.split())
+        self.longest_method = max(len(name) for name in self.method_names)
+
+    def parse(self, expression):
+        """Parse one dice expression, ignoring any trailing text."""
+        expression = expression.expandtabs()
+        match = self._match(expression, 0, skip=True, subrolls=True)
+        if match is None:
+            raise DiceException('Unable to parse expression', 'Bad Expression - ' + expression)
+        return match[0]
+
+    def scan(self, equation):
+        """
+        Yield every dice expression found in an equation.
+
+        Yields (parsed, term, start, stop) tuples, where term is the matched
+        text as the pyparsing equation grammar reports it (braces dropped).
+        Inside a term no whitespace is allowed, matching the Combine grammar,
+        and values are plain numbers only (no subrolls).
+        """
+        equation = equation.expandtabs()
+        loc = 0
+        length = len(equation)
+        while loc <= length:
+            start = self._skip(equation, loc)
+            match = self._match(equation, start, skip=False, subrolls=False)
+            if match is None:
+                loc = start + 1
+                continue
+            parsed, stop = match
+            term = equation[start:stop].replace('{', '').replace('}', '')
+            yield parsed, term, start, stop
+            loc = stop
+
+    # -- token matchers: each returns the new position, or None on no match --
+
+    def _skip(self, text, pos):
+        length = len(text)
+        while pos < length and text[pos] in WHITESPACE:
+            pos += 1
+        return pos
+
+    def _word(self, text, pos, chars):
+        end = pos
+        length = len(text)
+        while end < length and text[end] in chars:
+            end += 1
+        return end if end > pos else None
+
+    def _value(self, text, pos, subrolls):
+        if subrolls:
+            match = SUBROLL_PATTERN.match(text, pos)
+            if match:
+                return match.end()
+        return self._word(text, pos, DIGITS)
+
+    def _comparator(self, text, pos):
+        head = text[pos:pos + 2]
+        if head[:1] == '=':
+            return None if head[1:] in ('+', '-') else pos + 1
+        if head in ('<=', '>=', '!='):
+            return pos + 2
+        if head[:1] in ('<', '>'):
+            return pos + 1
+        return None
+
+    def _method(self, text, pos):
+        for size in range(self.longest_method, 0, -1):
+            candidate = text[pos:pos + size]
+            # near the end of the text the slice is shorter than size
+            if len(candidate) == size and candidate in self.method_names:
+                return pos + size
+        return None
+
+    def _match(self, text, pos, skip, subrolls):
+        """Match one dice expression at pos; returns (ParsedRoll, end) or None."""
+        ws = self._skip if skip else (lambda _text, p: p)
+        parsed = ParsedRoll()
+
+        # NdX - the only required part
+        pos = ws(text, pos)
+        end = self._word(text, pos, DIGITS)
+        if end is None:
+            return None
+        parsed.number_of_dice = text[pos:end]
+
+        pos = ws(text, end)
+        if text[pos:pos + 1] != 'd':
+            return None
+
+        pos = ws(text, pos + 1)
+        end = self._word(text, pos, DIGITS)
+        if end is not None:
+            parsed.sides = text[pos:end]
+        elif text[pos:pos + 1] == '{':
+            start = ws(text, pos + 1)
+            end = self._word(text, start, FACE_CHARS)
+            if end is None:
+                return None
+            close = ws(text, end)
+            if text[close:close + 1] != '}':
+                return None
+            parsed.sides = [text[start:end]]
+            end = close + 1
+        else:
+            return None
+        pos = end
+
+        # per-die modifier and boost
+        at = ws(text, pos)
+        if text[at:at + 1] in ARITHMETIC_OPERATORS:
+            parsed.dice_modifier = text[at]
+            pos = at + 1
+        at = ws(text, pos)
+        end = self._value(text, at, subrolls)
+        if end is not None:
+            parsed.dice_boost = text[at:end]
+            pos = end
+
+        # chained total modifiers: =+N=-M
+        while True:
+            at = ws(text, pos)
+            if text[at:at + 1] != '=' or text[at + 1:at + 2] not in ('+', '-'):
+                break
+            value = ws(text, at + 2)
+            end = self._value(text, value, subrolls)
+            if end is None:
+                break
+            parsed.total_modifiers.append(ParsedTotalModifier(text[at:at + 2], text[value:end]))
+            pos = end
+
+        # success evaluator and threshold
+        at = ws(text, pos)
+        end = self._comparator(text, at)
+        if end is not None:
+            parsed.success_evaluator = text[at:end]
+            pos = end
+        at = ws(text, pos)
+        end = self._value(text, at, subrolls)
+        if end is not None:
+            parsed.success_threshhold = text[at:end]
+            pos = end
+
+        # methods, each with an optional comparator and value
+        while True:
+            at = ws(text, pos)
+            end = self._method(text, at)
+            if end is None:
+                break
+            method = ParsedMethod(text[at:end])
+            pos = end
+            at = ws(text, pos)
+            end = self._comparator(text, at)
+            if end is not None:
+                method.method_operator = text[at:end]
+                pos = end
+            at = ws(text, pos)
+            end = self._value(text, at, subrolls)
+            if end is not None:
+                method.method_value = text[at:end]
+                pos = end
+            parsed.methods.append(method)
+
+        # trailing total check: cmpN
+        at = ws(text, pos)
+        end = self._comparator(text, at)
+        if end is not None:
+            value = ws(text, end)
+            value_end = self._value(text, value, subrolls)
+            if value_end is not None:
+                parsed.total_check_op = text[at:end]
+                parsed.total_check_val = text[value:value_end]
+                pos = value_end
+
+        return parsed, pos
@@ -1,7 +1,78 @@
-import re
-from pyparsing import Literal, Word, oneOf, Optional, Group, ZeroOrMore, Combine, Or, Suppress, Regex, nums, alphanums
+import threading
+from collections import OrderedDict
+from dice_roller.DiceCost import Limits
+from dice_roller.DiceEquation import compile_equation
 from dice_roller.DiceException import DiceException
-from dice_roller.Die import Die
+from dice_roller.DiceNativeParser import DiceNativeParser, SUBROLL_PATTERN
+from dice_roller.RollPlan import Subroll, compile_plan
+
+# Grammars keyed by (method list, equation mode); built once per process.
+_grammar_cache = {}
+_grammar_lock = threading.Lock()
+
+
+def copy_methods(methods):
+    """Copy a ``methods`` dict deep enough that callers can't corrupt a cached one."""
+    return {key: value.copy() if isinstance(value, (dict, list)) else value
+            for key, value in methods.items()}
+
+
+class ParseCache:
+    """
+    Bounded LRU cache from expression string to the cleaned ``methods`` dict.
+
+    Entries are copied on the way in and out, so the cached dicts are never
+    shared with callers. A maxsize of 0 disables caching. A cache of
+    immutable values (compiled equations) passes copy=None to share them.
+    """
+
+    def __init__(self, maxsize=1024, copy=copy_methods):
+        self.maxsize = maxsize
+        self.copy = copy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, expression):
+        with self._lock:
+            methods = self._entries.get(expression)
+            if methods is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(expression)
+            self.hits += 1
+        return methods if self.copy is None else self.copy(methods)
+
+    def put(self, expression, methods):
+        if self.maxsize <= 0:
+            return
+        if self.copy is not None:
+            methods = self.copy(methods)
+        with self._lock:
+            self._entries[expression] = methods
+            self._entries.move_to_end(expression)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+# Shared by every DiceParser that isn't given its own cache.
+default_parse_cache = ParseCache()
+default_equation_cache = ParseCache(copy=None)
 
 
 def clean_value(value):
@@ -11,6 +82,27 @@ def clean_value(value):
         return None
 
 
+def clean_operand(value, operator):
+    """
+    clean_value for a value position that may hold a subroll.
+
+    A subroll such as '1d4' becomes a Subroll node, rolled at throw time; the
+    operator in front of it is kept for reporting.
+    """
+    match = SUBROLL_PATTERN.fullmatch(str(value))
+    if match is None:
+        return clean_value(value)
+    return Subroll(((operator, *check_subroll(match)),), 0)
+
+
+def check_subroll(match):
+    """Validate a subroll match; returns (number, sides). Size limits are checked by Limits."""
+    number, sides = int(match.group(1)), int(match.group(2))
+    if sides <= 0:
+        raise DiceException('Unable to parse expression', 'Impossible dice faces')
+    return number, sides
+
+
 def clean_sides(values):
     list_type = "mixed"
 
@@ -38,68 +130,53 @@ class DiceParser:
     high_methods = ["s", "x", "xx", "xp", "xxp", "k", "kh", "dh", "ns"]
     low_methods = ["f", "kl", "d", "dl", "r", "ro", "nf"]
 
-    def __init__(self):
-        self.last_subrolls = []  # Track subrolls from last parse
-
-    def resolve_subrolls(self, expression):
-        """
-        Pre-process expression to resolve dice in modifier positions.
-        E.g., '1d20=+1d3>=17' becomes '1d20=+2>=17' (where 2 is the 1d3 result)
-
-        Subrolls are dice expressions after arithmetic operators (+, -, *, /)
-        or total modifiers (=+, =-). They get rolled and replaced with their total.
-        """
-        self.last_subrolls = []
-
-        # Match: operator, comparator, or method prefix followed by dice expression
-        # Operators: =+, =-, +, -, *, /
-        # Comparators: >=, <=, >, <, =, !=
-        # Methods: kh, kl, dh, dl, k, d, x, xx, xp, xxp, r, ro, s, f, ns, nf, t
-        # \d+d\d+ matches dice like 1d6, 2d10
-        # (?![xrkd]) negative lookahead prevents matching when followed by die-modifying methods
-        subroll_pattern = r'(=?[+\-*/]|>=|<=|!=|>|<|=|kh|kl|dh|dl|xxp|xx|xp|x|ro|r|ns|nf|s|f|t|k|d)(\d+d\d+)(?![xrkd])'
-
-        def roll_and_replace(match):
-            operator = match.group(1)
-            dice_expr = match.group(2)
-            result = self._quick_roll(dice_expr)
-            self.last_subrolls.append({
-                'expression': dice_expr,
-                'result': result,
-                'operator': operator
-            })
-            return f"{operator}{result}"
-
-        return re.sub(subroll_pattern, roll_and_replace, expression)
-
-    def _quick_roll(self, dice_expr):
-        """Roll a simple NdS expression and return total as int"""
-        match = re.match(r'(\d+)d(\d+)', dice_expr)
-        if not match:
-            return 0
-        num_dice = int(match.group(1))
-        sides = int(match.group(2))
-
-        die = Die(list(range(1, sides + 1)))
-        total = 0
-        for _ in range(num_dice):
-            die.roll()
-            total += die.showing
-        return total
+    # 'pyparsing' is the reference grammar; 'native' is the dependency-free
+    # hand-written parser, which produces identical methods dicts
+    engines = ('pyparsing', 'native')
+
+    # The cache holds limit-free parse results; each parser applies its own
+    # Limits to every result, cached or not
+    def __init__(self, cache=None, engine='pyparsing', limits=None, equation_cache=None):
+        if engine not in self.engines:
+            raise ValueError(f"Unknown parser engine: {engine!r}")
+        self.limits = Limits() if limits is None else limits
+        self.cache = default_parse_cache if cache is None else cache
+        self.equation_cache = default_equation_cache if equation_cache is None else equation_cache
+        self.engine = engine
+        self.native = DiceNativeParser(self.all_methods) if engine == 'native' else None
 
     # this will parse one dice roll
     def parse_input(self, expression):
-        # Resolve any subrolls (dice in modifier positions) first
-        expression = self.resolve_subrolls(expression)
+        methods = self.cache.get(expression)
+        if methods is None:
+            methods = self._parse_uncached(expression)
+            self.cache.put(expression, methods)
+
+        self.limits.check_size(methods)
+        return methods
+
+    def compile(self, expression):
+        """
+        Parse one dice roll into an immutable RollPlan, ready to roll many times.
 
-        # create the parsing expression based on our method list
-        dice_expr = self.get_expression(self.all_methods)
+        Raises:
+            DiceException: If the expression can't be parsed, or rerolls every face
+        """
+        plan = compile_plan(self.parse_input(expression))
+        if plan.r is not None and plan.r.keep == ():
+            raise DiceException('Unable to perform roll', 'Reroll matches every face')
+        return plan
 
+    def _parse_uncached(self, expression):
         # parse the expression, using our  expression
-        try:
-            parsed_string = dice_expr.parseString(expression)
-        except Exception as e:
-            raise DiceException('Unable to parse expression', 'Bad Expression - ' + str(e))
+        if self.native is not None:
+            parsed_string = self.native.parse(expression)
+        else:
+            grammar = self.get_grammar()
+            try:
+                parsed_string = grammar.parseString(expression)
+            except Exception as e:
+                raise DiceException('Unable to parse expression', 'Bad Expression - ' + str(e))
         # pull out a dictionary of the specific methods
         methods = self.clean_methods(parsed_string)
         return methods
@@ -107,17 +184,68 @@ class DiceParser:
     # this will parse a full equation and return the dice
     # expressions with their position in the equation
     def parse_expression_from_equation(self, equation):
-        # create the parsing expression based on our method list
-        dice_expr = Combine(self.get_expression(self.all_methods)).setResultsName('expression')
         parsed_equation = {}
 
-        for result, start, stop in dice_expr.scanString(equation):
-            methods = self.clean_methods(result.expression)
-            parsed_equation[str(result[0][0])] = [methods, start, stop]
+        for parsed, term, start, stop in self.scan_equation(equation):
+            methods = self.clean_methods(parsed)
+            self.limits.check_size(methods)
+            parsed_equation[term] = [methods, start, stop]
 
         return parsed_equation
 
-    def get_expression(self, method_list):
+    def compile_equation(self, equation):
+        """
+        Compile a full equation such as '(2d6 + 3) * 2 + 1d8' into an Equation tree.
+
+        Compiled equations are cached like parsed expressions; the limits are
+        checked for every term on each call.
+
+        Raises:
+            DiceException: If the equation can't be parsed or a term is over limits
+        """
+        compiled = self.equation_cache.get(equation)
+        if compiled is None:
+            source = equation.expandtabs()
+            compiled = compile_equation(source, [(term, start, stop, self.clean_methods(parsed))
+                                                 for parsed, term, start, stop in self.scan_equation(source)])
+            self.equation_cache.put(equation, compiled)
+        for term in compiled.terms:
+            self.limits.check_size(term.methods)
+        return compiled
+
+    def scan_equation(self, equation):
+        """Yield (parsed, term, start, stop) for every dice expression in an equation."""
+        if self.native is not None:
+            yield from self.native.scan(equation)
+            return
+        for result, start, stop in self.get_grammar(equation=True).scanString(equation):
+            yield result.expression, str(result[0][0]), start, stop
+
+    def get_grammar(self, equation=False):
+        """Return the grammar for our method list, building it on first use only."""
+        key = (self.all_methods, equation)
+        grammar = _grammar_cache.get(key)
+        if grammar is None:
+            with _grammar_lock:
+                grammar = _grammar_cache.get(key)
+                if grammar is None:
+                    if equation:
+                        from pyparsing import Combine
+                        grammar = Combine(self.get_expression(self.all_methods, subrolls=False)) \
+                            .setResultsName('expression')
+                    else:
+                        grammar = self.get_expression(self.all_methods)
+                    # pyparsing streamlines a grammar on its first parse; doing it
+                    # here means threads sharing the grammar only ever read it
+                    grammar.streamline()
+                    _grammar_cache[key] = grammar
+        return grammar
+
+    # subrolls allows a dice expression (1d4) wherever a value is expected
+    def get_expression(self, method_list, subrolls=True):
+        # pyparsing is only imported once a grammar is first needed
+        from pyparsing import Literal, Word, oneOf, Optional, Group, ZeroOrMore, Combine, Or, Suppress, Regex, nums, alphanums
+
         methods = method_list
 
         dice_numbers = nums
@@ -134,27 +262,32 @@ class DiceParser:
 
         list_value = (Suppress("{") + dice_faces + Suppress("}"))
 
+        if subrolls:
+            value = Regex(SUBROLL_PATTERN.pattern) | digits
+        else:
+            value = digits
+
         # Total modifier: =+N or =-N syntax, can be chained (e.g., =+10=-3)
         total_modifier = Group(
             Combine(Literal("=") + oneOf('+ -')).setResultsName("mod_op")
-            + digits.setResultsName("mod_val")
+            + value.setResultsName("mod_val")
         )
 
         # Total check: >=N or similar at end of expression, checks if total meets threshold
         total_check = comparators_expr.copy().setResultsName("total_check_op") \
-                      + digits.setResultsName("total_check_val")
+                      + value.setResultsName("total_check_val")
 
         dice_expr = digits.setResultsName("number_of_dice") \
                     + dice \
                     + Or((dice_digits.setResultsName("sides"), list_value.setResultsName("sides"))) \
                     + Optional(oneOf(operators).setResultsName("dice_modifier")) \
-                    + Optional(digits.setResultsName("dice_boost")) \
+                    + Optional(value.setResultsName("dice_boost")) \
                     + ZeroOrMore(total_modifier).setResultsName("total_modifiers") \
                     + Optional(comparators_expr.setResultsName("success_evaluator")) \
-                    + Optional(digits.setResultsName("success_threshhold")) \
+                    + Optional(value.setResultsName("success_threshhold")) \
                     + ZeroOrMore(Group(oneOf(methods).setResultsName('method_name') \
                                        + Optional(comparators_expr.copy().setResultsName("method_operator")) \
-                                       + Optional(digits.setResultsName("method_value"))).setResultsName('methods',
+                                       + Optional(value.setResultsName("method_value"))).setResultsName('methods',
                                                                                                          True)) \
                     + Optional(total_check)
 
@@ -174,10 +307,6 @@ class DiceParser:
                 raise DiceException('Unable to parse expression', 'Unknown dice sides')
             elif int(sides_int) <= 0:
                 raise DiceException('Unable to parse expression', 'Impossible dice faces')
-            elif int(sides_int) > 100:
-                raise DiceException('Unable to perform roll', 'Too many dice faces')
-            elif int(parsed.number_of_dice) > 200:
-                raise DiceException('Unable to perform roll', 'Too many dice requested')
 
             sides = list(range(1, int(sides_int) + 1))
             list_type = "int"
@@ -191,6 +320,8 @@ class DiceParser:
 
             for value in parsed_methods:
                 method_name = value.method_name
+                # whatever sits directly in front of the value, for subroll reports
+                prefix = value.method_operator or method_name
                 # default value is based on method
                 if value.method_value:
                     val = value.method_value
@@ -218,14 +349,14 @@ class DiceParser:
                     if len(method_name) > 1:
                         if method_name[1] == 'l':
                             layer = 'low'
-                    methods['k'] = {'val': clean_value(val), 'layer': layer}
+                    methods['k'] = {'val': clean_operand(val, prefix), 'layer': layer}
                 # drop
                 elif method_name[0] == 'd':
                     layer = 'low'
                     if len(method_name) > 1:
                         if method_name[1] == 'h':
                             layer = 'high'
-                    methods['d'] = {'val': clean_value(val), 'layer': layer}
+                    methods['d'] = {'val': clean_operand(val, prefix), 'layer': layer}
                 # exploding flags
                 elif method_name[0] == 'x':
                     compound = False
@@ -238,7 +369,7 @@ class DiceParser:
                         if len(method_name) > 2:
                             if method_name[2] == 'p':
                                 penetrate = True
-                    methods['x'] = {'operator': operator, 'val': clean_value(val), 'compound': compound,
+                    methods['x'] = {'operator': operator, 'val': clean_operand(val, prefix), 'compound': compound,
                                     'penetrate': penetrate}
                 # reroll flags
                 elif method_name[0] == 'r':
@@ -246,10 +377,10 @@ class DiceParser:
                     if len(method_name) > 1:
                         if method_name[1] == 'o':
                             once = True
-                    methods['r'] = {'operator': operator, 'val': clean_value(val), 'once': once}
+                    methods['r'] = {'operator': operator, 'val': clean_operand(val, prefix), 'once': once}
                 # default
                 else:
-                    methods[method_name] = {'operator': operator, 'val': clean_value(val)}
+                    methods[method_name] = {'operator': operator, 'val': clean_operand(val, prefix)}
 
             # success
             if parsed.success_threshhold:
@@ -268,7 +399,7 @@ class DiceParser:
             else:
                 s_eval = '>='
 
-            methods['s'] = {'operator': s_eval, 'val': clean_value(s_thresh)}
+            methods['s'] = {'operator': s_eval, 'val': clean_operand(s_thresh, parsed.success_evaluator)}
 
             # boost
             if parsed.dice_modifier:
@@ -281,20 +412,29 @@ class DiceParser:
             else:
                 b_boost = '0'
 
-            methods['b'] = {'operator': b_mod, 'val': clean_value(b_boost)}
+            methods['b'] = {'operator': b_mod, 'val': clean_operand(b_boost, parsed.dice_modifier)}
 
             # Total boost - =+N=-M syntax accumulates
+            subroll_terms = []
             if parsed.total_modifiers:
                 # Accumulate all total modifiers: =+10=-3 becomes +7
                 total_adjustment = 0
                 for mod in parsed.total_modifiers:
                     op = mod.mod_op[1]  # '+' or '-' (skip the '=')
+                    subroll = SUBROLL_PATTERN.fullmatch(mod.mod_val)
+                    if subroll:
+                        # rolled at throw time: =+10=-1d4 is 10 minus a 1d4
+                        subroll_terms.append((mod.mod_op, *check_subroll(subroll)))
+                        continue
                     val = int(mod.mod_val)
                     if op == '+':
                         total_adjustment += val
                     else:
                         total_adjustment -= val
-                if total_adjustment >= 0:
+                if subroll_terms:
+                    l_mod = '+'
+                    l_boost = Subroll(tuple(subroll_terms), total_adjustment)
+                elif total_adjustment >= 0:
                     l_mod = '+'
                     l_boost = str(total_adjustment)
                 else:
@@ -304,7 +444,10 @@ class DiceParser:
                 l_mod = '+'
                 l_boost = '0'
 
-            methods['l'] = {'operator': l_mod, 'val': clean_value(l_boost)}
+            if subroll_terms:
+                methods['l'] = {'operator': l_mod, 'val': l_boost}
+            else:
+                methods['l'] = {'operator': l_mod, 'val': clean_value(l_boost)}
 
             # Total check: >=N at end of expression checks if total meets threshold
             if parsed.total_check_op:
@@ -312,7 +455,7 @@ class DiceParser:
                 if t_op == '=':
                     t_op = '=='
                 t_val = parsed.total_check_val if parsed.total_check_val else '0'
-                methods['t'] = {'operator': t_op, 'val': clean_value(t_val)}
+                methods['t'] = {'operator': t_op, 'val': clean_operand(t_val, parsed.total_check_op)}
 
         # take the remaining parsed items and put them in methods
         methods['number_of_dice'] = clean_value(parsed.number_of_dice)
@@ -0,0 +1,159 @@
+"""
+Count-based rolling for huge pools.
+
+A pool like 100000d6>=5 is rolled as a histogram: how many dice landed on
+each face, drawn with one multinomial split instead of one draw per die.
+Rerolls redistribute the counts of matching faces, boosts and penetration
+relabel values, explosions roll the exploding count again, and keep/drop,
+totals and success counts are all read off the histogram, so time and
+memory depend on the number of faces, not the number of dice.
+"""
+from collections import Counter
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceRandom import multinomial, resolve_rng
+from dice_roller.RollPlan import compile_plan
+
+
+class DicePool:
+
+    def __init__(self, limits, rng=None):
+        self.limits = limits
+        self.rng = resolve_rng(rng)
+
+    def draw(self, number, weights):
+        """Histogram of number dice over the faces in weights ({face: weight})."""
+        faces = list(weights)
+        counts = multinomial(self.rng, number, [weights[face] for face in faces])
+        return Counter({face: count for face, count in zip(faces, counts) if count})
+
+    def roll_subroll(self, number, sides):
+        """Total of a simple NdS subroll, summed from its face counts."""
+        counts = self.draw(number, dict.fromkeys(range(1, sides + 1), 1))
+        return sum(face * count for face, count in counts.items())
+
+    def roll_faces(self, number, weights, plan):
+        """
+        Roll number dice through reroll and boost.
+
+        Returns:
+            tuple: (natural histogram of first faces, histogram of final values)
+        """
+        natural = self.draw(number, weights)
+        faces = natural
+
+        reroll = plan.r
+        if reroll is not None:
+            matching = sum(count for face, count in natural.items() if reroll.compare(face, reroll.val))
+            if matching:
+                faces = Counter({face: count for face, count in natural.items()
+                                 if not reroll.compare(face, reroll.val)})
+                if reroll.once:
+                    faces.update(self.draw(matching, weights))
+                else:
+                    keep = {face: weight for face, weight in weights.items()
+                            if not reroll.compare(face, reroll.val)}
+                    if not keep:
+                        raise DiceException('Unable to perform roll', 'Reroll matches every face')
+                    faces.update(self.draw(matching, keep))
+
+        boost = plan.b
+        if boost is not None:
+            boosted = Counter()
+            for face, count in faces.items():
+                boosted[boost.apply(face, boost.val)] += count
+            faces = boosted
+
+        return natural, faces
+
+    def roll(self, methods):
+        """
+        Roll a plan as counts.
+
+        Returns:
+            dict: 'natural' histogram of first faces, 'modified' histogram of
+            every die's final value (exploded dice included), and for exploding
+            rolls 'explosions' and 'deepest_chain'
+
+        Raises:
+            DiceException: For non-numeric faces, for compounding explosions
+                (which need per-die values), or when an explosion chain or
+                the pool runs over limits
+        """
+        plan = compile_plan(methods)
+        if plan.types != 'int':
+            raise DiceException('Unable to perform roll', 'Counted pools need numeric faces')
+        weights = Counter(plan.sides)
+        number = plan.number_of_dice
+        natural, modified = self.roll_faces(number, weights, plan)
+        result = {'natural': natural, 'modified': modified}
+
+        explode_on = plan.x
+        if explode_on is None:
+            return result
+        if explode_on.compound:
+            raise DiceException('Unable to perform roll', 'Compounding explosions need per-die values')
+
+        # every exploding die rolls one more die, which may explode in turn
+        penetrate = 1 if explode_on.penetrate else 0
+        exploding = sum(count for value, count in modified.items() if explode_on.compare(value, explode_on.val))
+        explosions = depth = 0
+        while exploding:
+            depth += 1
+            explosions += exploding
+            if depth > self.limits.max_chain or number + explosions > self.limits.max_pool_dice:
+                raise DiceException('The dice have exploded out of control ruining everything', {
+                    'reason': 'Explosion chain too long' if depth > self.limits.max_chain else 'Too many dice rolled',
+                    'explosions': explosions,
+                    'deepest_chain': depth,
+                })
+            _natural, extra = self.roll_faces(exploding, weights, plan)
+            exploding = sum(count for value, count in extra.items() if explode_on.compare(value, explode_on.val))
+            for value, count in extra.items():
+                modified[value - penetrate] += count
+
+        result['explosions'] = explosions
+        result['deepest_chain'] = depth
+        return result
+
+    def keep(self, modified, plan):
+        """Histogram of the values kept by keep/drop, walking the values from highest to lowest."""
+        if plan.k is None and plan.d is None:
+            return modified
+
+        n = sum(modified.values())
+        top, bottom = 0, n
+        if plan.k is not None:
+            count = max(0, min(plan.k.val, n))
+            if plan.k.layer == 'low':
+                top = n - count
+            else:
+                bottom = count
+        if plan.d is not None:
+            if plan.d.layer == 'high':
+                top = min(top + plan.d.val, bottom)
+            else:
+                bottom = max(bottom - plan.d.val, top)
+
+        kept = Counter()
+        position = 0
+        for value in sorted(modified, reverse=True):
+            count = modified[value]
+            taken = min(position + count, bottom) - max(position, top)
+            if taken > 0:
+                kept[value] = taken
+            position += count
+        return kept
+
+    def score(self, natural, kept, plan):
+        """(total, success, fail, nf, ns, passed) from the histograms, as DiceScorer.score does."""
+        core = sum(int(value) * count for value, count in kept.items())
+        total = plan.l.apply(core, plan.l.val) if plan.l is not None else core
+
+        def count(histogram, condition):
+            if condition is None:
+                return None
+            return sum(n for value, n in histogram.items() if condition.compare(value, condition.val))
+
+        success = count(kept, plan.s) or 0
+        passed = plan.t.compare(total, plan.t.val) if plan.t is not None else None
+        return total, success, count(kept, plan.f), count(natural, plan.nf), count(natural, plan.ns), passed
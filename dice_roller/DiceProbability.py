@@ -1,11 +1,29 @@
 from fractions import Fraction
-from decimal import Decimal
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 import itertools as it
+import random
 from math import factorial, sqrt
+from dice_roller.DiceCost import Limits
 from dice_roller.DiceParser import DiceParser
 from dice_roller.DiceThrower import DiceThrower
-from dice_roller.safe_compare import safe_compare
+from dice_roller.RollPlan import compile_plan
+from dice_roller.safe_compare import compile_comparison
+
+# Samples per seeded shard. Shards, not workers, own the RNG streams, so a
+# seed gives the same histogram with any number of workers; changing this
+# changes the results a given seed produces.
+SHARD_SAMPLES = 50_000
+
+
+def shard_seed(seed, index):
+    """Seed of one shard's stream, derived from the run's seed."""
+    return int.from_bytes(hashlib.sha256(f'{seed}/{index}'.encode()).digest()[:8], 'big')
+
+
+def _simulate_shard(limits, dexp, samples, seed):
+    return DiceProbability(limits=limits).simulate(dexp, samples, rng=seed)
 
 
 class DiceProbability:
@@ -16,8 +34,9 @@ class DiceProbability:
     Excludes: exploding (x), reroll (r/ro) - use Monte Carlo for these
     """
 
-    def __init__(self):
-        self.parser = DiceParser()
+    def __init__(self, limits=None):
+        self.limits = Limits() if limits is None else limits
+        self.parser = DiceParser(limits=self.limits)
 
     def analyze(self, dexp):
         """
@@ -41,6 +60,14 @@ class DiceProbability:
         if parsed['types'] != 'int':
             raise ValueError("Probability analysis only supports numeric dice faces.")
 
+        if compile_plan(parsed).subrolls:
+            raise ValueError("Subrolls not supported in exact analysis. Use monte_carlo() instead.")
+
+        # Enumeration too large: reject, or downgrade to Monte Carlo if allowed
+        mode, _estimate = self.limits.admit_analysis(parsed)
+        if mode == 'monte_carlo':
+            return self.monte_carlo(dexp, self.limits.downgrade_samples)
+
         # Get base distribution
         dist = self._base_distribution(parsed)
 
@@ -178,12 +205,10 @@ class DiceProbability:
                 per_die_mod = -per_die_mod
 
         # Success threshold
-        s_op = parsed['s']['operator']
-        s_val = int(parsed['s']['val'])
+        succeeds = compile_comparison(parsed['s']['operator'], int(parsed['s']['val']))
 
         # Count successes per die face (after per-die mod)
-        success_faces = sum(1 for face in sides
-                          if safe_compare(face + per_die_mod, s_op, s_val))
+        success_faces = sum(1 for face in sides if succeeds(face + per_die_mod))
 
         # If keep/drop, enumerate
         if 'k' in parsed or 'd' in parsed:
@@ -209,8 +234,7 @@ class DiceProbability:
             if parsed['b']['operator'] == '-':
                 per_die_mod = -per_die_mod
 
-        s_op = parsed['s']['operator']
-        s_val = int(parsed['s']['val'])
+        succeeds = compile_comparison(parsed['s']['operator'], int(parsed['s']['val']))
 
         if 'k' in parsed:
             keep_n = int(parsed['k']['val'])
@@ -226,20 +250,18 @@ class DiceProbability:
         for roll in it.product(sides, repeat=n):
             sorted_roll = sorted(roll, reverse=keep_high)
             kept = sorted_roll[:keep_n]
-            successes = sum(1 for v in kept
-                          if safe_compare(v + per_die_mod, s_op, s_val))
+            successes = sum(1 for v in kept if succeeds(v + per_die_mod))
             dist[successes] = dist.get(successes, Fraction(0)) + Fraction(1, total_outcomes)
 
         return dist
 
     def _total_check_probability(self, t_parsed, dist):
         """Calculate probability of passing total check."""
-        t_op = t_parsed['operator']
-        t_val = int(t_parsed['val'])
+        passes = compile_comparison(t_parsed['operator'], int(t_parsed['val']))
 
         pass_prob = Fraction(0)
         for total, prob in dist.items():
-            if safe_compare(total, t_op, t_val):
+            if passes(total):
                 pass_prob += prob
 
         return pass_prob
@@ -324,19 +346,49 @@ class DiceProbability:
 
         return '\n'.join(lines)
 
-    def monte_carlo(self, dexp, samples=100000):
+    def monte_carlo(self, dexp, samples=100000, seed=None, workers=None):
         """
         Monte Carlo analysis for complex expressions (exploding, reroll, etc).
         Returns same format as analyze() but with approximate probabilities.
+        Raises DiceException if the run is over this analyzer's limits.
+
+        With a seed, or with workers > 1, the samples are split into shards of
+        SHARD_SAMPLES, each rolled from its own stream derived from the seed
+        (a fresh one if None, reported as 'seed'). workers > 1 rolls the
+        shards in a process pool; the same seed gives identical results
+        whatever the number of workers.
         """
-        dice = DiceThrower()
+        self.limits.admit_monte_carlo(self.parser.parse_input(dexp), samples)
+        if seed is None and (workers is None or workers <= 1):
+            return self.monte_carlo_stats(dexp, self.simulate(dexp, samples), samples)
+
+        if seed is None:
+            seed = random.getrandbits(64)
+        shards = [(self.limits, dexp, min(SHARD_SAMPLES, samples - start), shard_seed(seed, index))
+                  for index, start in enumerate(range(0, samples, SHARD_SAMPLES))]
         results = Counter()
+        if workers is None or workers <= 1 or len(shards) <= 1:
+            for shard in shards:
+                results.update(_simulate_shard(*shard))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+                # map keeps shard order, so the merged Counter is the same too
+                for partial in pool.map(_simulate_shard, *zip(*shards)):
+                    results.update(partial)
+        stats = self.monte_carlo_stats(dexp, results, samples)
+        stats['seed'] = seed
+        return stats
 
-        for _ in range(samples):
-            result = dice.throw(dexp)
-            total = int(result['total'])
-            results[total] += 1
+    def simulate(self, dexp, samples, chunk=10_000, rng=None):
+        """Throw an expression samples times; returns a Counter of totals."""
+        dice = DiceThrower(limits=self.limits, rng=rng)
+        results = Counter()
+        for start in range(0, samples, chunk):
+            results.update(int(total) for total in dice.throw_many(dexp, min(chunk, samples - start)).column('total'))
+        return results
 
+    def monte_carlo_stats(self, dexp, results, samples):
+        """Statistics for a Counter of simulated totals, in the format monte_carlo() returns."""
         # Convert to probability distribution
         dist = {v: Fraction(count, samples) for v, count in results.items()}
 
@@ -372,7 +424,8 @@ class DiceProbability:
 
     def calc(self, op, val, space):
         """Subset of sample space for which a condition is true."""
-        return {element for element in space if safe_compare(element, op, val)}
+        matches = compile_comparison(op, val)
+        return {element for element in space if matches(element)}
 
     def binomial(self, x, y):
         try:
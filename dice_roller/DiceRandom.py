@@ -0,0 +1,204 @@
+"""
+Random number backends for rolling dice.
+
+Anything with ``choice(seq)``, ``randint(a, b)``, ``choices(seq, k=n)`` and
+``random()`` methods can drive a Die, DiceRoller or DiceThrower: the stdlib ``random``
+module (the default), a seeded ``random.Random``, or one of the backends
+here. ``resolve_rng`` turns the values users pass as ``rng=`` into one.
+"""
+import math
+import random
+import threading
+
+
+def resolve_rng(rng=None):
+    """
+    Turn an ``rng=`` argument into a backend.
+
+    Args:
+        rng: None for the global ``random`` module, an int seed for a new
+            ``random.Random``, a ``numpy.random.Generator`` for a NumpyRandom,
+            or any object with choice/randint/choices/random, which is used as-is
+
+    Returns:
+        The backend object
+    """
+    if rng is None:
+        return random
+    if isinstance(rng, int) and not isinstance(rng, bool):
+        return random.Random(rng)
+    if type(rng).__module__.startswith('numpy.random') and hasattr(rng, 'integers'):
+        return NumpyRandom(rng)
+    return rng
+
+
+class NumpyRandom:
+    """
+    Draws from a NumPy Generator in bulk and hands values out one at a time.
+
+    Each die size keeps its own buffer of pre-drawn face indexes, refilled
+    ``buffer_size`` at a time, so single rolls cost a list pop instead of a
+    Generator call. Not safe to share between threads; wrap it in a
+    PerThreadRandom for that.
+
+    Args:
+        generator: numpy.random.Generator, or a seed for one (fresh entropy if None)
+        buffer_size: Draws made per refill
+    """
+
+    def __init__(self, generator=None, buffer_size=4096):
+        import numpy as np
+        if not isinstance(generator, np.random.Generator):
+            generator = np.random.default_rng(generator)
+        self.generator = generator
+        self.buffer_size = buffer_size
+        self._buffers = {}
+
+    def _take(self, size, k):
+        """k uniform ints in [0, size), served from the buffer for that size."""
+        entry = self._buffers.get(size)
+        if entry is None or entry[1] + k > len(entry[0]):
+            fresh = self.generator.integers(0, size, size=max(self.buffer_size, k)).tolist()
+            entry = self._buffers[size] = [fresh if entry is None else entry[0][entry[1]:] + fresh, 0]
+        values, pos = entry
+        entry[1] = pos + k
+        return values[pos:pos + k]
+
+    def _next(self, size):
+        """One uniform int in [0, size)."""
+        entry = self._buffers.get(size)
+        if entry is not None and entry[1] < len(entry[0]):
+            pos = entry[1]
+            entry[1] = pos + 1
+            return entry[0][pos]
+        return self._take(size, 1)[0]
+
+    def randint(self, a, b):
+        return a + self._next(b - a + 1)
+
+    def choice(self, seq):
+        return seq[self._next(len(seq))]
+
+    def choices(self, seq, k=1):
+        return [seq[i] for i in self._take(len(seq), k)]
+
+    def random(self):
+        return self.generator.random()
+
+
+class PerThreadRandom:
+    """
+    Gives each thread its own backend, so threads never share generator state.
+
+    Args:
+        factory: Callable returning a new backend, called once per thread.
+            Defaults to an unseeded random.Random.
+    """
+
+    def __init__(self, factory=random.Random):
+        self.factory = factory
+        self._local = threading.local()
+
+    @property
+    def local(self):
+        """This thread's backend, created on first use."""
+        rng = getattr(self._local, 'rng', None)
+        if rng is None:
+            rng = self._local.rng = self.factory()
+        return rng
+
+    def randint(self, a, b):
+        return self.local.randint(a, b)
+
+    def choice(self, seq):
+        return self.local.choice(seq)
+
+    def choices(self, seq, k=1):
+        return self.local.choices(seq, k=k)
+
+    def random(self):
+        return self.local.random()
+
+
+def binomial(rng, n, p):
+    """
+    Number of successes in n trials of probability p, drawn from an rng backend.
+
+    Uses the backend's own binomialvariate when it has one; otherwise the
+    same algorithms as the stdlib's (Python 3.12+): a geometric method when
+    n * p is small and BTRS transformed rejection otherwise, so the cost does
+    not grow with n.
+    """
+    if p <= 0.0:
+        return 0
+    if p >= 1.0:
+        return n
+    if isinstance(rng, PerThreadRandom):
+        rng = rng.local
+    if isinstance(rng, NumpyRandom):
+        return int(rng.generator.binomial(n, p))
+    if hasattr(rng, 'binomialvariate'):
+        return rng.binomialvariate(n, p)
+    if p > 0.5:
+        return n - binomial(rng, n, 1.0 - p)
+
+    random_ = rng.random
+    if n * p < 10.0:
+        # Devroye's geometric method, O(n * p)
+        x = y = 0
+        c = math.log(1.0 - p)
+        while True:
+            y += math.floor(math.log(random_()) / c) + 1
+            if y > n:
+                return x
+            x += 1
+
+    # BTRS: transformed rejection with squeeze (Hormann)
+    spq = math.sqrt(n * p * (1.0 - p))
+    b = 1.15 + 2.53 * spq
+    a = -0.0873 + 0.0248 * b + 0.01 * p
+    c = n * p + 0.5
+    vr = 0.92 - 4.2 / b
+    alpha = (2.83 + 5.1 / b) * spq
+    lpq = math.log(p / (1.0 - p))
+    m = math.floor((n + 1) * p)
+    h = math.lgamma(m + 1) + math.lgamma(n - m + 1)
+    while True:
+        u = random_() - 0.5
+        us = 0.5 - abs(u)
+        k = math.floor((2.0 * a / us + b) * u + c)
+        if k < 0 or k > n:
+            continue
+        v = random_()
+        if us >= 0.07 and v <= vr:
+            return k
+        v *= alpha / (a / (us * us) + b)
+        if math.log(v) <= h - math.lgamma(k + 1) - math.lgamma(n - k + 1) + (k - m) * lpq:
+            return k
+
+
+def multinomial(rng, n, weights):
+    """
+    Split n draws between outcomes with the given relative weights.
+
+    Returns a list of counts, one per weight, summing to n. Each count is a
+    binomial draw conditioned on the ones before it, so the cost depends on
+    the number of outcomes, not on n.
+    """
+    if isinstance(rng, PerThreadRandom):
+        rng = rng.local
+    if isinstance(rng, NumpyRandom):
+        total = sum(weights)
+        return rng.generator.multinomial(n, [weight / total for weight in weights]).tolist()
+
+    counts = []
+    remaining_weight = sum(weights)
+    for weight in weights:
+        if n == 0 or remaining_weight <= 0:
+            counts.append(0)
+            continue
+        count = binomial(rng, n, weight / remaining_weight)
+        counts.append(count)
+        n -= count
+        remaining_weight -= weight
+    return counts
@@ -1,99 +1,205 @@
-from dice_roller.Die import Die
+import heapq
+from dice_roller.DiceCost import Limits
+from dice_roller.DiceRandom import NumpyRandom, resolve_rng
 from dice_roller.DiceException import DiceException
-from dice_roller.safe_compare import safe_compare, safe_arithmetic
+from dice_roller.RollPlan import compile_plan, bind_subrolls
 
 
 class DiceRoller:
 
-    def __init__(self):
-        pass
+    def __init__(self, limits=None, rng=None):
+        self.limits = Limits() if limits is None else limits
+        self.rng = resolve_rng(rng)
 
+    # methods may be a parsed methods dict or a compiled RollPlan
     def roll(self, methods):
-        sides = methods['sides']
-        number_of_dice = methods['number_of_dice']
+        plan, subrolls = self.bind_subrolls(compile_plan(methods))
 
-        roll = self.roll_die(number_of_dice, sides, methods)
-        roll_mod = self.dropper_keeper(roll, methods)
+        roll = self.roll_die(plan.number_of_dice, plan.sides, plan)
+        roll_mod = self.dropper_keeper(roll, plan)
+        if subrolls:
+            roll_mod['subrolls'] = subrolls
         return roll_mod
 
-    def roll_die(self, number, sides, methods=None):
-        if methods is None:
-            methods = {}
-        dice = {'natural': [], 'modified': []}
-        full_roll = []
-        die = Die(sides)
-
-        for i in range(0, int(number)):
-            die.roll()
-            roll = nroll = die.showing
-
-            # reroll
-            if 'r' in methods:
-                if safe_compare(roll, methods['r']['operator'], methods['r']['val']):
-                    while safe_compare(roll, methods['r']['operator'], methods['r']['val']):
-                        die.roll()
-                        roll = die.showing
-                        if methods['r']['once']:
-                            break
-
-            # boost
-            if 'b' in methods:
-                roll = safe_arithmetic(roll, methods['b']['operator'], methods['b']['val'])
-
-            # explode
-            if 'x' in methods:
-                if safe_compare(roll, methods['x']['operator'], methods['x']['val']):
-                    try:
-                        explode = self.roll_die(1, sides, methods)
-                    except RuntimeError:
-                        raise DiceException('The dice have exploded out of control ruining everything')
-                    if methods['x']['penetrate']:
-                        explode['modified'][0] -= 1
-
-                    if methods['x']['compound']:
-                        roll += explode['modified'][0]
-                    else:
-                        full_roll.append(roll)
-                        full_roll.extend(explode['modified'])
-
-            if full_roll:
-                dice['modified'].extend(full_roll)
-                del full_roll[:]
-                full_roll = []
+    def roll_many(self, methods, count):
+        """
+        Roll the same expression count times; returns a list of roll() results.
+
+        The plan is compiled once and, without subrolls, the first faces of
+        every throw are drawn in a single call.
+        """
+        plan = compile_plan(methods)
+        if plan.subrolls or not plan.number_of_dice:
+            return [self.roll(plan) for _ in range(count)]
+
+        number = plan.number_of_dice
+        pool = self.rng.choices(self.faces(plan.sides), k=number * count)
+        return [self.dropper_keeper(self.roll_die(number, plan.sides, plan, pool[i:i + number]), plan)
+                for i in range(0, number * count, number)]
+
+    def roll_batch(self, methods, trials, rng=None):
+        """
+        Roll an expression ``trials`` times at once with NumPy.
+
+        Returns a dict of 2-D arrays ('natural', 'modified', 'valid', 'kept'),
+        one row per trial; see ``dice_roller.DiceBatch.roll_batch``. If rng is
+        None and this roller uses a NumpyRandom, its Generator is used. The
+        roller's max_chain and max_total_dice limits apply to every trial.
+        """
+        from dice_roller.DiceBatch import roll_batch
+        if rng is None and isinstance(self.rng, NumpyRandom):
+            rng = self.rng.generator
+        return roll_batch(methods, trials, rng, max_chain=self.limits.max_chain,
+                          max_total_dice=self.limits.max_total_dice)
+
+    def bind_subrolls(self, plan):
+        """Roll any subrolls in a plan; returns (plan with values filled in, subroll reports)."""
+        return bind_subrolls(plan, self.roll_subroll)
+
+    def roll_subroll(self, number, sides):
+        """Roll a simple NdS subroll and return the total as an int"""
+        return sum(self.rng.choices(self.faces(sides), k=number))
+
+    @staticmethod
+    def faces(sides):
+        """The faces a die can show: a sides list as given, or 1..sides for a number."""
+        if isinstance(sides, (list, tuple)):
+            return sides
+        elif isinstance(sides, int):
+            return range(1, sides + 1)
+        return (0,)
+
+    def roll_die(self, number, sides, methods=None, natural=None):
+        plan = compile_plan(methods if methods is not None else {})
+        explode_on, boost = plan.x, plan.b
+        faces = self.faces(sides)
+
+        # the whole pool is drawn at once (unless already drawn by roll_many);
+        # only rerolled and exploded dice draw again
+        if natural is None:
+            natural = self.rng.choices(faces, k=int(number))
+
+        if explode_on is None:
+            if plan.r is not None:
+                modified = [self.finish_face(roll, faces, plan) for roll in natural]
+            elif boost is not None and not (boost.val == 0 and boost.operator in '+-'):
+                apply, val = boost.apply, boost.val
+                modified = [apply(roll, val) for roll in natural]
             else:
-                dice['modified'].append(roll)
-                roll = None
+                modified = list(natural)
+            return {'natural': natural, 'modified': modified}
+
+        modified = []
+        choice = self.rng.choice
+        compare, val = explode_on.compare, explode_on.val
+        penetrate = 1 if explode_on.penetrate else 0
+        max_chain, max_total_dice = self.limits.max_chain, self.limits.max_total_dice
+        explosions = deepest = 0
+
+        for nroll in natural:
+            roll = self.finish_face(nroll, faces, plan)
+            if not explode_on.compound:
+                modified.append(roll)
+
+            # each exploded die is rolled like the original and may explode in turn
+            link, chain = roll, 0
+            while compare(link, val):
+                chain += 1
+                explosions += 1
+                deepest = max(deepest, chain)
+                if chain > max_chain or len(natural) + explosions > max_total_dice:
+                    raise DiceException('The dice have exploded out of control ruining everything', {
+                        'reason': 'Explosion chain too long' if chain > max_chain else 'Too many dice rolled',
+                        'explosions': explosions,
+                        'deepest_chain': deepest,
+                    })
+                link = self.finish_face(choice(faces), faces, plan)
+                if explode_on.compound:
+                    roll += link - penetrate
+                else:
+                    modified.append(link - penetrate)
+
+            if explode_on.compound:
+                modified.append(roll)
+
+        return {'natural': natural, 'modified': modified, 'explosions': explosions, 'deepest_chain': deepest}
+
+    def finish_face(self, roll, faces, plan):
+        """Apply rerolls and boost to a face already rolled; returns the final value."""
+        reroll = plan.r
+        if reroll is not None and reroll.compare(roll, reroll.val):
+            if reroll.once:
+                roll = self.rng.choice(faces)
+            elif reroll.keep is not None:
+                # rerolling until no match lands uniformly on the faces that don't match
+                if not reroll.keep:
+                    raise DiceException('Unable to perform roll', 'Reroll matches every face')
+                roll = self.rng.choice(reroll.keep)
+            else:
+                while reroll.compare(roll, reroll.val):
+                    roll = self.rng.choice(faces)
 
-            dice['natural'].append(nroll)
+        boost = plan.b
+        if boost is not None:
+            roll = boost.apply(roll, boost.val)
 
-        return dice
+        return roll
 
     def dropper_keeper(self, roll_result, methods):
-        rolls = roll_result['modified']
+        """
+        Apply keep and drop to a roll.
+
+        The kept dice are always one band of the pool sorted highest first, so
+        they are found with a single heap selection over the smaller side of
+        the band (O(n log k)) rather than by sorting. 'modified' becomes the
+        kept values, ordered as before (by the last of keep/drop applied), and
+        'kept' marks which dice survived, aligned with the dice as rolled:
+        with 'natural', unless explosions added dice, in which case the pool
+        as rolled is kept as 'rolled' and 'kept' lines up with that.
+        """
+        plan = compile_plan(methods)
+        if plan.k is None and plan.d is None:
+            return roll_result
 
-        # first we keep
-        if 'k' in methods:
-            if methods['k']['layer'] == 'low':
-                reverse = False
-            else:
-                reverse = True
-            top_rolls = sorted(rolls, reverse=reverse)[:int(methods['k']['val'])]
-            del rolls[:]
-            rolls = top_rolls
-
-        if 'd' in methods:
-            if methods['d']['layer'] == 'high':
-                reverse = False
+        rolls = roll_result['modified']
+        n = len(rolls)
+
+        # band [top, bottom) of positions in the pool sorted highest first
+        top, bottom = 0, n
+        if plan.k is not None:
+            count = max(0, min(plan.k.val, n))
+            if plan.k.layer == 'low':
+                top = n - count
             else:
-                reverse = True
-            keep = len(rolls) - int(methods['d']['val'])
-            if keep <= 0:
-                rolls = []
+                bottom = count
+        if plan.d is not None:
+            if plan.d.layer == 'high':
+                top = min(top + plan.d.val, bottom)
             else:
-                top_rolls = sorted(rolls, reverse=reverse)[:keep]
-                del rolls[:]
-                rolls = top_rolls
-
-        del roll_result['modified']
-        roll_result['modified'] = rolls
+                bottom = max(bottom - plan.d.val, top)
+
+        # select from whichever end of the pool is closer to the band
+        if bottom <= n - top:
+            chosen = heapq.nlargest(bottom, range(n), key=rolls.__getitem__)[top:]
+            ascending = False
+        else:
+            chosen = heapq.nsmallest(n - top, range(n), key=rolls.__getitem__)[n - bottom:]
+            ascending = True
+
+        # order as the last sort applied did: lowest first for kl or dh, highest first for kh or dl
+        if plan.d is not None:
+            lowest_first = plan.d.layer == 'high'
+        else:
+            lowest_first = plan.k.layer == 'low'
+        if ascending != lowest_first:
+            chosen.reverse()
+
+        kept = [False] * n
+        for i in chosen:
+            kept[i] = True
+
+        roll_result['modified'] = [rolls[i] for i in chosen]
+        roll_result['kept'] = kept
+        if n != len(roll_result['natural']):
+            roll_result['rolled'] = rolls
         return roll_result
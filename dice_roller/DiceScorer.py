@@ -1,14 +1,40 @@
-from dice_roller.safe_compare import safe_compare, safe_arithmetic
+from array import array
+from collections import Counter
+from itertools import repeat
+from dice_roller.RollPlan import compile_plan
+from dice_roller.RollResult import RollResult, compact
 
+# Lists at least this long are counted from a histogram when both conditions
+# are asked of them
+HISTOGRAM_MIN = 32
 
+
+def count_matches(values, first, second):
+    """
+    How many values meet each of two conditions, as a pair (None for a condition that is None).
+
+    A long list with both conditions is tallied once into a histogram and
+    each condition is tested per distinct value; otherwise each condition is
+    one C-level pass of its compare function over the list.
+    """
+    if first is not None and second is not None and len(values) >= HISTOGRAM_MIN:
+        histogram = Counter(values).items()
+        return (sum(n for value, n in histogram if first.compare(value, first.val)),
+                sum(n for value, n in histogram if second.compare(value, second.val)))
+    return (None if first is None else sum(map(first.compare, values, repeat(first.val))),
+            None if second is None else sum(map(second.compare, values, repeat(second.val))))
+
+
+# parsed_roll may be a parsed methods dict or a compiled RollPlan
 class DiceScorer:
 
     def __init__(self):
         pass
 
     def get_roll_total(self, result, parsed_roll):
+        plan = compile_plan(parsed_roll)
 
-        if parsed_roll['types'] != "int" or len(result) == 0:
+        if plan.types != "int" or len(result) == 0:
             return 0
 
         if isinstance(result[0], str):
@@ -16,38 +42,86 @@ class DiceScorer:
         else:
             core = sum(int(i) for i in result)
 
-        if 'l' in parsed_roll:
-            mod_core = safe_arithmetic(core, parsed_roll['l']['operator'], parsed_roll['l']['val'])
+        if plan.l is not None:
+            mod_core = plan.l.apply(core, plan.l.val)
         else:
             mod_core = core
 
         return mod_core
 
     def get_count(self, result, type, parsed_roll):
+        plan = compile_plan(parsed_roll)
+        condition = getattr(plan, type) if type in plan._fields else None
         counter = 0
-        if type in parsed_roll:
+        if condition is not None:
+            compare, val = condition.compare, condition.val
             for i in result:
-                if safe_compare(i, parsed_roll[type]['operator'], parsed_roll[type]['val']):
+                if compare(i, val):
                     counter += 1
         return counter
 
+    def score(self, result, parsed_roll):
+        """
+        Score a roll as numbers.
+
+        Returns:
+            tuple: (total, success, fail, nf, ns, passed), None for any count
+            the expression doesn't ask for
+        """
+        plan = compile_plan(parsed_roll)
+        if plan.types != "int":
+            return 0, None, None, None, None, None
+
+        # the same numbers as get_roll_total and get_count, with each list read once
+        modified = result['modified']
+        if not modified:
+            total = 0
+        else:
+            # a '/' boost leaves Fractions, which count towards the total truncated
+            total = sum(map(int, modified)) if plan.b is not None and plan.b.operator == '/' else sum(modified)
+            if plan.l is not None:
+                total = plan.l.apply(total, plan.l.val)
+
+        success, fail = count_matches(modified, plan.s, plan.f)
+        if plan.nf is None and plan.ns is None:
+            nf = ns = None
+        else:
+            nf, ns = count_matches(result['natural'], plan.nf, plan.ns)
+        if success is None:
+            success = 0
+        passed = plan.t.compare(total, plan.t.val) if plan.t is not None else None
+        return total, success, fail, nf, ns, passed
+
     def get_result(self, dexp, result, parsed_roll):
+        total, success, fail, nf, ns, passed = self.score(result, parsed_roll)
 
         rep = {}
         rep.update({'roll': dexp})
         rep.update(result)
-        total = self.get_roll_total(result['modified'], parsed_roll)
         rep.update({'total': str(total)})
 
-        if parsed_roll['types'] == "int":
-            rep.update({'success': str(self.get_count(result['modified'], 's', parsed_roll))})
-            if 'f' in parsed_roll:
-                rep.update({'fail': str(self.get_count(result['modified'], 'f', parsed_roll))})
-            if 'nf' in parsed_roll:
-                rep.update({'nf': str(self.get_count(result['natural'], 'nf', parsed_roll))})
-            if 'ns' in parsed_roll:
-                rep.update({'ns': str(self.get_count(result['natural'], 'ns', parsed_roll))})
-            if 't' in parsed_roll:
-                passed = safe_compare(total, parsed_roll['t']['operator'], parsed_roll['t']['val'])
-                rep.update({'pass': '1' if passed else '0'})
+        if success is not None:
+            rep.update({'success': str(success)})
+        if fail is not None:
+            rep.update({'fail': str(fail)})
+        if nf is not None:
+            rep.update({'nf': str(nf)})
+        if ns is not None:
+            rep.update({'ns': str(ns)})
+        if passed is not None:
+            rep.update({'pass': '1' if passed else '0'})
         return rep
+
+    def get_roll_result(self, dexp, result, parsed_roll):
+        """Like get_result, but returns a compact RollResult with numeric fields."""
+        total, success, fail, nf, ns, passed = self.score(result, parsed_roll)
+        kept = result.get('kept')
+        return RollResult(
+            dexp, compact(result['natural']), compact(result['modified']), total,
+            success, fail, nf, ns, passed,
+            kept=array('b', kept) if kept is not None else None,
+            rolled=compact(result.get('rolled')),
+            explosions=result.get('explosions'),
+            deepest_chain=result.get('deepest_chain'),
+            subrolls=result.get('subrolls'),
+        )
@@ -0,0 +1,309 @@
+"""
+Running statistics over a stream of throws.
+
+A RollAggregator takes results one at a time or in batches and keeps only
+fixed-size state: Welford moments for totals and successes, a few counters,
+and a histogram that never holds more than ``max_bins`` bins. When totals
+spread wider than that (long exploding chains), neighbouring bins are merged
+by doubling the bin width, so quantiles become approximate but memory stays
+bounded. Every piece is mergeable, so aggregators built on different shards,
+threads or processes (they pickle) can be combined with ``merge``.
+"""
+from fractions import Fraction
+from math import floor, sqrt
+from dice_roller.RollResult import RollBatch
+
+
+def _number(value):
+    """A result field as a number; the legacy dicts hold strings such as '37' or '7/2'."""
+    if isinstance(value, str):
+        value = Fraction(value)
+        return value.numerator if value.denominator == 1 else value
+    return value
+
+
+class RunningMoments:
+    """Count, mean, variance, min and max of a stream, updated in O(1) memory (Welford/Chan)."""
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += float(delta) / self.count
+        self.m2 += float(delta) * float(value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def add_many(self, values):
+        """Add a batch: its own moments first, then one merge."""
+        values = list(values)
+        if not values:
+            return
+        batch = RunningMoments()
+        batch.count = len(values)
+        batch.mean = float(sum(values)) / batch.count
+        batch.m2 = float(sum((float(value) - batch.mean) ** 2 for value in values))
+        batch.min = min(values)
+        batch.max = max(values)
+        self.merge(batch)
+
+    def merge(self, other):
+        """Fold another RunningMoments into this one."""
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2, self.min, self.max = other.count, other.mean, other.m2, other.min, other.max
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance, as DiceProbability reports it."""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return sqrt(self.variance)
+
+
+class BoundedHistogram:
+    """
+    Counts per value, in at most max_bins bins.
+
+    Bins start one value wide. When there are more than max_bins of them the
+    width doubles and neighbours merge, so every bin covers
+    [start, start + width) with start a multiple of width.
+
+    Args:
+        max_bins: Most bins held at once
+    """
+
+    __slots__ = ('max_bins', 'width', 'bins', 'count')
+
+    def __init__(self, max_bins=256):
+        if max_bins < 2:
+            raise ValueError('A histogram needs at least 2 bins')
+        self.max_bins = max_bins
+        self.width = 1
+        self.bins = {}
+        self.count = 0
+
+    def add(self, value, count=1):
+        start = floor(value / self.width) * self.width
+        self.bins[start] = self.bins.get(start, 0) + count
+        self.count += count
+        if len(self.bins) > self.max_bins:
+            self._coarsen(self.width * 2)
+
+    def add_many(self, values):
+        width, bins = self.width, self.bins
+        for value in values:
+            start = floor(value / width) * width
+            bins[start] = bins.get(start, 0) + 1
+            self.count += 1
+            if len(bins) > self.max_bins:
+                self._coarsen(width * 2)
+                width, bins = self.width, self.bins
+
+    def _coarsen(self, width):
+        while True:
+            bins = {}
+            for start, count in self.bins.items():
+                merged = floor(start / width) * width
+                bins[merged] = bins.get(merged, 0) + count
+            self.bins, self.width = bins, width
+            if len(bins) <= self.max_bins:
+                return
+            width *= 2
+
+    def merge(self, other):
+        """Fold another histogram into this one, at the wider of the two bin widths."""
+        if other.width > self.width:
+            self._coarsen(other.width)
+        for start, count in other.bins.items():
+            merged = floor(start / self.width) * self.width
+            self.bins[merged] = self.bins.get(merged, 0) + count
+        self.count += other.count
+        if len(self.bins) > self.max_bins:
+            self._coarsen(self.width * 2)
+        return self
+
+    def quantile(self, q):
+        """
+        Value below which a fraction q of the counts fall.
+
+        Exact while bins are one value wide; otherwise interpolated within the bin.
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for start in sorted(self.bins):
+            count = self.bins[start]
+            if seen + count >= target:
+                if self.width == 1:
+                    return start
+                return start + (target - seen) / count * self.width
+            seen += count
+        return max(self.bins) + self.width - 1
+
+    def as_dict(self):
+        """{bin start: count}, in order."""
+        return dict(sorted(self.bins.items()))
+
+
+class RollAggregator:
+    """
+    Running statistics over DiceThrower results.
+
+    Takes RollResults (throw_result, throw_many, stream) or the legacy dicts
+    from throw(), one at a time with ``add`` or as any iterable with
+    ``add_many``. Keeps:
+
+    - totals: Welford moments and a bounded histogram
+    - successes: moments per throw and per die (successes / modified dice)
+    - pass rate, for expressions with a total check
+    - crit and fumble rates, from the natural counters ns and nf
+      (e.g. 1d20ns20nf1): the share of throws with at least one
+
+    Args:
+        max_bins: Most bins in the totals histogram
+    """
+
+    def __init__(self, max_bins=256):
+        self.totals = RunningMoments()
+        self.histogram = BoundedHistogram(max_bins)
+        self.successes = RunningMoments()
+        self.dice = 0
+        self.success_dice = 0
+        self.checked = 0
+        self.passed = 0
+        self.crit_throws = 0
+        self.crits = 0
+        self.fumble_throws = 0
+        self.fumbles = 0
+        self.errors = 0
+
+    @property
+    def count(self):
+        return self.totals.count
+
+    def add(self, result):
+        """
+        Add one RollResult or legacy result dict.
+
+        The 'Bad roll expression - ...' strings throw() returns are not added;
+        they are counted in ``errors``.
+
+        Raises:
+            TypeError: If result is neither a result nor a throw() error string
+        """
+        if isinstance(result, str):
+            self.errors += 1
+            return
+        if hasattr(result, 'get'):
+            total = result.get('total')
+        else:
+            total = getattr(result, 'total', None)
+        if total is None:
+            raise TypeError(f'Not a roll result: {result!r}')
+        total = _number(total)
+        self.totals.add(total)
+        self.histogram.add(total)
+        self._add_counts(result)
+
+    def add_many(self, results):
+        """
+        Add every result of an iterable, e.g. a RollBatch or a slice of a stream.
+
+        A RollBatch's totals go in as one column rather than one at a time.
+        """
+        if isinstance(results, RollBatch):
+            totals = results.column('total')
+            self.totals.add_many(totals)
+            self.histogram.add_many(totals)
+            for result in results:
+                self._add_counts(result)
+            return
+        for result in results:
+            self.add(result)
+
+    def _add_counts(self, result):
+        if hasattr(result, 'get'):
+            field = result.get
+            passed = field('pass')
+            passed = None if passed is None else passed == '1'
+        else:
+            def field(name):
+                return getattr(result, name)
+            passed = result.passed
+
+        success = field('success')
+        if success is not None:
+            success = _number(success)
+            self.successes.add(success)
+            self.success_dice += success
+            # successes are counted over the modified dice (exploded and kept)
+            self.dice += len(field('modified'))
+        if passed is not None:
+            self.checked += 1
+            self.passed += passed
+        ns = field('ns')
+        if ns is not None:
+            self.crit_throws += 1
+            self.crits += _number(ns) > 0
+        nf = field('nf')
+        if nf is not None:
+            self.fumble_throws += 1
+            self.fumbles += _number(nf) > 0
+
+    def merge(self, other):
+        """Fold another aggregator (e.g. from another shard) into this one."""
+        self.totals.merge(other.totals)
+        self.histogram.merge(other.histogram)
+        self.successes.merge(other.successes)
+        for name in ('dice', 'success_dice', 'checked', 'passed', 'crit_throws', 'crits',
+                     'fumble_throws', 'fumbles', 'errors'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def summary(self):
+        """The current statistics as a dict."""
+        def rate(hits, out_of):
+            return hits / out_of if out_of else None
+
+        totals = self.totals
+        return {
+            'count': totals.count,
+            'errors': self.errors,
+            'mean': totals.mean,
+            'variance': totals.variance,
+            'std': totals.std,
+            'min': totals.min,
+            'max': totals.max,
+            'percentiles': {pct: self.histogram.quantile(pct / 100) for pct in (25, 50, 75, 90, 99)},
+            'histogram': self.histogram.as_dict(),
+            'bin_width': self.histogram.width,
+            'success_mean': self.successes.mean if self.successes.count else None,
+            'success_rate': rate(self.success_dice, self.dice),
+            'pass_rate': rate(self.passed, self.checked),
+            'crit_rate': rate(self.crits, self.crit_throws),
+            'fumble_rate': rate(self.fumbles, self.fumble_throws),
+        }
@@ -1,47 +1,297 @@
+from dice_roller.DiceCost import Limits, estimate_throw
+from dice_roller.DiceEquation import evaluate
 from dice_roller.DiceParser import DiceParser
+from dice_roller.DicePool import DicePool
 from dice_roller.DiceRoller import DiceRoller
 from dice_roller.DiceScorer import DiceScorer
 from dice_roller.DiceException import DiceException
-from dice_roller.safe_compare import safe_eval_arithmetic
+from dice_roller.RollPlan import bind_subrolls, compile_plan
+from dice_roller.RollResult import RollBatch
 
 
 class DiceThrower:
+    """
+    Parses, rolls and scores dice expressions.
 
-    def __init__(self):
-        self.parser = DiceParser()
-        self.roller = DiceRoller()
+    A thrower keeps no per-throw state: everything about a throw, subrolls
+    included, is in the value returned, so one thrower can be shared between
+    threads. Each throw method takes an optional ``rng=`` (anything accepted
+    by ``resolve_rng``) to use for that call only; otherwise the thrower's
+    own backend is used. Pass ``rng=PerThreadRandom()`` to give every thread
+    its own generator state.
+    """
+
+    def __init__(self, limits=None, rng=None):
+        self.limits = Limits() if limits is None else limits
+        self.parser = DiceParser(limits=self.limits)
+        self.roller = DiceRoller(limits=self.limits, rng=rng)
+        self.pool = DicePool(self.limits, self.roller.rng)
+        self.pool_parser = DiceParser(cache=self.parser.cache, engine=self.parser.engine,
+                                      limits=self.limits.for_pools())
         self.scorer = DiceScorer()
-        self.result = []
 
-    def throw(self, dexp='1d1'):
+    def roller_for(self, rng=None):
+        """This thrower's roller, or a roller drawing from rng for a single call."""
+        return self.roller if rng is None else DiceRoller(limits=self.limits, rng=rng)
+
+    def throw(self, dexp='1d1', rng=None):
 
-        # parse
         try:
-            parsed_roll = self.parser.parse_input(dexp)
+            # parse
+            parsed_roll = self.plan(dexp)
+
+            # roll dice
+            parsed_roll, result = self.roll(parsed_roll, self.roller_for(rng))
         except DiceException:
             return 'Bad roll expression - ' + dexp
 
-        # roll dice
-        result = self.roller.roll(parsed_roll)
-        self.result = result
-
         # score
         score = self.scorer.get_result(dexp, result, parsed_roll)
 
         return score
 
-    def throw_string(self, deq):
+    def throw_result(self, dexp='1d1', rng=None):
+        """
+        Throw an expression and return a compact RollResult.
+
+        Raises:
+            DiceException: If the expression is bad or over this thrower's limits
+        """
+        parsed_roll, result = self.roll(self.plan(dexp), self.roller_for(rng))
+        return self.scorer.get_roll_result(dexp, result, parsed_roll)
+
+    def throw_many(self, dexp, count, rng=None):
+        """
+        Throw one expression count times.
+
+        The expression is parsed, compiled and admitted once, and the first
+        faces of every throw are drawn together.
+
+        Returns:
+            RollBatch of count RollResults
+
+        Raises:
+            DiceException: If the expression is bad or over this thrower's limits
+        """
+        plan = self.plan(dexp)
+        roller = self.roller_for(rng)
+        if plan.subrolls:
+            return RollBatch([self.scorer.get_roll_result(dexp, result, bound)
+                              for bound, result in (self.roll(plan, roller) for _ in range(count))])
+        return RollBatch([self.scorer.get_roll_result(dexp, result, plan)
+                          for result in roller.roll_many(plan, count)])
+
+    def throw_all(self, dexps, rng=None):
+        """
+        Throw each expression in a list once, in order.
+
+        Each distinct expression is parsed and admitted once, before anything
+        is rolled; repeats are rolled together as in throw_many.
+
+        Returns:
+            RollBatch with one RollResult per expression
+
+        Raises:
+            DiceException: If any expression is bad or over this thrower's limits
+        """
+        dexps = list(dexps)
+        positions = {}
+        for i, dexp in enumerate(dexps):
+            positions.setdefault(dexp, []).append(i)
+        plans = {dexp: self.plan(dexp) for dexp in positions}
+        roller = self.roller_for(rng)
+
+        results = [None] * len(dexps)
+        for dexp, indexes in positions.items():
+            if len(indexes) == 1:
+                bound, result = self.roll(plans[dexp], roller)
+                results[indexes[0]] = self.scorer.get_roll_result(dexp, result, bound)
+                continue
+            for i, result in zip(indexes, self.throw_many(dexp, len(indexes), roller.rng)):
+                results[i] = result
+        return RollBatch(results)
+
+    def throw_each(self, dexps, rng=None, catch=(DiceException, ArithmeticError, ValueError)):
+        """
+        Throw each expression in a list once, like throw_all, but past failures.
+
+        A bad expression, or one whose roll fails (runaway explosions, division
+        by zero), gives its exception in place of a result; the rest are still
+        thrown. Rolls go through one throw_all call unless one of them fails
+        part way, in which case the good expressions are thrown one at a time.
+
+        Args:
+            dexps: Dice expressions
+            rng: Backend for this call (this thrower's if None)
+            catch: Exception types reported in place of a result
+
+        Returns:
+            list: a RollResult or an exception per expression, in order
+        """
+        dexps = list(dexps)
+        errors = {}
+        for dexp in dict.fromkeys(dexps):
+            try:
+                self.plan(dexp)
+            except catch as e:
+                errors[dexp] = e
+        good = [dexp for dexp in dexps if dexp not in errors]
+        if rng is not None:
+            # one stream for the batch and any fallback throws
+            rng = self.roller_for(rng).rng
+        try:
+            thrown = list(self.throw_all(good, rng=rng))
+        except catch:
+            thrown = []
+            for dexp in good:
+                try:
+                    thrown.append(self.throw_result(dexp, rng=rng))
+                except catch as e:
+                    thrown.append(e)
+        thrown = iter(thrown)
+        return [errors[dexp] if dexp in errors else next(thrown) for dexp in dexps]
+
+    def stream(self, dexp, chunk=1024, only=None, rng=None):
+        """
+        Throw one expression over and over, yielding each result as it comes.
+
+        The expression is parsed and admitted once, up front, and the first
+        faces are drawn chunk throws at a time. Memory is bounded by one
+        chunk, not constant: each chunk's faces and rolls are allocated
+        afresh and freed once the stream has moved past them.
+
+        Args:
+            dexp: Dice expression
+            chunk: Throws rolled per draw
+            only: None to yield RollResults, or 'total' or 'success' to yield
+                just that number for each throw
+            rng: Backend for this stream (this thrower's if None)
+
+        Returns:
+            An endless generator
+
+        Raises:
+            DiceException: If the expression is bad or over this thrower's limits
+            ValueError: If only isn't None, 'total' or 'success', or chunk is below 1
+        """
+        if only not in (None, 'total', 'success'):
+            raise ValueError(f"Unknown stream field: {only!r}")
+        if chunk < 1:
+            raise ValueError(f"Stream chunk must be at least 1, not {chunk!r}")
+        return self._stream(dexp, self.plan(dexp), self.roller_for(rng), chunk, only)
+
+    def _stream(self, dexp, plan, roller, chunk, only):
+        if only == 'total':
+            def make(bound, result):
+                return self.scorer.get_roll_total(result['modified'], bound)
+        elif only == 'success':
+            def make(bound, result):
+                return self.scorer.get_count(result['modified'], 's', bound)
+        else:
+            def make(bound, result):
+                return self.scorer.get_roll_result(dexp, result, bound)
+
+        while True:
+            if plan.subrolls:
+                for _ in range(chunk):
+                    yield make(*self.roll(plan, roller))
+            else:
+                for result in roller.roll_many(plan, chunk):
+                    yield make(plan, result)
+
+    def throw_pool(self, dexp, rng=None):
+        """
+        Throw a huge pool as face counts, e.g. 100000d6>=5.
+
+        The pool is rolled by DicePool in time and memory proportional to the
+        number of faces, within the limits' max_pool_dice and max_pool_sides.
+        Returns the same string-valued dict as throw(), with 'natural' and
+        'modified' as {value: count} histograms (modified holds the kept
+        dice), or a message if the expression can't be thrown this way.
+        """
+        roller = self.roller_for(rng)
+        pool = self.pool if rng is None else DicePool(self.limits, roller.rng)
+        try:
+            parsed_roll = compile_plan(self.pool_parser.parse_input(dexp))
+            if not estimate_throw(parsed_roll).terminates:
+                raise DiceException('Unable to perform roll', 'Roll can never finish')
+            # subrolls may be pool-sized too, so they are rolled as counts as well
+            parsed_roll, subrolls = bind_subrolls(parsed_roll, pool.roll_subroll)
+            result = pool.roll(parsed_roll)
+        except DiceException:
+            return 'Bad roll expression - ' + dexp
+
+        kept = pool.keep(result['modified'], parsed_roll)
+        total, success, fail, nf, ns, passed = pool.score(result['natural'], kept, parsed_roll)
+
+        rep = {'roll': dexp, 'natural': dict(sorted(result['natural'].items())),
+               'modified': dict(sorted(kept.items()))}
+        for key in ('explosions', 'deepest_chain'):
+            if key in result:
+                rep[key] = result[key]
+        if subrolls:
+            rep['subrolls'] = subrolls
+        rep['total'] = str(total)
+        rep['success'] = str(success)
+        for key, value in (('fail', fail), ('nf', nf), ('ns', ns)):
+            if value is not None:
+                rep[key] = str(value)
+        if passed is not None:
+            rep['pass'] = '1' if passed else '0'
+        return rep
+
+    def plan(self, dexp):
+        """Parse, compile and admit an expression; raises DiceException if it can't be thrown."""
+        parsed_roll = compile_plan(self.parser.parse_input(dexp))
+        self.limits.admit_throw(parsed_roll)
+        return parsed_roll
+
+    def roll(self, parsed_roll, roller=None):
+        """
+        Roll a compiled plan; subrolls are rolled fresh on every throw.
+
+        Args:
+            parsed_roll: Compiled plan
+            roller: DiceRoller to roll with (this thrower's if None)
+
+        Returns:
+            tuple: (plan with subroll values bound, roll result)
+        """
+        roller = self.roller if roller is None else roller
+        parsed_roll, subrolls = roller.bind_subrolls(parsed_roll)
+        result = roller.roll(parsed_roll)
+        if subrolls:
+            result['subrolls'] = subrolls
+        return parsed_roll, result
+
+    def throw_string(self, deq, rng=None):
+        """
+        Roll every dice term of an equation such as '(2d6 + 3) * 2 + 1d8 - 1d4' and evaluate it.
+
+        The equation is compiled once (and cached) into a tree; each throw
+        rolls the terms and walks the tree. A term repeated in the text is
+        rolled once per occurrence.
+
+        Returns:
+            tuple: (value of the equation, one dict per dice term in order
+            with its 'term' text, 'start'/'stop' positions, 'result' of the
+            roll and the term's 'total')
 
-        parsed_equation = self.parser.parse_expression_from_equation(deq)
-        mod_deq = deq
-        for roll in parsed_equation:
-            result = self.roller.roll(parsed_equation[roll][0])
-            parsed_equation[roll].append(result)
+        Raises:
+            DiceException: If the equation is bad, a term is over limits, or it divides by zero
+        """
+        equation = self.parser.compile_equation(deq)
+        for term in equation.terms:
+            self.limits.admit_throw(term.plan)
+        roller = self.roller_for(rng)
 
-            total = self.scorer.get_roll_total(
-                result['modified'], parsed_equation[roll][0]
-            )
-            mod_deq = mod_deq.replace(roll, str(total))
+        breakdown = []
+        totals = []
+        for term in equation.terms:
+            _bound, result = self.roll(term.plan, roller)
+            total = self.scorer.get_roll_total(result['modified'], term.plan)
+            totals.append(total)
+            breakdown.append({'term': term.text, 'start': term.start, 'stop': term.stop,
+                              'result': result, 'total': total})
 
-        full_result = safe_eval_arithmetic(mod_deq)
-        return full_result, parsed_equation
+        return evaluate(equation.root, totals), breakdown
@@ -3,16 +3,17 @@ import random
 
 class Die:
 
-    def __init__(self, sides):
+    def __init__(self, sides, rng=None):
         self.sides = sides
+        self.rng = random if rng is None else rng
         self.showing = 0
         self.roll()
 
     def roll(self):
-        if isinstance(self.sides, list):
-            roll = random.choice(self.sides)
+        if isinstance(self.sides, (list, tuple)):
+            roll = self.rng.choice(self.sides)
         elif isinstance(self.sides, int):
-            roll = int(random.randint(1, int(self.sides)))
+            roll = int(self.rng.randint(1, int(self.sides)))
         else:
             roll = 0
         self.showing = roll
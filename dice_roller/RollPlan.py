@@ -0,0 +1,157 @@
+"""
+Immutable, compiled form of a parsed dice expression.
+
+``DiceParser.parse_input`` returns a dict of operator strings and stringified
+values (``{'operator': '>=', 'val': '5'}``). ``compile_plan`` resolves that
+once into a RollPlan: plain tuples holding integer values and the operator
+functions themselves, so rolling and scoring never re-interpret strings.
+
+Plans are hashable and picklable (every field is a tuple, a number, a string
+or a module-level function), so they can be cached, used as dict keys and
+shipped to worker processes.
+"""
+from collections import namedtuple
+from fractions import Fraction
+from dice_roller.safe_compare import COMPARISON_OPERATORS, ARITHMETIC_OPERATORS
+
+# Fields are named after the methods dict keys they are compiled from.
+RollPlan = namedtuple('RollPlan', [
+    'number_of_dice', 'sides', 'types',
+    'b', 'l',               # per-die boost, total modifier
+    's', 'f', 'ns', 'nf',   # counters
+    't',                    # total check
+    'r', 'x',               # reroll, explode
+    'k', 'd',               # keep, drop
+    'subrolls',             # fields whose val is a Subroll, bound at roll time
+])
+
+Comparison = namedtuple('Comparison', ['operator', 'compare', 'val'])
+Arithmetic = namedtuple('Arithmetic', ['operator', 'apply', 'val'])
+# keep holds the faces a reroll-until can land on (those not matching), so the
+# final face is one draw from them; None until a subroll value is bound
+Reroll = namedtuple('Reroll', ['operator', 'compare', 'val', 'once', 'keep'])
+Explode = namedtuple('Explode', ['operator', 'compare', 'val', 'compound', 'penetrate'])
+Pool = namedtuple('Pool', ['val', 'layer'])
+
+# A value that is rolled at throw time, e.g. the 1d4 in 1d20=+1d4. Its value is
+# offset plus the sum of its terms; each term is (operator, number, sides) and
+# counts negatively only for a '=-' total modifier.
+Subroll = namedtuple('Subroll', ['terms', 'offset'])
+
+# Division keeps exact precision, as safe_arithmetic does
+_ARITHMETIC = {**ARITHMETIC_OPERATORS, '/': Fraction}
+
+_COMPARISONS = ('s', 'f', 'ns', 'nf', 't')
+
+
+def _int(value):
+    if value is None or isinstance(value, Subroll):
+        return value
+    return int(value)
+
+
+def _kept_faces(sides, compare, val):
+    if not isinstance(sides, tuple) or isinstance(val, Subroll):
+        return None
+    return tuple(face for face in sides if not compare(face, val))
+
+
+def _compare_fn(op_str):
+    op_str = str(op_str).strip()
+    if op_str not in COMPARISON_OPERATORS:
+        raise ValueError(f"Invalid comparison operator: {op_str!r}")
+    return op_str, COMPARISON_OPERATORS[op_str]
+
+
+def _arithmetic_fn(op_str):
+    op_str = str(op_str).strip()
+    if op_str not in _ARITHMETIC:
+        raise ValueError(f"Invalid arithmetic operator: {op_str!r}")
+    return op_str, _ARITHMETIC[op_str]
+
+
+def compile_plan(methods):
+    """
+    Compile a ``methods`` dict from ``DiceParser.parse_input`` into a RollPlan.
+
+    Args:
+        methods: Parsed methods dict (a RollPlan is returned unchanged)
+
+    Returns:
+        RollPlan
+
+    Raises:
+        ValueError: If an operator is not in the whitelist
+    """
+    if isinstance(methods, RollPlan):
+        return methods
+
+    fields = dict.fromkeys(RollPlan._fields)
+
+    number = methods.get('number_of_dice')
+    fields['number_of_dice'] = _int(number)
+    sides = methods.get('sides')
+    fields['sides'] = tuple(sides) if isinstance(sides, list) else sides
+    fields['types'] = methods.get('types')
+
+    for key in ('b', 'l'):
+        if key in methods:
+            symbol, apply = _arithmetic_fn(methods[key]['operator'])
+            fields[key] = Arithmetic(symbol, apply, _int(methods[key]['val']))
+
+    for key in _COMPARISONS:
+        if key in methods:
+            symbol, compare = _compare_fn(methods[key]['operator'])
+            fields[key] = Comparison(symbol, compare, _int(methods[key]['val']))
+
+    if 'r' in methods:
+        symbol, compare = _compare_fn(methods['r']['operator'])
+        val = _int(methods['r']['val'])
+        keep = _kept_faces(fields['sides'], compare, val) if fields['types'] == 'int' else None
+        fields['r'] = Reroll(symbol, compare, val, bool(methods['r']['once']), keep)
+
+    if 'x' in methods:
+        x = methods['x']
+        symbol, compare = _compare_fn(x['operator'])
+        fields['x'] = Explode(symbol, compare, _int(x['val']), bool(x['compound']), bool(x['penetrate']))
+
+    for key in ('k', 'd'):
+        if key in methods:
+            fields[key] = Pool(_int(methods[key]['val']), methods[key]['layer'])
+
+    fields['subrolls'] = tuple(key for key in RollPlan._fields[3:-1]
+                               if fields[key] is not None and isinstance(fields[key].val, Subroll))
+
+    return RollPlan(**fields)
+
+
+def bind_subrolls(plan, roll):
+    """
+    Roll a plan's subrolls and substitute their results.
+
+    Args:
+        plan: RollPlan, possibly with Subroll values
+        roll: Callable taking (number, sides) and returning the total rolled
+
+    Returns:
+        tuple: (RollPlan without subrolls, list of subroll reports), where each
+        report is {'expression': 'NdS', 'result': int, 'operator': str}
+    """
+    if not plan.subrolls:
+        return plan, []
+
+    reports = []
+    bound = {'subrolls': ()}
+    for key in plan.subrolls:
+        node = getattr(plan, key)
+        value = node.val.offset
+        for op, number, sides in node.val.terms:
+            result = roll(number, sides)
+            reports.append({'expression': f'{number}d{sides}', 'result': result, 'operator': op})
+            value += -result if op == '=-' else result
+        bound[key] = node._replace(val=value)
+        if key == 'r':
+            bound[key] = bound[key]._replace(keep=_kept_faces(plan.sides, node.compare, value))
+
+    return plan._replace(**bound), reports
+
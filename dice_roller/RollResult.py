@@ -0,0 +1,184 @@
+"""
+Compact result of one throw.
+
+``DiceThrower.throw`` returns a dict with every number turned into a string
+(``'total': '37'``). A RollResult holds the same information in ``__slots__``
+with numeric fields, and stores the dice in ``array.array`` buffers where they
+are plain integers, so keeping millions of results costs a fraction of the
+memory. ``as_dict()`` gives a read-only, dict-like view in the old format
+without copying the dice. A RollBatch holds the results of many throws.
+"""
+from array import array
+from collections.abc import Mapping
+from fractions import Fraction
+
+
+def compact(values):
+    """Store dice as an int64 array, or as a tuple if any value isn't a plain int."""
+    if values is None:
+        return None
+    try:
+        return array('q', values)
+    except (TypeError, OverflowError):
+        return tuple(values)
+
+
+def to_json(value):
+    """``json.dumps`` default for results: arrays as lists, Fractions as floats, anything else as a string."""
+    if isinstance(value, array):
+        return value.tolist()
+    if isinstance(value, Fraction):
+        return float(value)
+    return str(value)
+
+
+def _string(value):
+    return str(value)
+
+
+def _flag(value):
+    return '1' if value else '0'
+
+
+def _same(value):
+    return value
+
+
+def _flags(values):
+    return [bool(value) for value in values]
+
+
+# legacy key -> (slot, formatter), in the order DiceThrower.throw reports them
+_LEGACY_FIELDS = {
+    'roll': ('roll', _same),
+    'natural': ('natural', _same),
+    'modified': ('modified', _same),
+    'explosions': ('explosions', _same),
+    'deepest_chain': ('deepest_chain', _same),
+    'kept': ('kept', _flags),
+    'rolled': ('rolled', _same),
+    'subrolls': ('subrolls', _same),
+    'total': ('total', _string),
+    'success': ('success', _string),
+    'fail': ('fail', _string),
+    'nf': ('nf', _string),
+    'ns': ('ns', _string),
+    'pass': ('passed', _flag),
+}
+
+
+class RollResult:
+    """
+    One scored throw.
+
+    Numbers are ints (a '/' boost gives Fraction dice, but the total is
+    truncated to an int), dice are arrays from ``compact``, kept is an array
+    of 0/1 flags, and fields that don't apply to the expression are None.
+    """
+
+    __slots__ = ('roll', 'natural', 'modified', 'total', 'success', 'fail', 'nf', 'ns', 'passed',
+                 'kept', 'rolled', 'explosions', 'deepest_chain', 'subrolls')
+
+    def __init__(self, roll, natural, modified, total=0, success=None, fail=None, nf=None, ns=None,
+                 passed=None, kept=None, rolled=None, explosions=None, deepest_chain=None, subrolls=None):
+        self.roll = roll
+        self.natural = natural
+        self.modified = modified
+        self.total = total
+        self.success = success
+        self.fail = fail
+        self.nf = nf
+        self.ns = ns
+        self.passed = passed
+        self.kept = kept
+        self.rolled = rolled
+        self.explosions = explosions
+        self.deepest_chain = deepest_chain
+        self.subrolls = subrolls
+
+    def as_dict(self):
+        """A read-only view in the string-valued format of ``DiceThrower.throw``."""
+        return RollResultView(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, RollResult):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f'{slot}={getattr(self, slot)!r}' for slot in self.__slots__
+                           if getattr(self, slot) is not None)
+        return f'RollResult({fields})'
+
+
+class RollResultView(Mapping):
+    """
+    Dict-like view of a RollResult with the legacy keys and string numbers.
+
+    Values are produced on access; the dice are the result's own arrays,
+    which index and iterate like the lists the old dicts held. 'kept' is
+    turned back into a list of bools, as throw() reports it.
+    """
+
+    __slots__ = ('result',)
+
+    def __init__(self, result):
+        self.result = result
+
+    def __getitem__(self, key):
+        try:
+            slot, formatter = _LEGACY_FIELDS[key]
+        except KeyError:
+            raise KeyError(key) from None
+        value = getattr(self.result, slot)
+        if value is None:
+            raise KeyError(key)
+        return formatter(value)
+
+    def __iter__(self):
+        result = self.result
+        return (key for key, (slot, _) in _LEGACY_FIELDS.items() if getattr(result, slot) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class RollBatch:
+    """
+    Results of many throws, as returned by DiceThrower.throw_many and throw_all.
+
+    A sequence of RollResults (indexing, iteration and len work as on a list),
+    plus whole-batch columns of the numeric fields.
+    """
+
+    __slots__ = ('results',)
+
+    def __init__(self, results):
+        self.results = results
+
+    def __len__(self):
+        return len(self.results)
+
+    def __getitem__(self, index):
+        return self.results[index]
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def column(self, field):
+        """One numeric field of every result, e.g. column('success'), as a list (None where absent)."""
+        return [getattr(result, field) for result in self.results]
+
+    def totals(self):
+        """Every result's total, as an int64 array where they are all ints."""
+        return compact(self.column('total'))
+
+    def as_dicts(self):
+        """Legacy string-valued views of every result."""
+        return [result.as_dict() for result in self.results]
+
+    def __repr__(self):
+        return f'RollBatch({self.results!r})'
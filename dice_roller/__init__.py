@@ -1,6 +1,24 @@
-from . import DiceProbability
-from . import DiceRoller
-from . import DiceParser
-from . import DiceThrower
-from . import DiceScorer
-from . import Die
+# Submodules load on first attribute access (dice_roller.DiceThrower etc.), so
+# importing the package, or just the roller, doesn't pay for the rest of it.
+import importlib
+
+__all__ = [
+    'DiceProbability',
+    'DiceRoller',
+    'DiceParser',
+    'DiceThrower',
+    'DiceScorer',
+    'Die',
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        module = importlib.import_module(f'{__name__}.{name}')
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,172 @@
+"""
+Bulk rolling from the command line.
+
+    python -m dice_roller [FILE] [-o OUT] [--jobs N] [--chunk LINES] [--seed SEED]
+
+Reads one expression per line from FILE (stdin if omitted or '-') and writes
+one JSON object per line to OUT (stdout): the ``throw()`` dict for the
+expression, or ``{"roll": ..., "error": ...}`` if it can't be thrown (plus a
+"detail" with the DiceException's reason where there is one). A line
+may also be JSON, either a string or an object with an "expression" field.
+Blank lines are skipped.
+
+Lines are read and rolled ``--chunk`` at a time, so memory stays bounded
+however long the input. ``--jobs N`` rolls chunks in N processes, keeping at
+most 2N chunks in flight, and writes them in input order. With ``--seed``
+each chunk rolls from its own stream derived from the seed, so the output is
+the same for any number of jobs. A throughput summary goes to stderr at the
+end.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceProbability import shard_seed
+from dice_roller.DiceThrower import DiceThrower
+from dice_roller.RollResult import to_json
+
+# One thrower per process, so its parse cache stays warm across chunks
+_thrower = None
+
+
+def thrower():
+    global _thrower
+    if _thrower is None:
+        _thrower = DiceThrower()
+    return _thrower
+
+
+def expression(line):
+    """The expression on an input line: plain text, a JSON string, or a JSON object's "expression"."""
+    if line[0] in '{"':
+        value = json.loads(line)
+        return value['expression'] if isinstance(value, dict) else value
+    return line
+
+
+def error_row(roll, error):
+    """The output row for a line that can't be thrown; DiceException details go in 'detail'."""
+    if isinstance(error, DiceException):
+        return {'roll': roll, 'error': str(error), 'detail': error.errors}
+    if isinstance(error, (ArithmeticError, KeyError)):
+        return {'roll': roll, 'error': f'{type(error).__name__}: {error}'}
+    return {'roll': roll, 'error': str(error)}
+
+
+def roll_chunk(lines, index, seed=None):
+    """
+    Roll one chunk of input lines.
+
+    Returns:
+        tuple: (JSON-lines text, lines rolled, lines that failed)
+    """
+    dice = thrower()
+    rng = None if seed is None else random.Random(shard_seed(seed, index))
+    rows = [None] * len(lines)
+    good = []
+    # each distinct line is decoded once per chunk
+    decoded = {}
+    for i, line in enumerate(lines):
+        if line not in decoded:
+            try:
+                decoded[line] = expression(line), None
+            except (ValueError, KeyError, TypeError) as e:
+                decoded[line] = line, e
+        dexp, error = decoded[line]
+        if error is None:
+            good.append((i, dexp))
+        else:
+            rows[i] = error_row(line, error)
+
+    results = dice.throw_each([dexp for _, dexp in good], rng=rng)
+    for (i, dexp), result in zip(good, results):
+        rows[i] = error_row(dexp, result) if isinstance(result, Exception) else result.as_dict()
+
+    errors = sum(1 for row in rows if 'error' in row)
+    text = ''.join(json.dumps(dict(row), default=to_json) + '\n' for row in rows)
+    return text, len(rows), errors
+
+
+def chunks(stream, size):
+    """Non-blank stripped lines of stream, in lists of up to size."""
+    chunk = []
+    for line in stream:
+        line = line.strip()
+        if line:
+            chunk.append(line)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(source, out, jobs=1, chunk=1000, seed=None):
+    """
+    Roll every line of source and write the results to out in order.
+
+    Returns:
+        tuple: (lines rolled, lines that failed)
+    """
+    total = errors = 0
+
+    def write(done):
+        nonlocal total, errors
+        text, count, failed = done
+        out.write(text)
+        total += count
+        errors += failed
+
+    work = enumerate(chunks(source, chunk))
+    if jobs <= 1:
+        for index, lines in work:
+            write(roll_chunk(lines, index, seed))
+        return total, errors
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for index, lines in work:
+            pending.append(pool.submit(roll_chunk, lines, index, seed))
+            if len(pending) >= 2 * jobs:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return total, errors
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    stdin, stdout, stderr = stdin or sys.stdin, stdout or sys.stdout, stderr or sys.stderr
+    parser = argparse.ArgumentParser(prog='python -m dice_roller', description='Roll dice expressions in bulk')
+    parser.add_argument('input', nargs='?', default='-', help='file of expressions, one per line (default: stdin)')
+    parser.add_argument('-o', '--output', default='-', help='file for JSON-lines results (default: stdout)')
+    parser.add_argument('--jobs', type=int, default=1, help='processes to roll in (default: 1)')
+    parser.add_argument('--chunk', type=int, default=1000, help='lines rolled per chunk (default: 1000)')
+    parser.add_argument('--seed', type=int, default=None, help='seed for reproducible output')
+    args = parser.parse_args(argv)
+    if args.chunk < 1 or args.jobs < 1:
+        parser.error('--chunk and --jobs must be at least 1')
+
+    source = stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    out = stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    start = time.perf_counter()
+    try:
+        total, errors = run(source, out, args.jobs, args.chunk, args.seed)
+    finally:
+        if source is not stdin:
+            source.close()
+        if out is not stdout:
+            out.close()
+        else:
+            out.flush()
+    seconds = time.perf_counter() - start
+    rate = total / seconds if seconds else 0
+    print(f'{total} lines ({errors} errors) in {seconds:.2f}s, {rate:,.0f} lines/s', file=stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
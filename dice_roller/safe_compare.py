@@ -27,71 +27,154 @@ ARITHMETIC_OPERATORS = {
 }
 
 
-def safe_compare(left, op_str, right):
+# Operands that _to_number returns unchanged; compiled closures skip the call for them
+_NUMBER_TYPES = frozenset((int, float, Fraction))
+
+# Most distinct (operator, right operand) pairs kept compiled, per kind; a full memo starts over
+COMPILED_CACHE_SIZE = 1024
+
+
+def compile_comparison(op_str, right):
     """
-    Safely compare two values using an operator string.
+    Compile a comparison against a fixed right operand into a one-argument predicate.
 
-    This replaces patterns like:
-        sympy.sympify(str(roll) + operator + val)
+    The operator is validated and the right operand converted once, so calling
+    the result costs one function call and the comparison itself. Compiled
+    predicates are memoized per (op_str, right).
+
+    Example:
+        at_least_5 = compile_comparison('>=', 5)
+        at_least_5(6)  # True, same as safe_compare(6, '>=', 5)
 
     Args:
-        left: Left operand (number)
         op_str: Operator string (one of: >, <, >=, <=, =, ==, !=)
         right: Right operand (number or string that can be converted)
 
     Returns:
-        bool: Result of comparison
+        callable: predicate(left) -> bool
 
     Raises:
         ValueError: If operator is not in whitelist
     """
+    return _memoized(_compiled_comparisons, _comparison, op_str, right)
+
+
+def compile_arithmetic(op_str, right):
+    """
+    Compile arithmetic with a fixed right operand into a one-argument function.
+
+    The arithmetic counterpart of compile_comparison: validated and converted
+    once, memoized per (op_str, right). Division returns a Fraction.
+
+    Args:
+        op_str: Operator string (one of: +, -, *, /)
+        right: Right operand (number or string that can be converted)
+
+    Returns:
+        callable: apply(left) -> number
+
+    Raises:
+        ValueError: If operator is not in whitelist
+    """
+    return _memoized(_compiled_arithmetic, _arithmetic, op_str, right)
+
+
+def _comparison(op_str, right):
     op_str = str(op_str).strip()
     if op_str not in COMPARISON_OPERATORS:
         raise ValueError(f"Invalid comparison operator: {op_str!r}")
-
     op_func = COMPARISON_OPERATORS[op_str]
+    right_val = _to_number(right)
+
+    def compare(left):
+        if left.__class__ not in _NUMBER_TYPES:
+            left = _to_number(left)
+        return op_func(left, right_val)
+    return compare
 
-    # Convert to numeric types for comparison
-    # Handle sympy Rational, Fraction, int, float, str
-    left_val = _to_number(left)
+
+def _arithmetic(op_str, right):
+    op_str = str(op_str).strip()
+    if op_str not in ARITHMETIC_OPERATORS:
+        raise ValueError(f"Invalid arithmetic operator: {op_str!r}")
+    # Use Fraction for division to maintain exact precision (like sympify did)
+    op_func = Fraction if op_str == '/' else ARITHMETIC_OPERATORS[op_str]
     right_val = _to_number(right)
 
-    return op_func(left_val, right_val)
+    def apply(left):
+        if left.__class__ not in _NUMBER_TYPES:
+            left = _to_number(left)
+        return op_func(left, right_val)
+    return apply
 
 
-def safe_arithmetic(left, op_str, right):
+# (op_str, right, type of right) -> closure. The type is part of the key so 1,
+# 1.0 and True compile separately: 2 + 1 and 2 + 1.0 differ in type.
+_compiled_comparisons = {}
+_compiled_arithmetic = {}
+
+
+def _memoized(compiled, compile_fn, op_str, right):
+    key = (op_str, right, right.__class__)
+    try:
+        return compiled[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # unhashable operand: compile without memoizing
+        return compile_fn(op_str, right)
+    fn = compile_fn(op_str, right)
+    if len(compiled) >= COMPILED_CACHE_SIZE:
+        compiled.clear()
+    compiled[key] = fn
+    return fn
+
+
+def safe_compare(left, op_str, right):
     """
-    Safely perform arithmetic on two values.
+    Safely compare two values using an operator string.
 
     This replaces patterns like:
         sympy.sympify(str(roll) + operator + val)
 
+    Compiles (or reuses) compile_comparison(op_str, right); code comparing
+    many values against the same operand should compile once and call that.
+
     Args:
         left: Left operand (number)
-        op_str: Operator string (one of: +, -, *, /)
+        op_str: Operator string (one of: >, <, >=, <=, =, ==, !=)
         right: Right operand (number or string that can be converted)
 
     Returns:
-        Numeric result (Fraction for division to maintain precision)
+        bool: Result of comparison
 
     Raises:
         ValueError: If operator is not in whitelist
     """
-    op_str = str(op_str).strip()
-    if op_str not in ARITHMETIC_OPERATORS:
-        raise ValueError(f"Invalid arithmetic operator: {op_str!r}")
+    return compile_comparison(op_str, right)(left)
 
-    op_func = ARITHMETIC_OPERATORS[op_str]
 
-    # Convert to numeric types
-    left_val = _to_number(left)
-    right_val = _to_number(right)
+def safe_arithmetic(left, op_str, right):
+    """
+    Safely perform arithmetic on two values.
 
-    # Use Fraction for division to maintain exact precision (like sympify did)
-    if op_str == '/':
-        return Fraction(left_val, right_val)
+    This replaces patterns like:
+        sympy.sympify(str(roll) + operator + val)
 
-    return op_func(left_val, right_val)
+    Compiles (or reuses) compile_arithmetic(op_str, right).
+
+    Args:
+        left: Left operand (number)
+        op_str: Operator string (one of: +, -, *, /)
+        right: Right operand (number or string that can be converted)
+
+    Returns:
+        Numeric result (Fraction for division to maintain precision)
+
+    Raises:
+        ValueError: If operator is not in whitelist
+    """
+    return compile_arithmetic(op_str, right)(left)
 
 
 def safe_eval_arithmetic(expression):
@@ -0,0 +1,421 @@
+"""
+Local HTTP/JSON roll service.
+
+Run with ``python -m dice_roller.serve [--host 127.0.0.1] [--port 8765]``.
+Uses only asyncio and the standard library. Endpoints (GET takes the same
+fields as query parameters, POST as a JSON object):
+
+    /throw         expression, or expression + count, or expressions (a list)
+    /throw_string  equation
+    /analyze       expression
+    /monte_carlo   expression, samples, seed
+    /health        status, uptime, request and cache counters
+    /latency       p50/p90/p99/max milliseconds per endpoint
+
+Single throws arriving together are batched: the service waits
+``batch_window`` seconds (or until ``max_batch`` are queued) and throws them
+all with one ``throw_all`` call, so repeated expressions are parsed once and
+rolled together. Identical analyses in flight at the same time share one
+computation, and exact analyses and seeded Monte Carlo runs are kept in an
+LRU of results. Heavy work, including a ``count`` or list of throws expected
+to draw more dice than DiceAsync's ``inline_draws``, runs through DiceAsync,
+off the event loop. The
+process-wide parse cache stays warm for the life of the server; ``--warm``
+pre-parses expressions at startup.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, OrderedDict, deque
+from urllib.parse import parse_qsl, urlsplit
+from dice_roller.DiceAsync import DiceAsync
+from dice_roller.DiceCost import Limits, estimate_throw
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceParser import default_parse_cache
+from dice_roller.DiceThrower import DiceThrower
+from dice_roller.RollResult import to_json
+
+MAX_BODY = 1 << 20
+MAX_HEADERS = 100
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def _throw_many(limits, dexp, count):
+    return [dict(result.as_dict()) for result in DiceThrower(limits=limits).throw_many(dexp, count)]
+
+
+def _throw_all(limits, dexps):
+    return [dict(result.as_dict()) for result in DiceThrower(limits=limits).throw_all(dexps)]
+
+
+def text_field(fields, name):
+    """A request field that must be a string, such as an expression."""
+    value = fields[name]
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be a string')
+    return value
+
+
+class LatencyTracker:
+    """Recent request latencies per endpoint, in a bounded window."""
+
+    def __init__(self, window=2000):
+        self.window = window
+        self.samples = {}
+
+    def record(self, route, seconds):
+        samples = self.samples.get(route)
+        if samples is None:
+            samples = self.samples[route] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def summary(self):
+        report = {}
+        for route, samples in self.samples.items():
+            ordered = sorted(samples)
+            n = len(ordered)
+            report[route] = {'count': n, 'max_ms': ordered[-1] * 1000}
+            for q in (50, 90, 99):
+                report[route][f'p{q}_ms'] = ordered[min(n - 1, n * q // 100)] * 1000
+        return report
+
+
+class RollService:
+    """
+    Request handling behind the HTTP layer: batching, coalescing and caching.
+
+    Args:
+        limits: Limits for every throw and analysis
+        executor: concurrent.futures executor for heavy work (see DiceAsync)
+        max_concurrent: Most heavy jobs running at once
+        batch_window: Seconds to gather single throws before rolling them together
+        max_batch: Throws that trigger a batch before the window ends
+        max_results: Analyses kept in the result cache
+        max_count: Most throws one request may ask for
+    """
+
+    def __init__(self, limits=None, executor=None, max_concurrent=4, batch_window=0.001, max_batch=512,
+                 max_results=256, max_count=10_000):
+        self.limits = Limits() if limits is None else limits
+        self.thrower = DiceThrower(limits=self.limits)
+        self.dice = DiceAsync(limits=self.limits, executor=executor, max_concurrent=max_concurrent)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_results = max_results
+        self.max_count = max_count
+        self.latency = LatencyTracker()
+        self.started = time.monotonic()
+        self.counters = {'requests': 0, 'errors': 0, 'batches': 0, 'batched_throws': 0,
+                         'coalesced': 0, 'result_hits': 0}
+        self._pending = []
+        self._flush_handle = None
+        self._inflight = {}
+        self._results = OrderedDict()
+
+    def warm(self, expressions):
+        """Parse expressions ahead of the first request for them."""
+        for dexp in expressions:
+            try:
+                self.thrower.plan(dexp)
+            except DiceException:
+                pass
+
+    # -- throws --
+
+    async def throw(self, dexp):
+        """One throw, rolled in the next batch."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((dexp, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self.flush)
+        return await future
+
+    def flush(self):
+        """Throw every queued expression with one throw_all call."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            self._throw_batch(batch)
+        except Exception as e:
+            # flush runs from a loop callback: nothing may leave a request waiting forever
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        self.counters['batches'] += 1
+        self.counters['batched_throws'] += len(batch)
+
+    def _throw_batch(self, batch):
+        # a bad expression fails only its own requests, not the whole batch
+        results = self.thrower.throw_each([dexp for dexp, _ in batch], catch=Exception)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(dict(result.as_dict()))
+
+    def check_count(self, count):
+        if not 0 <= count <= self.max_count:
+            raise DiceException('Unable to perform roll', f'Throw count must be 0 to {self.max_count}')
+
+    def is_cheap(self, counts):
+        """Whether throwing each expression its count of times is cheap enough for the event loop."""
+        draws = sum(estimate_throw(self.thrower.plan(dexp)).expected_draws * count for dexp, count in counts.items())
+        return draws <= self.dice.inline_draws
+
+    async def throw_many(self, dexp, count):
+        """count throws of one expression, in the executor unless they are cheap."""
+        self.check_count(count)
+        if self.is_cheap({dexp: count}):
+            return [dict(result.as_dict()) for result in self.thrower.throw_many(dexp, count)]
+        return await self.dice.run_heavy(_throw_many, self.limits, dexp, count)
+
+    async def throw_all(self, dexps):
+        """One throw of each expression, in the executor unless they are cheap."""
+        if not isinstance(dexps, list) or not all(isinstance(dexp, str) for dexp in dexps):
+            raise ValueError('expressions must be a list of strings')
+        self.check_count(len(dexps))
+        if self.is_cheap(Counter(dexps)):
+            return [dict(result.as_dict()) for result in self.thrower.throw_all(dexps)]
+        return await self.dice.run_heavy(_throw_all, self.limits, dexps)
+
+    async def throw_string(self, deq):
+        total, terms = await self.dice.athrow_string(deq)
+        return {'total': total, 'terms': terms}
+
+    # -- analyses --
+
+    async def coalesce(self, key, start, cache=True):
+        """
+        Await the computation for key, sharing it with identical requests in flight.
+
+        A finished result is kept in the LRU when cache is true. The shared task
+        is shielded, so one caller going away doesn't cancel it for the rest.
+        """
+        if key in self._results:
+            self._results.move_to_end(key)
+            self.counters['result_hits'] += 1
+            return self._results[key]
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(start())
+            task.add_done_callback(lambda done: self._finished(key, done, cache))
+        else:
+            self.counters['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task, cache):
+        self._inflight.pop(key, None)
+        if cache and not task.cancelled() and task.exception() is None:
+            self._results[key] = task.result()
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    async def analyze(self, dexp):
+        return await self.coalesce(('analyze', dexp), lambda: self.dice.aanalyze(dexp))
+
+    async def monte_carlo(self, dexp, samples=100000, seed=None):
+        # unseeded runs are shared while in flight but never cached
+        return await self.coalesce(('monte_carlo', dexp, samples, seed),
+                                   lambda: self.dice.amonte_carlo(dexp, samples, seed=seed), cache=seed is not None)
+
+    # -- status --
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'uptime': time.monotonic() - self.started,
+            **self.counters,
+            'pending_throws': len(self._pending),
+            'inflight_analyses': len(self._inflight),
+            'cached_results': len(self._results),
+            'parse_cache': default_parse_cache.stats(),
+        }
+
+    # -- dispatch --
+
+    async def handle(self, route, fields):
+        """
+        Answer one request.
+
+        Returns:
+            tuple: (HTTP status, JSON-serializable body)
+        """
+        try:
+            if route == '/throw':
+                if 'expressions' in fields:
+                    return 200, await self.throw_all(fields['expressions'])
+                if 'count' in fields:
+                    return 200, await self.throw_many(text_field(fields, 'expression'), int(fields['count']))
+                return 200, await self.throw(text_field(fields, 'expression'))
+            if route == '/throw_string':
+                return 200, await self.throw_string(text_field(fields, 'equation'))
+            if route == '/analyze':
+                return 200, await self.analyze(text_field(fields, 'expression'))
+            if route == '/monte_carlo':
+                seed = fields.get('seed')
+                return 200, await self.monte_carlo(text_field(fields, 'expression'), int(fields.get('samples', 100000)),
+                                                   None if seed is None else int(seed))
+            if route == '/health':
+                return 200, self.health()
+            if route == '/latency':
+                return 200, self.latency.summary()
+        except DiceException as e:
+            return 400, {'error': str(e), 'detail': e.errors}
+        except KeyError as e:
+            return 400, {'error': f'Missing field {e.args[0]!r}'}
+        except (ValueError, TypeError, ArithmeticError) as e:
+            return 400, {'error': str(e) or type(e).__name__}
+        return 404, {'error': f'Unknown endpoint {route!r}'}
+
+
+async def read_request(reader):
+    """
+    Read one HTTP/1.1 request.
+
+    Returns:
+        tuple: (method, target, headers, body), or None when the client has gone
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _version = line.decode('latin-1').split()
+    except ValueError:
+        raise ValueError('Malformed request line')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise ValueError('Too many headers')
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        raise OverflowError('Request body too large')
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, headers, body
+
+
+def write_response(writer, status, body, keep_alive):
+    payload = json.dumps(body, default=to_json).encode()
+    writer.write(
+        f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+        f'Content-Type: application/json\r\n'
+        f'Content-Length: {len(payload)}\r\n'
+        f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + payload
+    )
+
+
+def request_fields(method, target, body):
+    """The request's fields: query parameters, then the JSON body on top."""
+    url = urlsplit(target)
+    fields = dict(parse_qsl(url.query))
+    if method == 'POST' and body:
+        posted = json.loads(body)
+        if not isinstance(posted, dict):
+            raise ValueError('Request body must be a JSON object')
+        fields.update(posted)
+    return url.path, fields
+
+
+async def handle_connection(service, reader, writer):
+    """Serve requests on one connection until the client closes it."""
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except OverflowError as e:
+                write_response(writer, 413, {'error': str(e)}, False)
+                break
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                write_response(writer, 400, {'error': str(e) or 'Malformed request'}, False)
+                break
+            if request is None:
+                break
+            method, target, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+
+            start = time.perf_counter()
+            service.counters['requests'] += 1
+            if method not in ('GET', 'POST'):
+                status, payload = 405, {'error': f'Method {method} not allowed'}
+                route = None
+            else:
+                try:
+                    route, fields = request_fields(method, target, body)
+                except ValueError as e:
+                    status, payload, route = 400, {'error': f'Bad JSON: {e}'}, None
+                else:
+                    try:
+                        status, payload = await service.handle(route, fields)
+                    except Exception as e:
+                        status, payload = 500, {'error': f'{type(e).__name__}: {e}'}
+            if status != 200:
+                service.counters['errors'] += 1
+            if route is not None and status != 404:
+                service.latency.record(route, time.perf_counter() - start)
+
+            write_response(writer, status, payload, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(service, host='127.0.0.1', port=8765):
+    """Start listening; returns the asyncio Server (port 0 picks a free port)."""
+    return await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dice_roller.serve', description='Local dice roll service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processes', type=int, default=0,
+                        help='process pool size for heavy analyses (default: a thread pool)')
+    parser.add_argument('--max-concurrent', type=int, default=4)
+    parser.add_argument('--batch-window-ms', type=float, default=1.0)
+    parser.add_argument('--warm', default='', help='comma-separated expressions to parse at startup')
+    args = parser.parse_args(argv)
+
+    async def run():
+        executor = None
+        if args.processes:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=args.processes)
+        service = RollService(executor=executor, max_concurrent=args.max_concurrent,
+                              batch_window=args.batch_window_ms / 1000)
+        service.warm(dexp for dexp in args.warm.split(',') if dexp)
+        server = await start_server(service, args.host, args.port)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f'Serving dice on http://{host}:{port}', flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -16,9 +16,11 @@ setup(
         'dice_roller',
     ],
     install_requires=[
-        'sympy',
         'pyparsing'
     ],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     package_dir={'rpg-dice': 'dice_roller'},
     include_package_data=True,
     license='MIT',
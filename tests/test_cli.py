@@ -0,0 +1,53 @@
+"""Tests for python -m dice_roller bulk rolling."""
+import io
+import itertools
+import json
+from dice_roller.__main__ import chunks, main
+
+LINES = ['3d6', '', '4d6kh3', 'nonsense', '"2d6"', '{"expression": "1d20=+1d4"}', '1d6x>=1'] * 30
+
+
+def roll(lines, *args):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    assert main(list(args), stdin=io.StringIO('\n'.join(lines)), stdout=stdout, stderr=stderr) == 0
+    return [json.loads(row) for row in stdout.getvalue().splitlines()], stderr.getvalue()
+
+
+class TestBulkRolling:
+    """JSON-lines results, in input order."""
+
+    def test_one_row_per_line(self):
+        rows, summary = roll(LINES, '--chunk', '4')
+        assert [row['roll'] for row in rows[:6]] == ['3d6', '4d6kh3', 'nonsense', '2d6', '1d20=+1d4', '1d6x>=1']
+        assert len(rows) == 180
+        assert 'error' in rows[2] and 'error' in rows[5]
+        assert len(rows[1]['modified']) == 3 and rows[4]['subrolls'][0]['expression'] == '1d4'
+        assert summary.startswith('180 lines (60 errors)')
+
+    def test_lines_failing_while_rolling(self):
+        rows, summary = roll(['1d6', '1d6/0', '2d6', '1d6x>=1', '3d6'])
+        assert [row['roll'] for row in rows] == ['1d6', '1d6/0', '2d6', '1d6x>=1', '3d6']
+        assert ['error' in row for row in rows] == [False, True, False, True, False]
+        assert summary.startswith('5 lines (2 errors)')
+
+    def test_error_detail(self):
+        rows, _ = roll(['200d100x>=2', '1d6x>=1'])
+        assert rows[0]['detail'] == 'Roll too expensive'
+        assert rows[1]['detail'] == 'Roll can never finish'
+
+    def test_seed_reproducible_across_jobs(self):
+        serial, _ = roll(LINES, '--seed', '5', '--chunk', '7')
+        assert roll(LINES, '--seed', '5', '--chunk', '7')[0] == serial
+        assert roll(LINES, '--seed', '5', '--chunk', '7', '--jobs', '3')[0] == serial
+
+    def test_files(self, tmp_path):
+        source, target = tmp_path / 'in.txt', tmp_path / 'out.jsonl'
+        source.write_text('1d6\n2d8\n')
+        _, summary = roll([], str(source), '-o', str(target))
+        assert [json.loads(row)['roll'] for row in target.read_text().splitlines()] == ['1d6', '2d8']
+        assert summary.startswith('2 lines')
+
+    def test_input_read_lazily(self):
+        endless = (f'{n % 6 + 1}d6\n' for n in itertools.count())
+        first = next(chunks(endless, 100))
+        assert len(first) == 100
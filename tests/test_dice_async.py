@@ -0,0 +1,182 @@
+"""Tests for the asyncio API."""
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pytest
+import dice_roller.DiceAsync as DiceAsync_module
+from dice_roller.DiceAsync import DiceAsync
+from dice_roller.DiceCost import Limits
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceProbability import DiceProbability
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Thread pool that counts submitted jobs."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jobs = 0
+
+    def submit(self, *args, **kwargs):
+        self.jobs += 1
+        return super().submit(*args, **kwargs)
+
+
+@pytest.fixture
+def executor():
+    with RecordingExecutor(max_workers=2) as pool:
+        yield pool
+
+
+class TestInline:
+    """Cheap work runs on the loop without touching the executor."""
+
+    def test_athrow(self, executor):
+        dice = DiceAsync(executor=executor)
+        result = run(dice.athrow('10d6>=5'))
+        assert len(result['natural']) == 10
+        assert executor.jobs == 0
+
+    def test_athrow_bad_expression(self, executor):
+        assert 'Bad roll' in run(DiceAsync(executor=executor).athrow('nonsense'))
+
+    def test_athrow_string(self, executor):
+        total, terms = run(DiceAsync(executor=executor).athrow_string('2d6 + 3'))
+        assert 5 <= total <= 15
+        assert executor.jobs == 0
+
+    def test_small_analysis(self, executor):
+        stats = run(DiceAsync(executor=executor).aanalyze('3d6'))
+        assert stats['mean'] == pytest.approx(10.5)
+        assert executor.jobs == 0
+
+
+class TestHeavy:
+    """Expensive work goes to the executor."""
+
+    def test_expensive_throw(self, executor):
+        dice = DiceAsync(executor=executor, inline_draws=10)
+        result = run(dice.athrow('20d6x>=6'))
+        assert len(result['natural']) == 20
+        assert executor.jobs == 1
+
+    def test_large_analysis(self, executor):
+        dice = DiceAsync(executor=executor, inline_enumeration=100)
+        stats = run(dice.aanalyze('4d6kh3'))
+        assert stats['mean'] == pytest.approx(12.24, abs=0.01)
+        assert executor.jobs == 1
+
+    def test_monte_carlo_chunks(self, executor):
+        dice = DiceAsync(executor=executor, chunk_samples=1000)
+        stats = run(dice.amonte_carlo('3d6', samples=5500))
+        assert stats['samples'] == 5500
+        assert sum(stats['distribution'].values()) == 1
+        assert executor.jobs == 6
+
+    def test_seeded_monte_carlo_matches_sync(self, executor):
+        stats = run(DiceAsync(executor=executor).amonte_carlo('3d6x>=6', samples=2000, seed=3))
+        assert stats['distribution'] == DiceProbability().monte_carlo('3d6x>=6', samples=2000, seed=3)['distribution']
+        assert stats['seed'] == 3
+
+    def test_monte_carlo_limits(self, executor):
+        dice = DiceAsync(limits=Limits(max_simulation_draws=100), executor=executor)
+        with pytest.raises(DiceException):
+            run(dice.amonte_carlo('3d6', samples=1000))
+
+    def test_process_executor(self):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            dice = DiceAsync(executor=pool, inline_enumeration=100, chunk_samples=500)
+            stats = run(dice.aanalyze('4d6kh3'))
+            assert stats['mean'] == pytest.approx(12.24, abs=0.01)
+            assert run(dice.amonte_carlo('2d6', samples=1000))['samples'] == 1000
+
+
+class TestScheduling:
+    """Concurrency limit, cancellation and loop responsiveness."""
+
+    def test_concurrency_limit(self, monkeypatch):
+        lock = threading.Lock()
+        active, peak = [0], [0]
+
+        def slow_simulate(limits, dexp, samples, rng=None):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return Counter({3: samples})
+
+        monkeypatch.setattr(DiceAsync_module, '_simulate', slow_simulate)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            dice = DiceAsync(executor=pool, max_concurrent=2, chunk_samples=100)
+
+            async def main():
+                await asyncio.gather(*(dice.amonte_carlo('3d6', samples=300) for _ in range(6)))
+
+            run(main())
+        assert peak[0] == 2
+
+    def test_cancelled_jobs_keep_their_slot(self, monkeypatch):
+        lock = threading.Lock()
+        active, peak = [0], [0]
+
+        def slow_analyze(limits, dexp):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return {'mean': 0}
+
+        monkeypatch.setattr(DiceAsync_module, '_analyze', slow_analyze)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            dice = DiceAsync(executor=pool, max_concurrent=1, inline_enumeration=0)
+
+            async def main():
+                for _ in range(4):
+                    task = asyncio.create_task(dice.aanalyze('3d6'))
+                    await asyncio.sleep(0.01)
+                    task.cancel()
+                await dice.aanalyze('3d6')
+
+            run(main())
+        assert peak[0] == 1
+
+    def test_cancel_monte_carlo(self, executor):
+        dice = DiceAsync(executor=executor, chunk_samples=1000)
+
+        async def main():
+            task = asyncio.create_task(dice.amonte_carlo('10d6', samples=10 ** 7))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        run(main())
+        # cancellation stopped the chunked run long before 10,000 chunks
+        assert executor.jobs < 1000
+
+    def test_plain_rolls_not_blocked(self, executor):
+        dice = DiceAsync(executor=executor, chunk_samples=5000)
+
+        async def main():
+            heavy = asyncio.create_task(dice.amonte_carlo('10d6x>=5', samples=40000))
+            latencies = []
+            while not heavy.done():
+                start = time.perf_counter()
+                await dice.athrow('1d20')
+                await asyncio.sleep(0)
+                latencies.append(time.perf_counter() - start)
+            await heavy
+            return latencies
+
+        latencies = run(main())
+        assert latencies and max(latencies) < 0.5
@@ -0,0 +1,121 @@
+"""Tests for NumPy batch rolling."""
+import numpy as np
+import pytest
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceParser import DiceParser
+from dice_roller.DiceRoller import DiceRoller
+
+TRIALS = 20000
+
+
+@pytest.fixture
+def parser():
+    return DiceParser()
+
+
+@pytest.fixture
+def roller():
+    return DiceRoller()
+
+
+def batch_totals(batch):
+    return np.where(batch['kept'], batch['modified'], 0).sum(axis=1)
+
+
+def loop_mean(roller, plan, throws=TRIALS):
+    return sum(sum(roller.roll(plan)['modified']) for _ in range(throws)) / throws
+
+
+class TestShapes:
+    """roll_batch returns one row per trial."""
+
+    def test_plain_pool(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('3d6'), 100, rng=1)
+        assert batch['natural'].shape == (100, 3)
+        assert batch['modified'].shape == (100, 3)
+        assert batch['valid'].all() and batch['kept'].all()
+        assert batch['natural'].min() >= 1 and batch['natural'].max() <= 6
+
+    def test_accepts_methods_dict(self, parser, roller):
+        batch = roller.roll_batch(parser.parse_input('2d{1,3,5}'), 50, rng=1)
+        assert set(np.unique(batch['natural'])) <= {1, 3, 5}
+
+    def test_seed_is_reproducible(self, parser, roller):
+        plan = parser.compile('10d6x>=5kh3')
+        first, second = roller.roll_batch(plan, 100, rng=7), roller.roll_batch(plan, 100, rng=7)
+        for key in first:
+            assert np.array_equal(first[key], second[key])
+
+    def test_string_faces(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('3d{a,b}'), 10, rng=1)
+        assert set(np.unique(batch['natural'])) <= {'a', 'b'}
+
+
+class TestModifiers:
+    """Reroll, boost, explode and keep/drop follow DiceRoller.roll."""
+
+    def test_boost(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('4d6+2'), 100, rng=1)
+        assert np.array_equal(batch['modified'], batch['natural'] + 2)
+
+    def test_division_boost_is_float(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('4d6/2'), 100, rng=1)
+        assert np.allclose(batch['modified'], batch['natural'] / 2)
+
+    def test_reroll_until(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('6d6r<3'), 1000, rng=1)
+        assert batch['modified'].min() == 3
+        # natural keeps the first face rolled, as DiceRoller.roll does
+        assert batch['natural'].min() == 1
+
+    def test_keep_high_mask(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('4d6kh3'), 1000, rng=1)
+        assert (batch['kept'].sum(axis=1) == 3).all()
+        dropped = np.where(batch['kept'], 7, batch['modified']).min(axis=1)
+        kept_min = np.where(batch['kept'], batch['modified'], 7).min(axis=1)
+        assert (dropped <= kept_min).all()
+
+    def test_keep_then_drop(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('5d6kl4dh1'), 1000, rng=1)
+        assert (batch['kept'].sum(axis=1) == 3).all()
+
+    def test_drop_everything(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('2d6dl5'), 10, rng=1)
+        assert not batch['kept'].any()
+
+    def test_explosions_extend_rows(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('10d6x>=6'), 1000, rng=1)
+        assert batch['modified'].shape[1] > 10
+        counts = batch['valid'].sum(axis=1)
+        sixes = np.where(batch['valid'], batch['modified'] == 6, False).sum(axis=1)
+        assert (counts == 10 + sixes).all()
+        assert (batch['explosions'] == sixes).all()
+        assert (batch['deepest_chain'] <= batch['explosions']).all()
+
+    def test_compound_penetrate(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('3d6xxp>=6'), 1000, rng=1)
+        assert batch['modified'].shape == (1000, 3)
+        assert batch['modified'].max() > 6
+
+    def test_subroll_per_trial(self, parser, roller):
+        batch = roller.roll_batch(parser.compile('4d6+1d4>=5'), 1000, rng=1)
+        boost = batch['modified'] - batch['natural']
+        assert (boost == boost[:, :1]).all()
+        assert set(np.unique(boost)) == {1, 2, 3, 4}
+
+    def test_never_finishing_roll_rejected(self, parser, roller):
+        with pytest.raises(DiceException):
+            roller.roll_batch(parser.compile('2d6r<7'), 10)
+
+
+class TestDistribution:
+    """Batch totals have the same distribution as looped rolls."""
+
+    @pytest.mark.parametrize('expression', [
+        '3d6', '4d6kh3', '4d6kh3dl1', '10d6x>=6', '3d6xx>=5', '3d6xp>=6', '3d6ro<3', '3d6-1kl2',
+    ])
+    def test_mean_matches_loop(self, parser, roller, expression):
+        plan = parser.compile(expression)
+        batch = batch_totals(roller.roll_batch(plan, TRIALS * 5, rng=3))
+        expected = loop_mean(roller, plan)
+        assert batch.mean() == pytest.approx(expected, abs=0.05 * max(1, batch.std()))
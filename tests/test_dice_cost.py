@@ -0,0 +1,146 @@
+"""Tests for the cost model and admission limits."""
+import math
+import random
+import pytest
+from dice_roller.DiceCost import Limits, estimate_analysis, estimate_throw
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceParser import DiceParser
+from dice_roller.DiceProbability import DiceProbability
+from dice_roller.DiceThrower import DiceThrower
+
+
+@pytest.fixture
+def parser():
+    return DiceParser(limits=Limits(max_dice=10 ** 6, max_sides=10 ** 6))
+
+
+class TestEstimateThrow:
+    """Expected and worst-case work of a throw."""
+
+    def test_plain_pool(self, parser):
+        estimate = estimate_throw(parser.parse_input('10d6'))
+        assert estimate.expected_draws == 10
+        assert estimate.worst_case_draws == 10
+        assert estimate.terminates
+
+    def test_reroll_until(self, parser):
+        # r<=5 on a d6 is sampled directly: a matching die costs one more draw
+        estimate = estimate_throw(parser.parse_input('10d6r<=5'))
+        assert estimate.expected_draws == pytest.approx(10 * (1 + 5 / 6))
+        assert estimate.worst_case_draws == 20
+
+    def test_reroll_once(self, parser):
+        estimate = estimate_throw(parser.parse_input('10d6ro<3'))
+        assert estimate.expected_draws == pytest.approx(10 * (1 + 1 / 3))
+        assert estimate.worst_case_draws == 20
+
+    def test_reroll_every_face_never_finishes(self, parser):
+        estimate = estimate_throw(parser.parse_input('10d6r<7'))
+        assert not estimate.terminates
+        assert estimate.expected_draws == math.inf
+
+    def test_explosion(self, parser):
+        estimate = estimate_throw(parser.parse_input('200d100x>=2'))
+        assert estimate.explode_probability == pytest.approx(0.99)
+        assert estimate.expected_draws == pytest.approx(20000)
+        assert estimate.likely_max_depth > 1000
+
+    def test_explosion_uses_boosted_value(self, parser):
+        assert estimate_throw(parser.parse_input('10d6+2x>=7')).explode_probability == pytest.approx(1 / 3)
+
+    def test_explode_on_everything_never_finishes(self, parser):
+        assert not estimate_throw(parser.parse_input('1d6x>=1')).terminates
+
+    def test_subroll_threshold_worst_case(self, parser):
+        # 1d3 can roll 1 (explode on everything); the worst finishing outcome is >=2
+        estimate = estimate_throw(parser.parse_input('10d6x>=1d3'))
+        assert estimate.terminates
+        assert estimate.may_hang
+        assert estimate.explode_probability == pytest.approx(5 / 6)
+
+    def test_subroll_dice_counted(self, parser):
+        assert estimate_throw(parser.parse_input('1d20=+2d4')).expected_draws == 3
+
+
+class TestEstimateAnalysis:
+    """Enumeration size of exact analysis."""
+
+    def test_keep_drop_enumerates_every_roll(self, parser):
+        assert estimate_analysis(parser.parse_input('4d6kh3')).enumeration == 2 * 6 ** 4
+
+    def test_plain_pool_is_convolved(self, parser):
+        assert estimate_analysis(parser.parse_input('200d100')).enumeration < 10 ** 9
+
+    def test_huge_keep_drop(self, parser):
+        assert estimate_analysis(parser.parse_input('200d100kh3')).enumeration == 2 * 100 ** 200
+
+
+class TestThrowerLimits:
+    """DiceThrower rejects expressions over its limits."""
+
+    def test_default_limits_keep_old_bounds(self):
+        dice = DiceThrower()
+        assert 'Bad roll' in dice.throw('201d6')
+        assert 'Bad roll' in dice.throw('1d101')
+
+    def test_custom_size_limits(self):
+        dice = DiceThrower(limits=Limits(max_dice=500, max_sides=1000))
+        assert len(dice.throw('500d1000')['natural']) == 500
+        assert 'Bad roll' in DiceThrower(limits=Limits(max_dice=5)).throw('6d6')
+
+    def test_never_finishing_roll_rejected(self):
+        assert 'Bad roll' in DiceThrower().throw('10d6r<7')
+
+    def test_expensive_roll_rejected(self):
+        assert 'Bad roll' in DiceThrower().throw('200d100x>=2')
+        assert 'Bad roll' in DiceThrower(limits=Limits(max_expected_draws=15)).throw('10d6r<=5')
+
+    def test_subroll_size_limits(self):
+        assert 'Bad roll' in DiceThrower().throw('1d20=+300d6')
+
+    def test_likely_chain_over_limit_rejected(self):
+        dice = DiceThrower(limits=Limits(max_chain=100))
+        assert estimate_throw(dice.plan('1d20')).likely_max_depth == 0
+        assert 'Bad roll' in dice.throw('1d100x>=2')
+        with pytest.raises(DiceException):
+            dice.throw_result('1d100x>=2')
+
+    def test_likely_explosions_admitted_by_default(self):
+        dice, rng = DiceThrower(), random.Random(2)
+        for _ in range(300):
+            assert isinstance(dice.throw('1d100x>=2', rng=rng), dict)
+
+    def test_roll_time_limit_reported_like_bad_expression(self):
+        # admitted (60 expected draws), then stopped by the dice budget while rolling
+        dice = DiceThrower(limits=Limits(max_total_dice=5))
+        assert dice.throw('10d6x>=2') == 'Bad roll expression - 10d6x>=2'
+
+    def test_throw_string_checks_terms(self):
+        with pytest.raises(DiceException):
+            DiceThrower().throw_string('1d6r<7 + 2')
+
+
+class TestAnalyzerLimits:
+    """DiceProbability rejects or downgrades expensive analyses."""
+
+    def test_enumeration_rejected(self):
+        with pytest.raises(DiceException):
+            DiceProbability(limits=Limits(max_enumeration=1000)).analyze('4d6kh3')
+
+    def test_enumeration_downgraded(self):
+        prob = DiceProbability(limits=Limits(max_enumeration=1000, downgrade=True, downgrade_samples=200))
+        result = prob.analyze('4d6kh3')
+        assert result['method'] == 'monte_carlo'
+        assert result['samples'] == 200
+
+    def test_monte_carlo_rejected(self):
+        with pytest.raises(DiceException):
+            DiceProbability(limits=Limits(max_simulation_draws=1000)).monte_carlo('10d6', samples=1000)
+
+    def test_monte_carlo_likely_explosions(self):
+        stats = DiceProbability().monte_carlo('2d10x>=2', samples=20000, seed=4)
+        assert stats['mean'] == pytest.approx(110, rel=0.05)
+
+    def test_monte_carlo_never_finishing_rejected(self):
+        with pytest.raises(DiceException):
+            DiceProbability().monte_carlo('1d6x>=1', samples=10)
@@ -0,0 +1,90 @@
+"""Tests for compiled equations and DiceThrower.throw_string."""
+from fractions import Fraction
+import pytest
+from dice_roller.DiceCost import Limits
+from dice_roller.DiceEquation import evaluate
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceParser import DiceParser, ParseCache
+from dice_roller.DiceThrower import DiceThrower
+
+
+@pytest.fixture(params=['pyparsing', 'native'])
+def parser(request):
+    return DiceParser(engine=request.param, equation_cache=ParseCache(copy=None))
+
+
+@pytest.fixture
+def dice():
+    return DiceThrower(rng=7)
+
+
+def value(parser, equation, totals=()):
+    return evaluate(parser.compile_equation(equation).root, list(totals))
+
+
+class TestCompile:
+    """Precedence, parentheses and terms."""
+
+    @pytest.mark.parametrize('equation, expected', [
+        ('2 + 3 * 4', 14),
+        ('(2 + 3) * 4', 20),
+        ('10 - 4 - 3', 3),
+        ('2 * (3 + (4 - 1)) / 4', 3),
+        ('-2 * -3', 6),
+        ('+5 - -5', 10),
+        ('7 / 2', Fraction(7, 2)),
+        ('1.5 * 2', 3),
+    ])
+    def test_arithmetic(self, parser, equation, expected):
+        assert value(parser, equation) == expected
+
+    def test_terms_in_order(self, parser):
+        equation = parser.compile_equation('(2d6 + 3) * 2 + 1d8 - 1d4')
+        assert [(term.text, term.start, term.stop) for term in equation.terms] == \
+            [('2d6', 1, 4), ('1d8', 16, 19), ('1d4', 22, 25)]
+        assert value(parser, '(2d6 + 3) * 2 + 1d8 - 1d4', [7, 5, 2]) == 23
+
+    def test_repeated_term(self, parser):
+        assert value(parser, '1d6 + 1d6 * 10', [1, 2]) == 21
+
+    def test_compiled_once(self, parser):
+        assert parser.compile_equation('1d6 + 2') is parser.compile_equation('1d6 + 2')
+
+    @pytest.mark.parametrize('equation', ['(1d6 + 2', '1d6 + 2)', '1d6 +', '1d6 2', '1d6 + abc', '__import__("os")'])
+    def test_bad_equation(self, parser, equation):
+        with pytest.raises(DiceException):
+            parser.compile_equation(equation)
+
+    def test_limits_checked_on_cached_equation(self, parser):
+        DiceParser(limits=Limits(max_dice=1000), equation_cache=parser.equation_cache).compile_equation('300d6 + 1')
+        with pytest.raises(DiceException):
+            parser.compile_equation('300d6 + 1')
+
+
+class TestThrowString:
+    """throw_string rolls each term and walks the tree."""
+
+    def test_breakdown(self, dice):
+        total, terms = dice.throw_string('(2d6 + 3) * 2 + 1d8 - 1d4')
+        assert [term['term'] for term in terms] == ['2d6', '1d8', '1d4']
+        two_d6, d8, d4 = (term['total'] for term in terms)
+        assert total == (two_d6 + 3) * 2 + d8 - d4
+        assert terms[0]['total'] == sum(terms[0]['result']['modified'])
+
+    def test_repeated_term_rolled_separately(self, dice):
+        totals = set()
+        for _ in range(50):
+            total, terms = dice.throw_string('1d20 - 1d20')
+            assert len(terms) == 2
+            assert total == terms[0]['total'] - terms[1]['total']
+            totals.add(total)
+        assert len(totals) > 1
+
+    def test_per_die_boost_stays_in_term(self, dice):
+        total, terms = dice.throw_string('2d6+3')
+        assert terms[0]['term'] == '2d6+3'
+        assert total == sum(terms[0]['result']['modified'])
+
+    def test_division_by_zero(self, dice):
+        with pytest.raises(DiceException):
+            dice.throw_string('1d6 / 0')
@@ -0,0 +1,108 @@
+"""Differential tests: the native parser engine must match the pyparsing engine."""
+import pathlib
+import random
+import re
+import pytest
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceParser import DiceParser, ParseCache
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# Every quoted expression passed to the public API in the tests, test.py and README
+CALL_PATTERN = re.compile(r"""(?:throw|analyze|monte_carlo|parse_input|calcThrow|statThrow)\(\s*'([^']+)'""")
+
+
+def collect_expressions():
+    expressions = set()
+    for path in [*ROOT.glob('tests/test_*.py'), ROOT / 'test.py', ROOT / 'README.md']:
+        expressions.update(CALL_PATTERN.findall(path.read_text()))
+    return sorted(expressions)
+
+
+EDGE_CASES = [
+    ' 4 d 6 + 2 =+3 >= 4 kh 2', '4d6kh3 trailing text', '1d6+', '1d6 5', '1d6+-3', '10d6==5',
+    '1d6= +5', '1d6=+', '1d6=+5=', '2d6>=5>=10', '2d6t', '2d6t>=', '2d6kh>=3', '2d6xxpx',
+    '4d{5}', '4d{a}', '4d{ 1,2 }', '4d{1,,2}', '4d{1,2', '4d{}', '0d6', '1d0', '1d101', '201d6',
+    '3d6\tkh2', '1d20=+1d4=-2d6>=1d3kh1d2t>=1d20', '10d6>=1d6x', '1d20=+1d45x', 'd6', '6', '', '   ', '1d', '1dx', '2d6!=3', '2d6!3', '1d20b+2l-3', '2d6<', '2d6<<3',
+]
+
+
+def outcome(parser, expression):
+    try:
+        return 'ok', parser.parse_input(expression)
+    except DiceException as e:
+        return 'error', e.args[0]
+
+
+def spans(parser, equation):
+    """(term, start, stop) of every dice expression scan_equation finds."""
+    return [(term, start, stop) for _parsed, term, start, stop in parser.scan_equation(equation)]
+
+
+@pytest.fixture
+def engines():
+    return (DiceParser(cache=ParseCache(maxsize=0)),
+            DiceParser(cache=ParseCache(maxsize=0), engine='native'))
+
+
+class TestEngineSelection:
+
+    def test_default_engine_is_pyparsing(self):
+        assert DiceParser().engine == 'pyparsing'
+
+    def test_unknown_engine_rejected(self):
+        with pytest.raises(ValueError):
+            DiceParser(engine='yacc')
+
+    def test_native_engine_throws(self):
+        from dice_roller.DiceThrower import DiceThrower
+        dice = DiceThrower()
+        dice.parser = DiceParser(engine='native')
+        result = dice.throw('4d6kh3')
+        assert len(result['modified']) == 3
+
+
+class TestDifferential:
+
+    def test_found_existing_expressions(self):
+        assert len(collect_expressions()) > 100
+
+    @pytest.mark.parametrize('expression', collect_expressions() + EDGE_CASES)
+    def test_same_methods(self, engines, expression):
+        reference, native = engines
+        assert outcome(native, expression) == outcome(reference, expression)
+
+    def test_random_expressions(self, engines):
+        reference, native = engines
+        rng = random.Random(1234)
+        pieces = ['1', '2', '6', '10', 'd', '{', '}', ',', 'a', '-', '+', '*', '/', '=', '<', '>', '!',
+                  'k', 'h', 'l', 'x', 'p', 'r', 'o', 's', 'f', 'n', 't', 'b', ' ']
+        for _ in range(3000):
+            expression = rng.choice(['', '1d6', '3d10', '2d{1,2,3}']) + ''.join(
+                rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+            assert outcome(native, expression) == outcome(reference, expression), expression
+
+    @pytest.mark.parametrize('equation', [
+        '(2d6+3)*2 + 1d8 - 1d4 + 1d8', '2d{1,2}+3 + 4 d6 + 1d6 kh1+x2d6=+3=-1>=4kh2t>5',
+        '1d20+5', '10 + 3d6kh2', '12x3d6', '1d6\t+ 2d6', '', 'no dice here',
+    ])
+    def test_same_equation_terms(self, engines, equation):
+        reference, native = engines
+        assert native.parse_expression_from_equation(equation) == \
+            reference.parse_expression_from_equation(equation)
+
+    @pytest.mark.parametrize('equation', [
+        '2 - 1d6x', '1d6k', '3d6ro', '1d6xp', '1d20ns', '4d6kh3 + 1d4r', '(1d6x)', '2d6x+1d8xx',
+        '(2d6+3)*2 + 1d8 - 1d4 + 1d8', '2d{1,2}+3 + 4 d6 + 1d6 kh1+x2d6=+3=-1>=4kh2t>5', '1d6\t+ 2d6',
+    ])
+    def test_same_scan_spans(self, engines, equation):
+        reference, native = engines
+        assert spans(native, equation) == spans(reference, equation)
+
+    def test_random_scan_spans(self, engines):
+        reference, native = engines
+        rng = random.Random(99)
+        pieces = ['1d6', '2d10', 'x', 'xx', 'k', 'kh', 'r', 'ro', 'p', 'ns', 'f', '+', '-', ' ', '>=', '2', '(', ')']
+        for _ in range(500):
+            equation = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 10)))
+            assert spans(native, equation) == spans(reference, equation), equation
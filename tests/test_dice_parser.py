@@ -0,0 +1,120 @@
+"""Tests for DiceParser grammar reuse, the parse-result cache and subroll nodes."""
+import pytest
+from dice_roller.DiceCost import Limits
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceParser import DiceParser, ParseCache
+from dice_roller.RollPlan import Subroll
+
+
+@pytest.fixture
+def parser():
+    return DiceParser(cache=ParseCache(maxsize=4))
+
+
+class TestGrammarReuse:
+    """The pyparsing grammar is built once per process."""
+
+    def test_grammar_shared_between_instances(self):
+        assert DiceParser().get_grammar() is DiceParser().get_grammar()
+
+    def test_equation_grammar_shared_between_instances(self):
+        assert DiceParser().get_grammar(equation=True) is DiceParser().get_grammar(equation=True)
+
+    def test_equation_grammar_differs_from_expression_grammar(self):
+        parser = DiceParser()
+        assert parser.get_grammar() is not parser.get_grammar(equation=True)
+
+
+class TestParseCache:
+    """LRU cache of cleaned methods dicts."""
+
+    def test_repeat_parse_hits_cache(self, parser):
+        first = parser.parse_input('4d6kh3')
+        second = parser.parse_input('4d6kh3')
+        assert first == second
+        assert parser.cache.hits == 1
+        assert parser.cache.misses == 1
+
+    def test_cached_result_is_a_copy(self, parser):
+        first = parser.parse_input('4d6kh3')
+        first['k']['val'] = '1'
+        first['sides'].append(7)
+        second = parser.parse_input('4d6kh3')
+        assert second['k']['val'] == '3'
+        assert second['sides'] == [1, 2, 3, 4, 5, 6]
+
+    def test_eviction_is_least_recently_used(self, parser):
+        for dexp in ('1d4', '1d6', '1d8', '1d10'):
+            parser.parse_input(dexp)
+        parser.parse_input('1d4')  # refresh 1d4
+        parser.parse_input('1d12')  # evicts 1d6
+        assert parser.cache.evictions == 1
+        parser.parse_input('1d4')
+        parser.parse_input('1d6')
+        stats = parser.cache.stats()
+        assert stats['hits'] == 2
+        assert stats['size'] == 4
+
+    def test_subroll_expressions_are_cached(self, parser):
+        first = parser.parse_input('1d20=+1d4')
+        second = parser.parse_input('1d20=+1d4')
+        assert first == second
+        assert parser.cache.hits == 1
+
+    def test_bad_expression_not_cached(self, parser):
+        for _ in range(2):
+            with pytest.raises(DiceException):
+                parser.parse_input('1d0')
+        assert len(parser.cache) == 0
+
+    def test_limits_apply_to_cached_results(self, parser):
+        generous = DiceParser(cache=parser.cache, limits=Limits(max_sides=1000))
+        assert len(generous.parse_input('1d200')['sides']) == 200
+        with pytest.raises(DiceException):
+            parser.parse_input('1d200')
+
+    def test_zero_maxsize_disables_cache(self):
+        parser = DiceParser(cache=ParseCache(maxsize=0))
+        parser.parse_input('2d6')
+        parser.parse_input('2d6')
+        assert len(parser.cache) == 0
+        assert parser.cache.hits == 0
+
+    def test_clear_resets_counters(self, parser):
+        parser.parse_input('2d6')
+        parser.parse_input('2d6')
+        parser.cache.clear()
+        assert parser.cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0, 'maxsize': 4}
+
+
+class TestSubrollNodes:
+    """Subrolls are parsed into symbolic nodes, not rolled."""
+
+    @pytest.mark.parametrize('engine', DiceParser.engines)
+    def test_parse_is_deterministic(self, engine):
+        parser = DiceParser(cache=ParseCache(maxsize=0), engine=engine)
+        assert parser.parse_input('10d6kh1d4') == parser.parse_input('10d6kh1d4')
+
+    @pytest.mark.parametrize('dexp, key, node', [
+        ('1d20=+1d4', 'l', Subroll((('=+', 1, 4),), 0)),
+        ('3d6=+10=-1d4=+1d6', 'l', Subroll((('=-', 1, 4), ('=+', 1, 6)), 10)),
+        ('10d6kh1d4', 'k', Subroll((('kh', 1, 4),), 0)),
+        ('10d6x>=1d3', 'x', Subroll((('>=', 1, 3),), 0)),
+        ('10d6r<=1d2', 'r', Subroll((('<=', 1, 2),), 0)),
+        ('10d6>=2d6', 's', Subroll((('>=', 2, 6),), 0)),
+        ('1d6+1d4', 'b', Subroll((('+', 1, 4),), 0)),
+        ('1d20=+1d4t>=1d20', 't', Subroll((('>=', 1, 20),), 0)),
+    ])
+    def test_subroll_nodes(self, parser, dexp, key, node):
+        assert parser.parse_input(dexp)[key]['val'] == node
+
+    def test_static_total_modifier_unchanged(self, parser):
+        assert parser.parse_input('3d6=+10=-3')['l'] == {'operator': '+', 'val': '7'}
+
+    def test_subroll_limits_checked(self, parser):
+        with pytest.raises(DiceException):
+            parser.parse_input('1d20=+1d200')
+
+    def test_plan_lists_subroll_fields(self, parser):
+        assert parser.compile('1d20=+1d4>=5kh1d2').subrolls == ('l', 'k')
+        assert parser.compile('1d20=+4').subrolls == ()
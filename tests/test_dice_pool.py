@@ -0,0 +1,115 @@
+"""Tests for count-based huge pools."""
+import math
+import statistics
+import pytest
+from dice_roller.DiceCost import Limits
+from dice_roller.DiceParser import DiceParser
+from dice_roller.DicePool import DicePool
+from dice_roller.DiceThrower import DiceThrower
+
+
+@pytest.fixture
+def dice():
+    return DiceThrower(rng=1)
+
+
+@pytest.fixture
+def pool():
+    return DicePool(Limits(), rng=1)
+
+
+@pytest.fixture
+def parser():
+    return DiceParser(limits=Limits().for_pools())
+
+
+class TestThrowPool:
+    """throw_pool rolls beyond the normal dice and face limits."""
+
+    def test_huge_pool(self, dice):
+        result = dice.throw_pool('100000d6>=5')
+        assert sum(result['natural'].values()) == 100000
+        assert set(result['natural']) == {1, 2, 3, 4, 5, 6}
+        assert result['modified'] == result['natural']
+        # 100000d6 totals 350000 with a standard deviation of about 540
+        assert abs(int(result['total']) - 350000) < 6 * 540
+        assert int(result['success']) == result['natural'][5] + result['natural'][6]
+
+    def test_many_faces(self, dice):
+        result = dice.throw_pool('1000d1000>=990')
+        assert sum(result['natural'].values()) == 1000
+        assert max(result['natural']) <= 1000
+
+    def test_counters(self, dice):
+        result = dice.throw_pool('100000d6>=5f<=1ns=6nf=1t>=1')
+        assert result['fail'] == result['nf'] == str(result['natural'][1])
+        assert result['ns'] == str(result['natural'][6])
+        assert result['pass'] == '1'
+
+    def test_keep_high(self, dice):
+        result = dice.throw_pool('100000d20=+5kh10')
+        assert result['modified'] == {20: 10}
+        assert result['total'] == '205'
+
+    def test_keep_low_drop_high(self, dice):
+        result = dice.throw_pool('100000d6kl5dh2')
+        assert result['modified'] == {1: 3}
+
+    def test_exploding(self, dice):
+        result = dice.throw_pool('100000d6x>=6')
+        assert sum(result['modified'].values()) == 100000 + result['explosions']
+        assert result['explosions'] == result['modified'][6]
+        assert result['deepest_chain'] > 1
+
+    def test_penetrating(self, dice):
+        result = dice.throw_pool('100000d6xp>=6')
+        assert 0 in result['modified']
+        assert result['modified'][6] == result['natural'][6]
+
+    def test_reroll_until(self, dice):
+        result = dice.throw_pool('100000d6r<3')
+        assert min(result['modified']) == 3
+        assert min(result['natural']) == 1
+
+    def test_small_pool_matches_roller(self, dice):
+        pooled = [int(dice.throw_pool('10d6ro<3x>=6kh4+1')['total']) for _ in range(4000)]
+        rolled = [int(dice.throw('10d6ro<3x>=6kh4+1')['total']) for _ in range(4000)]
+        spread = statistics.pstdev(rolled) / math.sqrt(4000)
+        assert abs(statistics.mean(pooled) - statistics.mean(rolled)) < 6 * spread
+
+    def test_huge_subroll_rolled_as_counts(self, dice):
+        result = dice.throw_pool('10d6=+1000000000d6')
+        subroll = result['subrolls'][0]
+        assert subroll['expression'] == '1000000000d6'
+        # 10^9 d6 totals 3.5 * 10^9 with a standard deviation of about 54000
+        assert abs(subroll['result'] - 3_500_000_000) < 6 * 54_000
+        assert int(result['total']) == sum(v * c for v, c in result['modified'].items()) + subroll['result']
+
+    @pytest.mark.parametrize('expression', ['10d6xx>=6', '3d{a,b}', '100d6r<7', '10d6x>=1', 'nonsense'])
+    def test_unsupported(self, dice, expression):
+        assert 'Bad roll' in dice.throw_pool(expression)
+
+    def test_pool_limits(self):
+        dice = DiceThrower(limits=Limits(max_pool_dice=1000, max_pool_sides=20))
+        assert 'Bad roll' in dice.throw_pool('1001d6')
+        assert 'Bad roll' in dice.throw_pool('10d21')
+        assert 'Bad roll' in dice.throw('1000d6')
+
+
+class TestDicePool:
+    """Histogram helpers."""
+
+    def test_roll_histograms(self, pool, parser):
+        result = pool.roll(parser.compile('100000d6+1'))
+        assert set(result['modified']) == {2, 3, 4, 5, 6, 7}
+        assert sum(result['modified'].values()) == 100000
+
+    def test_duplicate_faces_weighted(self, pool, parser):
+        result = pool.roll(parser.compile('60000d{1,1,2}'))
+        assert abs(result['natural'][1] - 40000) < 6 * math.sqrt(60000 * 2 / 9)
+
+    def test_keep_band(self, pool, parser):
+        modified = {1: 5, 2: 5, 3: 5}
+        assert pool.keep(modified, parser.compile('15d3kh7')) == {3: 5, 2: 2}
+        assert pool.keep(modified, parser.compile('15d3dl12')) == {3: 3}
+        assert pool.keep(modified, parser.compile('15d3kh7dh6')) == {2: 1}
@@ -226,6 +226,10 @@ class TestErrorHandling:
         with pytest.raises(ValueError, match="Exploding"):
             prob.analyze('5d6r<3')
 
+    def test_subroll_raises_error(self, prob):
+        with pytest.raises(ValueError, match="Subrolls"):
+            prob.analyze('1d20=+1d4')
+
     def test_string_faces_raises_error(self, prob):
         with pytest.raises(ValueError, match="numeric"):
             prob.analyze('4d{a,b,c}')
@@ -288,3 +292,36 @@ class TestStatistics:
     def test_std_is_positive(self, prob):
         result = prob.analyze('2d6')
         assert result['std'] > 0
+
+
+class TestParallelMonteCarlo:
+    """Seeded, sharded Monte Carlo runs."""
+
+    def test_seed_reproducible(self, prob):
+        first = prob.monte_carlo('3d6x>=6', samples=2000, seed=12)
+        assert prob.monte_carlo('3d6x>=6', samples=2000, seed=12)['distribution'] == first['distribution']
+        assert first['seed'] == 12
+
+    def test_different_seeds_differ(self, prob):
+        assert prob.monte_carlo('10d6', samples=2000, seed=1)['distribution'] != \
+            prob.monte_carlo('10d6', samples=2000, seed=2)['distribution']
+
+    def test_shards_use_separate_streams(self, monkeypatch, prob):
+        import dice_roller.DiceProbability as DiceProbability_module
+        monkeypatch.setattr(DiceProbability_module, 'SHARD_SAMPLES', 100)
+        seeds = {DiceProbability_module.shard_seed(5, index) for index in range(10)}
+        assert len(seeds) == 10
+        assert prob.monte_carlo('1d6', samples=1000, seed=5)['samples'] == 1000
+
+    def test_same_result_for_any_worker_count(self, monkeypatch, prob):
+        import dice_roller.DiceProbability as DiceProbability_module
+        monkeypatch.setattr(DiceProbability_module, 'SHARD_SAMPLES', 500)
+        serial = prob.monte_carlo('4d6x>=6kh3', samples=2200, seed=99)
+        for workers in (1, 3):
+            run = prob.monte_carlo('4d6x>=6kh3', samples=2200, seed=99, workers=workers)
+            assert list(run['distribution'].items()) == list(serial['distribution'].items())
+
+    def test_workers_without_seed_report_seed(self, prob):
+        stats = prob.monte_carlo('2d6', samples=1000, workers=2)
+        assert sum(stats['distribution'].values()) == 1
+        assert prob.monte_carlo('2d6', samples=1000, seed=stats['seed'])['distribution'] == stats['distribution']
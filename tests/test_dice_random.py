@@ -0,0 +1,138 @@
+"""Tests for pluggable RNG backends."""
+import random
+import threading
+from collections import Counter
+import pytest
+from dice_roller.DiceParser import DiceParser
+from dice_roller.DiceRandom import NumpyRandom, PerThreadRandom, binomial, multinomial, resolve_rng
+from dice_roller.DiceRoller import DiceRoller
+from dice_roller.DiceThrower import DiceThrower
+from dice_roller.Die import Die
+
+np = pytest.importorskip('numpy')
+
+
+class TestResolve:
+    """resolve_rng maps rng= arguments to backends."""
+
+    def test_default_is_global_random(self):
+        assert resolve_rng() is random
+
+    def test_seed_gives_random_instance(self):
+        rng = resolve_rng(42)
+        assert isinstance(rng, random.Random)
+        assert rng.random() == random.Random(42).random()
+
+    def test_numpy_generator_is_wrapped(self):
+        generator = np.random.default_rng(1)
+        rng = resolve_rng(generator)
+        assert isinstance(rng, NumpyRandom) and rng.generator is generator
+
+    def test_backend_used_as_is(self):
+        rng = PerThreadRandom()
+        assert resolve_rng(rng) is rng
+
+
+class TestSeeding:
+    """A seeded rng makes throws reproducible."""
+
+    @pytest.mark.parametrize('make_rng', [
+        lambda: 7,
+        lambda: random.Random(7),
+        lambda: NumpyRandom(7),
+        lambda: np.random.default_rng(7),
+    ])
+    def test_thrower_reproducible(self, make_rng):
+        first, second = DiceThrower(rng=make_rng()), DiceThrower(rng=make_rng())
+        for _ in range(20):
+            assert first.throw('10d6x>=6r<2=+1d4kh5') == second.throw('10d6x>=6r<2=+1d4kh5')
+
+    def test_die_uses_rng(self):
+        first, second = Die(20, random.Random(3)), Die(20, random.Random(3))
+        for _ in range(10):
+            first.roll()
+            second.roll()
+            assert first.showing == second.showing
+
+    def test_global_random_still_seeds(self):
+        random.seed(11)
+        first = DiceThrower().throw('5d10')
+        random.seed(11)
+        assert DiceThrower().throw('5d10') == first
+
+    def test_batch_uses_roller_generator(self):
+        plan = DiceParser().compile('4d6kh3')
+        first = DiceRoller(rng=NumpyRandom(5)).roll_batch(plan, 100)
+        second = DiceRoller(rng=NumpyRandom(5)).roll_batch(plan, 100)
+        assert np.array_equal(first['modified'], second['modified'])
+
+
+class TestNumpyRandom:
+    """NumpyRandom serves uniform draws from per-size buffers."""
+
+    def test_randint_range_and_uniformity(self):
+        rng = NumpyRandom(1, buffer_size=100)
+        counts = Counter(rng.randint(1, 6) for _ in range(60000))
+        assert set(counts) == {1, 2, 3, 4, 5, 6}
+        assert all(abs(count - 10000) < 500 for count in counts.values())
+
+    def test_choice_and_choices(self):
+        rng = NumpyRandom(1, buffer_size=8)
+        faces = ['a', 'b', 'c']
+        assert rng.choice(faces) in faces
+        drawn = rng.choices(faces, k=50)
+        assert len(drawn) == 50 and set(drawn) <= set(faces)
+
+    def test_sizes_have_separate_buffers(self):
+        rng = NumpyRandom(1, buffer_size=4)
+        for _ in range(20):
+            assert 1 <= rng.randint(1, 4) <= 4
+            assert 1 <= rng.randint(1, 100) <= 100
+
+
+class TestPerThreadRandom:
+    """Each thread gets its own backend."""
+
+    def test_one_backend_per_thread(self):
+        rng = PerThreadRandom()
+        seen = []
+
+        def worker():
+            seen.append(rng.local)
+            assert rng.local is seen[-1]
+            rng.randint(1, 6)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({id(backend) for backend in seen}) == 4
+
+    def test_custom_factory(self):
+        rng = PerThreadRandom(lambda: NumpyRandom(3))
+        assert isinstance(rng.local, NumpyRandom)
+        result = DiceThrower(rng=rng).throw('3d6')
+        assert len(result['natural']) == 3
+
+
+class TestBinomial:
+    """binomial and multinomial draw counts without one draw per trial."""
+
+    @pytest.mark.parametrize('n, p', [(5, 0.3), (100, 0.05), (100000, 0.5), (10 ** 6, 1 / 6), (50, 0.9)])
+    def test_mean_and_variance(self, n, p):
+        rng = random.Random(1)
+        draws = [binomial(rng, n, p) for _ in range(5000)]
+        mean, variance = n * p, n * p * (1 - p)
+        assert abs(sum(draws) / len(draws) - mean) < 6 * (variance / len(draws)) ** 0.5
+        assert all(0 <= draw <= n for draw in draws)
+
+    def test_edges(self):
+        assert binomial(random, 10, 0.0) == 0
+        assert binomial(random, 10, 1.0) == 10
+
+    @pytest.mark.parametrize('rng', [random.Random(2), NumpyRandom(2), PerThreadRandom()])
+    def test_multinomial_sums(self, rng):
+        counts = multinomial(rng, 100000, [1, 1, 2])
+        assert sum(counts) == 100000
+        assert abs(counts[2] - 50000) < 6 * (100000 * 0.25) ** 0.5
@@ -0,0 +1,221 @@
+"""Tests for DiceRoller: bulk drawing and the iterative explosion engine."""
+import random
+from collections import Counter
+import pytest
+from dice_roller.DiceCost import Limits
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceParser import DiceParser
+from dice_roller.DiceRoller import DiceRoller
+from dice_roller.DiceThrower import DiceThrower
+
+
+@pytest.fixture
+def parser():
+    return DiceParser()
+
+
+class TestExplosionStats:
+    """Exploding rolls report how far they exploded."""
+
+    def test_stats_reported(self, parser):
+        result = DiceRoller().roll(parser.compile('10d6x>=5'))
+        assert len(result['modified']) - len(result['natural']) == result['explosions']
+        assert 0 <= result['deepest_chain'] <= result['explosions']
+
+    def test_compound_stats(self, parser):
+        roller = DiceRoller()
+        results = [roller.roll(parser.compile('10d6xx>=5')) for _ in range(50)]
+        assert all(len(result['modified']) == 10 for result in results)
+        assert any(result['explosions'] > 0 for result in results)
+
+    def test_no_stats_without_explode(self, parser):
+        assert 'explosions' not in DiceRoller().roll(parser.compile('3d6'))
+
+    def test_thrower_result_has_stats(self):
+        result = DiceThrower().throw('10d6x>=6')
+        assert 'explosions' in result and 'deepest_chain' in result
+
+    def test_single_face_runaway(self, parser):
+        # a die whose only value is 6 explodes on every roll
+        plan = parser.compile('2d{6,6}xp>=6')
+        with pytest.raises(DiceException) as excinfo:
+            DiceRoller(limits=Limits(max_chain=3)).roll(plan)
+        assert excinfo.value.errors['reason'] == 'Explosion chain too long'
+        assert excinfo.value.errors['deepest_chain'] == 4
+
+
+class TestExplosionLimits:
+    """Runaway chains stop early with a DiceException carrying the stats."""
+
+    def test_runaway_chain(self, parser):
+        with pytest.raises(DiceException) as excinfo:
+            DiceRoller().roll(parser.compile('1d6x>=1'))
+        assert excinfo.value.errors['reason'] == 'Explosion chain too long'
+        assert excinfo.value.errors['deepest_chain'] == Limits().max_chain + 1
+        assert excinfo.value.errors['explosions'] == Limits().max_chain + 1
+
+    def test_custom_chain_limit(self, parser):
+        with pytest.raises(DiceException) as excinfo:
+            DiceRoller(limits=Limits(max_chain=5)).roll(parser.compile('3d6xx>=1'))
+        assert excinfo.value.errors['deepest_chain'] == 6
+
+    def test_total_dice_budget(self, parser):
+        roller = DiceRoller(limits=Limits(max_chain=1000, max_total_dice=50))
+        with pytest.raises(DiceException) as excinfo:
+            roller.roll(parser.compile('10d6x>=1'))
+        assert excinfo.value.errors['reason'] == 'Too many dice rolled'
+        assert excinfo.value.errors['explosions'] == 41
+
+    def test_chain_within_limit(self, parser):
+        result = DiceRoller(limits=Limits(max_chain=1000)).roll(parser.compile('1d6x>=2'))
+        assert result['deepest_chain'] == result['explosions']
+
+    def test_batch_chain_limit(self, parser):
+        pytest.importorskip('numpy')
+        with pytest.raises(DiceException) as excinfo:
+            DiceRoller(limits=Limits(max_chain=1)).roll_batch(parser.compile('200d6x>=2'), 100, rng=1)
+        assert excinfo.value.errors['deepest_chain'] == 2
+
+    def test_batch_total_dice_budget(self, parser):
+        pytest.importorskip('numpy')
+        roller = DiceRoller(limits=Limits(max_chain=1000, max_total_dice=15))
+        with pytest.raises(DiceException) as excinfo:
+            roller.roll_batch(parser.compile('10d6x>=2'), 100, rng=1)
+        assert excinfo.value.errors['reason'] == 'Too many dice rolled'
+        assert 10 + excinfo.value.errors['explosions'] > 15
+
+        batch = DiceRoller(limits=Limits(max_total_dice=20)).roll_batch(parser.compile('10d6x>=6'), 100, rng=1)
+        assert (batch['valid'].sum(axis=1) <= 20).all()
+
+
+class CountingRandom(random.Random):
+    """random.Random that counts how often each draw method is called."""
+
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.calls = Counter()
+
+    def choice(self, seq):
+        self.calls['choice'] += 1
+        return super().choice(seq)
+
+    def choices(self, population, weights=None, *, cum_weights=None, k=1):
+        self.calls['choices'] += 1
+        return super().choices(population, weights, cum_weights=cum_weights, k=k)
+
+
+class TestBulkDraw:
+    """The pool is drawn in one call; only rerolls and explosions draw again."""
+
+    def test_pool_drawn_once(self, parser):
+        rng = CountingRandom(1)
+        result = DiceRoller(rng=rng).roll_die(200, 10, parser.compile('200d10+1'))
+        assert rng.calls == Counter(choices=1)
+        assert len(result['natural']) == 200
+        assert result['modified'] == [roll + 1 for roll in result['natural']]
+
+    def test_only_rerolled_dice_draw_again(self, parser):
+        rng = CountingRandom(1)
+        result = DiceRoller(rng=rng).roll_die(200, 10, parser.compile('200d10ro<2'))
+        assert rng.calls['choices'] == 1
+        assert rng.calls['choice'] == result['natural'].count(1)
+
+    def test_only_exploded_dice_draw_again(self, parser):
+        rng = CountingRandom(1)
+        result = DiceRoller(rng=rng).roll_die(200, 10, parser.compile('200d10x>=10'))
+        assert rng.calls['choice'] == result['explosions']
+        assert len(result['modified']) == 200 + result['explosions']
+
+    def test_list_faces(self, parser):
+        result = DiceRoller(rng=1).roll(parser.compile('50d{2,4,8}'))
+        assert set(result['natural']) <= {2, 4, 8}
+
+    def test_subroll_total(self):
+        assert 3 <= DiceRoller(rng=1).roll_subroll(3, 6) <= 18
+
+
+class TestDirectReroll:
+    """Reroll-until draws once from the faces that don't match."""
+
+    def test_kept_faces_compiled(self, parser):
+        assert parser.compile('10d6r<=4').r.keep == (5, 6)
+        assert parser.compile('10d{1,1,2,3}r=1').r.keep == (2, 3)
+        assert parser.compile('10d6ro<=4').r.keep == (5, 6)
+
+    def test_one_draw_per_rerolled_die(self, parser):
+        rng = CountingRandom(1)
+        result = DiceRoller(rng=rng).roll_die(200, 6, parser.compile('200d6r<=5'))
+        assert result['modified'] == [6] * 200
+        assert rng.calls['choice'] == 200 - result['natural'].count(6)
+
+    def test_distribution_over_kept_faces(self, parser):
+        result = DiceRoller(rng=2).roll_die(6000, 6, parser.compile('1d6r<=3'))
+        counts = Counter(result['modified'])
+        assert set(counts) == {4, 5, 6}
+        assert all(abs(count - 2000) < 200 for count in counts.values())
+
+    def test_subroll_threshold(self, parser):
+        result = DiceRoller(rng=3).roll(parser.compile('20d10r<1d4>=5'))
+        threshold = result['subrolls'][0]['result']
+        assert min(result['modified']) >= threshold
+
+    def test_impossible_reroll_rejected_at_compile(self, parser):
+        with pytest.raises(DiceException) as excinfo:
+            parser.compile('3d6r<7')
+        assert excinfo.value.errors == 'Reroll matches every face'
+
+    def test_impossible_reroll_rejected_at_roll(self, parser):
+        with pytest.raises(DiceException):
+            DiceRoller().roll(parser.parse_input('3d6r>=1'))
+
+
+class TestKeepDropMask:
+    """Keep/drop selects a band of the pool and marks which dice survived."""
+
+    @pytest.fixture
+    def roller(self):
+        return DiceRoller()
+
+    def keep(self, roller, parser, expression, rolls):
+        return roller.dropper_keeper({'natural': list(rolls), 'modified': list(rolls)}, parser.compile(expression))
+
+    def test_keep_high(self, roller, parser):
+        result = self.keep(roller, parser, '6d6kh3', [2, 6, 1, 5, 3, 4])
+        assert result['modified'] == [6, 5, 4]
+        assert result['kept'] == [False, True, False, True, False, True]
+
+    def test_keep_low_then_drop_high(self, roller, parser):
+        result = self.keep(roller, parser, '6d6kl4dh1', [2, 6, 1, 5, 3, 4])
+        assert result['modified'] == [1, 2, 3]
+        assert result['kept'] == [True, False, True, False, True, False]
+
+    def test_drop_low(self, roller, parser):
+        result = self.keep(roller, parser, '5d6dl2', [3, 3, 1, 6, 2])
+        assert result['modified'] == [6, 3, 3]
+        assert result['kept'] == [True, True, False, True, False]
+
+    def test_ties_keep_one_of_each(self, roller, parser):
+        result = self.keep(roller, parser, '4d6kh1', [5, 5, 5, 5])
+        assert result['modified'] == [5]
+        assert sum(result['kept']) == 1
+
+    def test_drop_everything(self, roller, parser):
+        result = self.keep(roller, parser, '3d6kh2dl3', [1, 2, 3])
+        assert result['modified'] == []
+        assert result['kept'] == [False, False, False]
+
+    def test_no_mask_without_keep_drop(self, roller, parser):
+        assert 'kept' not in roller.roll(parser.compile('3d6'))
+
+    def test_mask_matches_natural(self, roller, parser):
+        for _ in range(100):
+            result = roller.roll(parser.compile('8d6+1kh3'))
+            kept = [roll + 1 for roll, keep in zip(result['natural'], result['kept']) if keep]
+            assert sorted(kept, reverse=True) == result['modified']
+
+    def test_exploded_pool_reported(self, roller, parser):
+        for _ in range(100):
+            result = roller.roll(parser.compile('8d6x>=5kh3'))
+            pool = result.get('rolled', result['natural'])
+            assert len(result['kept']) == len(pool)
+            assert sorted((v for v, k in zip(pool, result['kept']) if k), reverse=True) == result['modified']
@@ -0,0 +1,48 @@
+"""Tests for DiceScorer's single-read scoring."""
+import pytest
+from dice_roller.DiceScorer import HISTOGRAM_MIN, DiceScorer, count_matches
+from dice_roller.DiceThrower import DiceThrower
+
+EXPRESSIONS = ['200d10>=7f1ns10nf1', '10d6>=5', '1d20', '4d6kh3', '20d6x>=6f<=2', '50d4ns4nf1',
+               '6d6/2', '3d6+2=+5>=12', '2d6dl2=+3', '40d8r<=2>=6f1t>=150', '5d{a,b,c}', '60d6=-1d6ns6']
+
+
+@pytest.fixture
+def scorer():
+    return DiceScorer()
+
+
+def multi_pass(scorer, result, plan):
+    """Scoring as separate passes, one per number."""
+    total = scorer.get_roll_total(result['modified'], plan)
+    if plan.types != 'int':
+        return total, None, None, None, None, None
+    return (total, scorer.get_count(result['modified'], 's', plan),
+            scorer.get_count(result['modified'], 'f', plan) if plan.f is not None else None,
+            scorer.get_count(result['natural'], 'nf', plan) if plan.nf is not None else None,
+            scorer.get_count(result['natural'], 'ns', plan) if plan.ns is not None else None,
+            plan.t.compare(total, plan.t.val) if plan.t is not None else None)
+
+
+class TestScore:
+    """score() gives the same numbers as a pass per counter."""
+
+    @pytest.mark.parametrize('dexp', EXPRESSIONS)
+    def test_matches_separate_passes(self, scorer, dexp):
+        dice = DiceThrower(rng=3)
+        plan = dice.plan(dexp)
+        for _ in range(50):
+            bound, result = dice.roll(plan)
+            assert scorer.score(result, bound) == multi_pass(scorer, result, bound)
+
+    def test_histogram_and_direct_counts_agree(self):
+        dice = DiceThrower(rng=5)
+        plan = dice.plan('100d10>=7f<=2')
+        _, result = dice.roll(plan)
+        values = result['modified']
+        assert len(values) >= HISTOGRAM_MIN
+        assert count_matches(values, plan.s, plan.f) == \
+            (count_matches(values, plan.s, None)[0], count_matches(values, None, plan.f)[1])
+
+    def test_no_conditions(self, scorer):
+        assert count_matches([1, 2, 3] * 20, None, None) == (None, None)
@@ -0,0 +1,178 @@
+"""Tests for running roll statistics."""
+import itertools
+import pickle
+import random
+import statistics
+import pytest
+from dice_roller.DiceStats import BoundedHistogram, RollAggregator, RunningMoments
+from dice_roller.DiceThrower import DiceThrower
+
+
+@pytest.fixture
+def dice():
+    return DiceThrower()
+
+
+def assert_same_summary(first, second):
+    """Equal summaries, up to float rounding in the moments."""
+    first, second = first.summary(), second.summary()
+    for key in ('mean', 'variance', 'std', 'success_mean', 'success_rate'):
+        assert first.pop(key) == pytest.approx(second.pop(key))
+    assert first == second
+
+
+class TestRunningMoments:
+    """Welford moments match the exact statistics."""
+
+    def test_matches_statistics(self):
+        values = [random.randint(-50, 500) for _ in range(2000)]
+        moments = RunningMoments()
+        for value in values:
+            moments.add(value)
+        assert moments.count == len(values)
+        assert moments.mean == pytest.approx(statistics.fmean(values))
+        assert moments.variance == pytest.approx(statistics.pvariance(values))
+        assert (moments.min, moments.max) == (min(values), max(values))
+
+    def test_batches_and_merge_agree_with_one_pass(self):
+        values = [random.random() * 100 for _ in range(1000)]
+        single = RunningMoments()
+        for value in values:
+            single.add(value)
+        batched = RunningMoments()
+        for i in range(0, len(values), 300):
+            batched.add_many(values[i:i + 300])
+        merged = RunningMoments()
+        for part in (values[:10], values[10:600], values[600:]):
+            shard = RunningMoments()
+            shard.add_many(part)
+            merged.merge(shard)
+        for moments in (batched, merged):
+            assert moments.count == single.count
+            assert moments.mean == pytest.approx(single.mean)
+            assert moments.variance == pytest.approx(single.variance)
+
+    def test_empty(self):
+        moments = RunningMoments()
+        moments.add_many([])
+        moments.merge(RunningMoments())
+        assert moments.count == 0 and moments.variance == 0.0
+
+
+class TestBoundedHistogram:
+    """Exact while narrow, bounded when wide."""
+
+    def test_exact_quantiles(self):
+        histogram = BoundedHistogram()
+        histogram.add_many(range(1, 101))
+        assert histogram.width == 1
+        assert histogram.quantile(0.5) == 50
+        assert histogram.quantile(0.99) == 99
+
+    def test_bounded_for_wide_values(self):
+        histogram = BoundedHistogram(max_bins=16)
+        values = [random.randint(0, 100_000) for _ in range(5000)]
+        histogram.add_many(values)
+        assert len(histogram.bins) <= 16
+        assert histogram.count == 5000
+        assert sum(histogram.bins.values()) == 5000
+        assert histogram.quantile(0.5) == pytest.approx(statistics.median(values), abs=histogram.width)
+
+    def test_merge_different_widths(self):
+        narrow, wide = BoundedHistogram(max_bins=8), BoundedHistogram(max_bins=8)
+        narrow.add_many(range(8))
+        wide.add_many(range(0, 1000, 10))
+        narrow.merge(wide)
+        assert narrow.width == wide.width
+        assert narrow.count == 108 and sum(narrow.bins.values()) == 108
+        assert len(narrow.bins) <= 8
+
+    def test_needs_two_bins(self):
+        with pytest.raises(ValueError):
+            BoundedHistogram(max_bins=1)
+
+
+class TestRollAggregator:
+    """Aggregating DiceThrower results."""
+
+    def test_results_and_legacy_dicts(self, dice):
+        rng = random.Random(3)
+        results = [dice.throw_result('3d6', rng=rng) for _ in range(500)]
+        from_results, from_dicts = RollAggregator(), RollAggregator()
+        from_results.add_many(results)
+        from_dicts.add_many(result.as_dict() for result in results)
+        totals = [result.total for result in results]
+        for aggregator in (from_results, from_dicts):
+            summary = aggregator.summary()
+            assert summary['count'] == 500
+            assert summary['mean'] == pytest.approx(statistics.fmean(totals))
+            assert summary['variance'] == pytest.approx(statistics.pvariance(totals))
+            assert summary['percentiles'][50] == sorted(totals)[249]
+            assert sum(summary['histogram'].values()) == 500
+
+    def test_batch_same_as_one_at_a_time(self, dice):
+        batch = dice.throw_many('6d6>=5', 400, rng=random.Random(5))
+        whole, single = RollAggregator(), RollAggregator()
+        whole.add_many(batch)
+        for result in batch:
+            single.add(result)
+        assert_same_summary(whole, single)
+        assert whole.summary()['success_rate'] == pytest.approx(
+            sum(batch.column('success')) / (6 * len(batch)))
+
+    def test_success_rate_per_modified_die(self, dice):
+        batch = dice.throw_many('5d6>=5x>=5', 2000, rng=random.Random(6))
+        aggregator = RollAggregator()
+        aggregator.add_many(batch)
+        rate = aggregator.summary()['success_rate']
+        assert rate == pytest.approx(sum(batch.column('success')) / sum(len(r.modified) for r in batch))
+        assert rate == pytest.approx(1 / 3, abs=0.03)
+
+        kept = RollAggregator()
+        kept.add_many(dice.throw_many('4d6kh1>=5', 2000, rng=random.Random(6)))
+        assert kept.summary()['success_rate'] <= 1
+
+    def test_bad_roll_strings_counted_not_added(self, dice):
+        aggregator = RollAggregator()
+        aggregator.add_many([dice.throw('3d6'), dice.throw('nonsense'), dice.throw('2d6')])
+        summary = aggregator.summary()
+        assert summary['count'] == 2 and summary['errors'] == 1
+        with pytest.raises(TypeError):
+            aggregator.add(7)
+
+    def test_crit_fumble_and_pass_rates(self, dice):
+        aggregator = RollAggregator()
+        aggregator.add_many(dice.throw_many('1d20ns20nf1', 4000, rng=random.Random(1)))
+        summary = aggregator.summary()
+        assert summary['crit_rate'] == pytest.approx(0.05, abs=0.02)
+        assert summary['fumble_rate'] == pytest.approx(0.05, abs=0.02)
+        assert summary['pass_rate'] is None
+
+        checked = RollAggregator()
+        checked.add_many(dice.throw_many('1d20t11', 4000, rng=random.Random(2)))
+        assert checked.summary()['pass_rate'] is not None
+
+    def test_merge_shards(self, dice):
+        results = dice.throw_many('2d10x>=10', 900, rng=random.Random(7))
+        shards = [RollAggregator() for _ in range(3)]
+        for i, result in enumerate(results):
+            shards[i % 3].add(result)
+        merged = RollAggregator()
+        for shard in shards:
+            merged.merge(pickle.loads(pickle.dumps(shard)))
+        whole = RollAggregator()
+        whole.add_many(results)
+        assert_same_summary(merged, whole)
+
+    def test_exploding_totals_stay_bounded(self, dice):
+        aggregator = RollAggregator(max_bins=8)
+        aggregator.add_many(itertools.islice(dice.stream('1d2x>=2', rng=random.Random(9)), 20000))
+        summary = aggregator.summary()
+        assert summary['count'] == 20000
+        assert len(summary['histogram']) <= 8 and summary['bin_width'] > 1
+        assert summary['max'] > 16
+
+    def test_empty(self):
+        summary = RollAggregator().summary()
+        assert summary['count'] == 0
+        assert summary['percentiles'][50] is None and summary['success_rate'] is None
@@ -1,5 +1,9 @@
 """Tests for DiceThrower based on README specifications."""
+import itertools
+import random
+import tracemalloc
 import pytest
+from dice_roller.DiceException import DiceException
 from dice_roller.DiceThrower import DiceThrower
 
 
@@ -370,3 +374,131 @@ class TestBadInput:
         result = dice.throw('500d6')
         assert isinstance(result, str)
         assert 'Bad roll' in result
+
+
+class TestSubrolls:
+    """Subrolls are rolled at throw time and reported with each throw."""
+
+    def test_subroll_reported(self, dice):
+        result = dice.throw('1d20=+1d4')
+        assert len(result['subrolls']) == 1
+        subroll = result['subrolls'][0]
+        assert subroll['expression'] == '1d4'
+        assert subroll['operator'] == '=+'
+        assert 1 <= subroll['result'] <= 4
+        assert int(result['total']) == result['modified'][0] + subroll['result']
+
+    def test_subroll_keep_count(self, dice):
+        result = dice.throw('10d6kh1d4')
+        assert len(result['modified']) == result['subrolls'][0]['result']
+
+    def test_chained_subrolls(self, dice):
+        result = dice.throw('3d6=+10=-1d4')
+        raw_total = sum(result['modified'])
+        assert int(result['total']) == raw_total + 10 - result['subrolls'][0]['result']
+
+    def test_subroll_rerolled_each_throw(self, dice):
+        results = {dice.throw('1d1=+1d100')['subrolls'][0]['result'] for _ in range(20)}
+        assert len(results) > 1
+
+    def test_no_subrolls_key_without_subrolls(self, dice):
+        assert 'subrolls' not in dice.throw('1d20=+4')
+
+
+class TestBatchThrows:
+    """throw_many and throw_all parse once and return a RollBatch."""
+
+    def test_throw_many(self, dice):
+        batch = dice.throw_many('4d6kh3', 50)
+        assert len(batch) == 50
+        assert all(len(result.natural) == 4 and len(result.modified) == 3 for result in batch)
+        assert all(3 <= total <= 18 for total in batch.totals())
+
+    def test_throw_many_parses_once(self, dice):
+        dice.parser.cache.clear()
+        dice.throw_many('10d6>=5', 100)
+        assert dice.parser.cache.stats()['misses'] == 1
+        assert dice.parser.cache.stats()['hits'] == 0
+
+    def test_throw_many_subrolls_fresh(self, dice):
+        batch = dice.throw_many('1d1=+1d100', 20)
+        assert len({result.subrolls[0]['result'] for result in batch}) > 1
+
+    def test_throw_many_matches_throw(self):
+        legacy = DiceThrower(rng=3).throw('10d6x>=5kh4ro<2')
+        batch = DiceThrower(rng=3).throw_many('10d6x>=5kh4ro<2', 1)
+        view = batch[0].as_dict()
+        assert view['total'] == legacy['total'] and list(view['modified']) == legacy['modified']
+
+    def test_throw_all_order(self, dice):
+        expressions = ['1d20', '4d6kh3', '1d20', '2d10=+1d4', '1d20']
+        batch = dice.throw_all(expressions)
+        assert [result.roll for result in batch] == expressions
+        assert batch.column('success') == [result.success for result in batch]
+
+    def test_throw_all_rejects_bad_expression_up_front(self, dice):
+        with pytest.raises(DiceException):
+            dice.throw_all(['1d20', 'nonsense'])
+
+    def test_throw_each_keeps_going(self, dice):
+        results = dice.throw_each(['1d20', 'nonsense', '1d6/0', '2d6', 'nonsense'])
+        assert [type(result).__name__ for result in results] == \
+            ['RollResult', 'DiceException', 'ZeroDivisionError', 'RollResult', 'DiceException']
+        assert results[3].roll == '2d6'
+
+    def test_throw_each_seeded(self):
+        expressions = ['3d6', '1d6/0', '4d6kh3']
+        first = DiceThrower().throw_each(expressions, rng=random.Random(1))
+        second = DiceThrower().throw_each(expressions, rng=random.Random(1))
+        assert first[0] == second[0] and first[2] == second[2]
+
+    def test_empty(self, dice):
+        assert len(dice.throw_all([])) == 0
+        assert len(dice.throw_many('1d6', 0)) == 0
+
+
+class TestStream:
+    """Endless streams of throws."""
+
+    def test_results(self, dice):
+        results = list(itertools.islice(dice.stream('4d6kh3', chunk=7), 20))
+        assert len(results) == 20
+        assert all(3 <= result.total <= 18 and len(result.modified) == 3 for result in results)
+
+    def test_totals_and_successes(self, dice):
+        totals = list(itertools.islice(dice.stream('2d6', only='total'), 500))
+        assert set(totals) <= set(range(2, 13)) and len(set(totals)) > 5
+        successes = list(itertools.islice(dice.stream('10d6>=5', chunk=64, only='success'), 500))
+        assert all(0 <= count <= 10 for count in successes)
+
+    def test_subrolls_fresh(self, dice):
+        totals = set(itertools.islice(dice.stream('1d1=+1d6', chunk=5, only='total'), 200))
+        assert totals == set(range(2, 8))
+
+    def test_seeded_stream_matches_throw_many(self):
+        streamed = list(itertools.islice(DiceThrower().stream('3d6x>=6', chunk=50, rng=4), 50))
+        assert streamed == list(DiceThrower().throw_many('3d6x>=6', 50, rng=4))
+
+    def test_bad_expression_raises_at_once(self, dice):
+        with pytest.raises(DiceException):
+            dice.stream('nonsense')
+        with pytest.raises(ValueError):
+            dice.stream('1d6', only='fail')
+
+    @pytest.mark.parametrize('chunk', [0, -5])
+    def test_chunk_must_be_positive(self, dice, chunk):
+        with pytest.raises(ValueError):
+            dice.stream('1d6', chunk=chunk)
+
+    def test_memory_bounded_per_chunk(self, dice):
+        stream = dice.stream('10d6', chunk=256, only='total')
+        for _ in itertools.islice(stream, 2000):
+            pass
+        tracemalloc.start()
+        try:
+            for _ in itertools.islice(stream, 20000):
+                pass
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak < 1_000_000
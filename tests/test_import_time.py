@@ -0,0 +1,54 @@
+"""Cold-start tests: lazy submodules, deferred pyparsing and the import-time budget."""
+import subprocess
+import sys
+import pytest
+from benchmarks.bench_import import IMPORT_BUDGET_RATIO, import_time_ratio
+
+
+def loaded_modules(code):
+    """Run code in a fresh interpreter and return the modules it ended up importing."""
+    proc = subprocess.run([sys.executable, '-c', code + '\nimport sys; print(" ".join(sys.modules))'],
+                          capture_output=True, text=True, check=True)
+    return set(proc.stdout.split())
+
+
+class TestLazyImport:
+
+    def test_package_import_loads_no_submodules(self):
+        modules = loaded_modules('import dice_roller')
+        assert not any(m.startswith('dice_roller.') for m in modules)
+
+    def test_thrower_does_not_load_probability_or_pyparsing(self):
+        modules = loaded_modules('import dice_roller.DiceThrower')
+        assert 'dice_roller.DiceProbability' not in modules
+        assert 'pyparsing' not in modules
+
+    def test_native_engine_never_loads_pyparsing(self):
+        modules = loaded_modules(
+            'from dice_roller.DiceThrower import DiceThrower\n'
+            'from dice_roller.DiceParser import DiceParser\n'
+            'dice = DiceThrower()\n'
+            'dice.parser = DiceParser(engine="native")\n'
+            'dice.throw("4d6kh3")')
+        assert 'pyparsing' not in modules
+
+    def test_pyparsing_loaded_on_first_parse(self):
+        modules = loaded_modules('from dice_roller.DiceThrower import DiceThrower\nDiceThrower().throw("2d6")')
+        assert 'pyparsing' in modules
+
+    def test_submodule_attribute_access(self):
+        import dice_roller
+        assert dice_roller.DiceThrower.DiceThrower().throw('1d1')['total'] == '1'
+        assert 'DiceProbability' in dir(dice_roller)
+
+    def test_unknown_attribute(self):
+        import dice_roller
+        with pytest.raises(AttributeError):
+            dice_roller.NotAModule
+
+
+class TestImportBudget:
+
+    def test_thrower_import_within_budget(self):
+        # relative to pyparsing, so a slow or busy machine doesn't fail it
+        assert import_time_ratio('dice_roller.DiceThrower') < IMPORT_BUDGET_RATIO
@@ -0,0 +1,91 @@
+"""Tests for compiled RollPlans and the roller/scorer fast paths."""
+import operator
+import pickle
+from fractions import Fraction
+import pytest
+from dice_roller.DiceParser import DiceParser
+from dice_roller.DiceRoller import DiceRoller
+from dice_roller.DiceScorer import DiceScorer
+from dice_roller.RollPlan import RollPlan, compile_plan
+
+
+@pytest.fixture
+def parser():
+    return DiceParser()
+
+
+class TestCompile:
+    """compile() resolves operator strings and values once."""
+
+    def test_compile_returns_plan(self, parser):
+        plan = parser.compile('10d6+2=+3>=5f<=2xxp>=6ro=1kh5t>=20')
+        assert isinstance(plan, RollPlan)
+        assert plan.number_of_dice == 10
+        assert plan.sides == (1, 2, 3, 4, 5, 6)
+        assert plan.b.apply is operator.add and plan.b.val == 2
+        assert plan.s.compare is operator.ge and plan.s.val == 5
+        assert plan.f.compare is operator.le and plan.f.val == 2
+        assert plan.x.compound and plan.x.penetrate and plan.x.val == 6
+        assert plan.r.once and plan.r.compare is operator.eq
+        assert plan.k.val == 5 and plan.k.layer == 'high'
+        assert plan.l.val == 3
+        assert plan.t.compare is operator.ge and plan.t.val == 20
+
+    def test_absent_methods_are_none(self, parser):
+        plan = parser.compile('2d6')
+        assert plan.x is None and plan.r is None and plan.k is None and plan.t is None
+
+    def test_division_boost_is_exact(self, parser):
+        plan = parser.compile('1d6/2')
+        assert plan.b.apply(3, plan.b.val) == Fraction(3, 2)
+
+    def test_compile_plan_passes_plans_through(self, parser):
+        plan = parser.compile('2d6')
+        assert compile_plan(plan) is plan
+
+    def test_string_faces(self, parser):
+        plan = parser.compile('3d{a,b,c}')
+        assert plan.sides == ('a', 'b', 'c')
+        assert plan.types == 'str'
+        assert plan.s is None
+
+    def test_invalid_operator_rejected(self):
+        with pytest.raises(ValueError):
+            compile_plan({'s': {'operator': 'and', 'val': '1'}})
+
+
+class TestPlanProperties:
+    """Plans are immutable, hashable and picklable."""
+
+    def test_immutable(self, parser):
+        plan = parser.compile('2d6')
+        with pytest.raises(AttributeError):
+            plan.number_of_dice = 3
+
+    def test_hashable_and_equal(self, parser):
+        assert hash(parser.compile('4d6kh3')) == hash(parser.compile('4d6kh3'))
+        assert {parser.compile('4d6kh3'): 1}[parser.compile('4d6kh3')] == 1
+
+    def test_pickle_round_trip(self, parser):
+        plan = parser.compile('10d6+1>=5xx=6r<2kh3=+4t>=10')
+        assert pickle.loads(pickle.dumps(plan)) == plan
+
+
+class TestFastPaths:
+    """DiceRoller and DiceScorer take plans or dicts."""
+
+    def test_roller_accepts_plan(self, parser):
+        result = DiceRoller().roll(parser.compile('10d6r<3kh4'))
+        assert len(result['modified']) == 4
+        assert all(v >= 3 for v in result['modified'])
+
+    def test_roller_still_accepts_dict(self, parser):
+        result = DiceRoller().roll(parser.parse_input('10d6+2'))
+        assert result['modified'] == [v + 2 for v in result['natural']]
+
+    def test_scorer_plan_matches_dict(self, parser):
+        dexp = '10d6+1>=5f<=2ns6nf1=+3t>=30'
+        result = {'natural': [1, 6, 3, 4, 5, 6, 2, 1, 6, 5], 'modified': [2, 7, 4, 5, 6, 7, 3, 2, 7, 6]}
+        scorer = DiceScorer()
+        assert scorer.get_result(dexp, dict(result), parser.compile(dexp)) == \
+            scorer.get_result(dexp, dict(result), parser.parse_input(dexp))
@@ -0,0 +1,86 @@
+"""Tests for the compact RollResult and its legacy view."""
+import pickle
+from array import array
+from fractions import Fraction
+import pytest
+from dice_roller.DiceException import DiceException
+from dice_roller.DiceThrower import DiceThrower
+from dice_roller.RollResult import compact
+
+EXPRESSIONS = [
+    '3d6', '10d6>=5', '10d6+0>=5f<=2xxp>=5ro=1dl5=+4', '10d6=+10>=5t>=30f<=2x=6kh5',
+    '10d6ns=6nf=1', '1d20=+1d4', '3d{a,b,c}', '4d6=/2', '8d6x>=5kh3',
+]
+
+
+def plain(mapping):
+    """A legacy view or dict with any dice arrays turned into lists of ints/bools."""
+    return {key: list(value) if isinstance(value, (array, tuple)) else value for key, value in mapping.items()}
+
+
+class TestRollResult:
+    """RollResult keeps numbers as numbers and dice in arrays."""
+
+    def test_numeric_fields(self):
+        result = DiceThrower(rng=1).throw_result('10d6=+10>=5t>=30f<=2kh5')
+        assert isinstance(result.total, int)
+        assert isinstance(result.success, int) and isinstance(result.fail, int)
+        assert isinstance(result.passed, bool)
+        assert isinstance(result.natural, array) and result.natural.typecode == 'q'
+        assert result.nf is None and result.ns is None
+
+    def test_slotted(self):
+        result = DiceThrower(rng=1).throw_result('3d6')
+        assert not hasattr(result, '__dict__')
+        with pytest.raises(AttributeError):
+            result.extra = 1
+
+    def test_non_integer_dice_fall_back_to_tuples(self):
+        assert compact(['a', 'b']) == ('a', 'b')
+        assert compact([Fraction(1, 2), 1]) == (Fraction(1, 2), 1)
+        assert compact([1, 2]) == array('q', [1, 2])
+
+    def test_bad_expression_raises(self):
+        with pytest.raises(DiceException):
+            DiceThrower().throw_result('nonsense')
+
+    def test_picklable(self):
+        result = DiceThrower(rng=1).throw_result('10d6x>=5kh3=+1d4')
+        assert pickle.loads(pickle.dumps(result)) == result
+
+
+class TestLegacyView:
+    """as_dict() matches what throw() returns, without copying."""
+
+    @pytest.mark.parametrize('expression', EXPRESSIONS)
+    def test_matches_throw(self, expression):
+        legacy = DiceThrower(rng=5).throw(expression)
+        view = DiceThrower(rng=5).throw_result(expression).as_dict()
+        assert plain(view) == plain(legacy)
+        assert list(view) == list(legacy)
+
+    def test_view_shares_arrays(self):
+        result = DiceThrower(rng=1).throw_result('10d6')
+        view = result.as_dict()
+        assert view['natural'] is result.natural
+        assert view['total'] == str(result.total)
+
+    def test_kept_flags_are_bools(self):
+        expression = '4d6kh3'
+        legacy = DiceThrower(rng=1).throw(expression)
+        view = DiceThrower(rng=1).throw_result(expression).as_dict()
+        assert view['kept'] == legacy['kept']
+        assert all(type(flag) is bool for flag in view['kept'])
+
+    def test_division_total_is_truncated(self):
+        result = DiceThrower(rng=1).throw_result('3d6=/2')
+        assert isinstance(result.total, int)
+        assert result.total == int(sum(result.modified))
+
+    def test_absent_keys(self):
+        view = DiceThrower(rng=1).throw_result('3d6').as_dict()
+        assert 'fail' not in view and 'pass' not in view
+        with pytest.raises(KeyError):
+            view['pass']
+        assert view.get('fail') is None
+        assert len(view) == len(list(view))
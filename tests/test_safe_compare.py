@@ -0,0 +1,65 @@
+"""Tests for the safe comparison and arithmetic helpers."""
+from fractions import Fraction
+import pytest
+from dice_roller.safe_compare import (
+    ARITHMETIC_OPERATORS, COMPARISON_OPERATORS, compile_arithmetic, compile_comparison,
+    safe_arithmetic, safe_compare,
+)
+
+
+class Rational:
+    """Stand-in for a sympy Rational: numerator p, denominator q."""
+
+    def __init__(self, p, q):
+        self.p, self.q = p, q
+
+    def __float__(self):
+        return self.p / self.q
+
+
+class TestCompiled:
+    """Compiled closures agree with the two-operand functions."""
+
+    @pytest.mark.parametrize('op', sorted(COMPARISON_OPERATORS))
+    def test_comparison_matches(self, op):
+        predicate = compile_comparison(op, '3')
+        for left in (1, 3, 5, 2.5, Fraction(7, 2), '3', Rational(6, 2)):
+            assert predicate(left) == safe_compare(left, op, 3)
+        assert predicate(3) == COMPARISON_OPERATORS[op](3, 3)
+
+    @pytest.mark.parametrize('op', sorted(ARITHMETIC_OPERATORS))
+    def test_arithmetic_matches(self, op):
+        apply = compile_arithmetic(op, 4)
+        for left in (1, 10, Fraction(1, 2), '6', Rational(3, 2)):
+            assert apply(left) == safe_arithmetic(left, op, '4')
+
+    def test_division_is_exact(self):
+        half = compile_arithmetic('/', 2)
+        assert half(7) == Fraction(7, 2)
+        assert isinstance(half(8), Fraction)
+
+    def test_memoized(self):
+        assert compile_comparison('>=', 5) is compile_comparison('>=', 5)
+        assert compile_arithmetic('+', 1) is compile_arithmetic('+', 1)
+        assert compile_comparison('>=', 5) is not compile_comparison('>=', 6)
+
+    def test_operand_type_kept(self):
+        assert isinstance(compile_arithmetic('+', 1)(2), int)
+        assert isinstance(compile_arithmetic('+', 1.0)(2), float)
+
+    def test_operator_whitespace(self):
+        assert compile_comparison(' >= ', 5)(5) is True
+
+    def test_invalid_operator(self):
+        with pytest.raises(ValueError):
+            compile_comparison('=>', 5)
+        with pytest.raises(ValueError):
+            compile_arithmetic('**', 2)
+        with pytest.raises(ValueError):
+            safe_compare(1, 'and', 2)
+
+    def test_unhashable_operand(self):
+        class Unhashable(Rational):
+            __hash__ = None
+
+        assert compile_comparison('<', Unhashable(5, 2))(2) is True
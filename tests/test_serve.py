@@ -0,0 +1,182 @@
+"""Tests for the local HTTP roll service."""
+import asyncio
+import json
+import pytest
+from dice_roller.DiceProbability import DiceProbability
+from dice_roller.serve import RollService, start_server
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def request(port, path, body=None, reader_writer=None):
+    """One request; returns (status, decoded JSON body)."""
+    reader, writer = reader_writer or await asyncio.open_connection('127.0.0.1', port)
+    payload = b'' if body is None else json.dumps(body).encode()
+    method = 'GET' if body is None else 'POST'
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(payload)}\r\n\r\n'.encode()
+                 + payload)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) != b'\r\n':
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    data = json.loads(await reader.readexactly(length))
+    if reader_writer is None:
+        writer.close()
+    return status, data
+
+
+def serving(test, **options):
+    """Run test(service, port) against a server on a free port."""
+    async def main():
+        service = RollService(**options)
+        server = await start_server(service, port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await test(service, port)
+    return run(main())
+
+
+class TestEndpoints:
+    """Request handling over HTTP."""
+
+    def test_throw(self):
+        async def test(service, port):
+            status, result = await request(port, '/throw', {'expression': '4d6kh3'})
+            assert status == 200
+            assert len(result['modified']) == 3 and 3 <= int(result['total']) <= 18
+            status, result = await request(port, '/throw?expression=2d6')
+            assert status == 200 and len(result['natural']) == 2
+        serving(test)
+
+    def test_throw_count_and_list(self):
+        async def test(service, port):
+            status, results = await request(port, '/throw', {'expression': '1d6', 'count': 5})
+            assert status == 200 and len(results) == 5
+            status, results = await request(port, '/throw', {'expressions': ['1d4', '1d8', '1d4']})
+            assert [result['roll'] for result in results] == ['1d4', '1d8', '1d4']
+            status, _ = await request(port, '/throw', {'expression': '1d6', 'count': 10 ** 6})
+            assert status == 400
+        serving(test)
+
+    def test_throw_string(self):
+        async def test(service, port):
+            status, result = await request(port, '/throw_string', {'equation': '(1d6 + 2) * 2'})
+            assert status == 200
+            assert result['total'] == (result['terms'][0]['total'] + 2) * 2
+        serving(test)
+
+    def test_errors(self):
+        async def test(service, port):
+            assert (await request(port, '/throw', {'expression': 'nonsense'}))[0] == 400
+            assert (await request(port, '/throw', {}))[0] == 400
+            assert (await request(port, '/nowhere'))[0] == 404
+            assert (await request(port, '/analyze', {'expression': '1d6x>=6'}))[0] == 400
+            assert (await request(port, '/health'))[1]['errors'] == 4
+        serving(test)
+
+    def test_keep_alive(self):
+        async def test(service, port):
+            connection = await asyncio.open_connection('127.0.0.1', port)
+            for _ in range(3):
+                assert (await request(port, '/throw?expression=1d20', reader_writer=connection))[0] == 200
+            connection[1].close()
+        serving(test)
+
+    def test_health_and_latency(self):
+        async def test(service, port):
+            await request(port, '/throw', {'expression': '1d6'})
+            status, health = await request(port, '/health')
+            assert status == 200 and health['status'] == 'ok'
+            assert 'parse_cache' in health
+            status, latency = await request(port, '/latency')
+            assert latency['/throw']['count'] == 1
+            assert latency['/throw']['p99_ms'] >= latency['/throw']['p50_ms']
+        serving(test)
+
+
+class TestBatchingAndCoalescing:
+    """Throws are batched; identical analyses share one computation."""
+
+    def test_concurrent_throws_batched(self):
+        async def test(service, port):
+            replies = await asyncio.gather(*(request(port, '/throw', {'expression': dexp})
+                                             for dexp in ['3d6', '1d20', 'nonsense'] * 20))
+            assert [status for status, _ in replies] == [200, 200, 400] * 20
+            assert service.counters['batched_throws'] == 60
+            assert service.counters['batches'] < 60
+        serving(test, batch_window=0.02)
+
+    def test_bad_throw_batched_with_good(self):
+        async def test(service, port):
+            replies = await asyncio.gather(
+                request(port, '/throw', {'expression': ['1d6']}),
+                request(port, '/throw', {'expression': '1d6/0'}),
+                request(port, '/throw', {'expression': '2d6'}),
+                request(port, '/throw', {'expressions': ['1d6', ['1d6']]}),
+            )
+            assert [status for status, _ in replies] == [400, 400, 200, 400]
+            assert len(replies[2][1]['natural']) == 2
+        serving(test, batch_window=0.02)
+
+    def test_flush_never_leaves_requests_waiting(self):
+        async def test(service, port):
+            def broken(*args, **kwargs):
+                raise RuntimeError('broken')
+            service.thrower.throw_each = broken
+            status, reply = await request(port, '/throw', {'expression': '1d6'})
+            assert status == 500 and 'broken' in reply['error']
+        serving(test)
+
+    def test_large_counts_leave_the_loop(self):
+        heavy = []
+
+        async def test(service, port):
+            run_heavy = service.dice.run_heavy
+
+            async def spy(func, *args):
+                heavy.append(func.__name__)
+                return await run_heavy(func, *args)
+
+            service.dice.run_heavy = spy
+            status, results = await request(port, '/throw', {'expression': '1d6', 'count': 10})
+            assert status == 200 and len(results) == 10 and heavy == []
+            status, results = await request(port, '/throw', {'expression': '20d6x>=6', 'count': 500})
+            assert status == 200 and len(results) == 500
+            status, results = await request(port, '/throw', {'expressions': ['20d6x>=6'] * 200})
+            assert status == 200 and len(results) == 200
+            assert heavy == ['_throw_many', '_throw_all']
+        serving(test)
+
+    def test_identical_analyses_coalesced(self):
+        calls = []
+
+        async def test(service, port):
+            analyze = service.dice.aanalyze
+
+            async def slow_analyze(dexp):
+                calls.append(dexp)
+                await asyncio.sleep(0.05)
+                return await analyze(dexp)
+
+            service.dice.aanalyze = slow_analyze
+            replies = await asyncio.gather(*(request(port, '/analyze', {'expression': '3d6'}) for _ in range(8)))
+            assert all(stats['mean'] == pytest.approx(10.5) for _, stats in replies)
+            assert calls == ['3d6']
+            assert service.counters['coalesced'] == 7
+            await request(port, '/analyze', {'expression': '3d6'})
+            assert calls == ['3d6'] and service.counters['result_hits'] == 1
+        serving(test)
+
+    def test_seeded_monte_carlo(self):
+        async def test(service, port):
+            status, stats = await request(port, '/monte_carlo', {'expression': '3d6x>=6', 'samples': 3000, 'seed': 8})
+            assert status == 200 and stats['seed'] == 8
+            return stats
+        stats = serving(test)
+        expected = DiceProbability().monte_carlo('3d6x>=6', samples=3000, seed=8)
+        assert stats['mean'] == pytest.approx(expected['mean'])
@@ -0,0 +1,145 @@
+"""Stress tests for sharing one DiceThrower between threads."""
+import os
+import random
+import sys
+import sysconfig
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from dice_roller.DiceParser import DiceParser, ParseCache
+from dice_roller.DiceRandom import PerThreadRandom
+from dice_roller.DiceThrower import DiceThrower
+
+EXPRESSIONS = ['1d20', '4d6kh3', '10d6>=5f<=1', '20d10x>=10kh5', '1d20=+1d4', '3d6r<=2', '8d6xx>=6',
+               '6d6kh1d4', '5d8+1d2', '2d{a,b,c}', '10d10>=8=+2>=3']
+
+FREE_THREADED = bool(sysconfig.get_config_var('Py_GIL_DISABLED')) and not sys._is_gil_enabled()
+
+
+def run_threads(count, target):
+    """Start count threads on target(index) together and re-raise the first error."""
+    errors = []
+    barrier = threading.Barrier(count)
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+@pytest.fixture(params=['pyparsing', 'native'])
+def shared(request):
+    # no parse cache, so every throw exercises the parser concurrently
+    return DiceThrower(rng=PerThreadRandom()), request.param
+
+
+def uncached(thrower, engine):
+    thrower.parser = DiceParser(cache=ParseCache(maxsize=0), engine=engine, limits=thrower.limits)
+    return thrower
+
+
+def jobs(count):
+    return [(EXPRESSIONS[i % len(EXPRESSIONS)], i) for i in range(count)]
+
+
+class TestSharedThrower:
+    """One thrower used by many threads gives the same results as one thread."""
+
+    def test_per_call_rng_matches_serial(self, shared):
+        thrower = uncached(*shared)
+        work = jobs(800)
+        expected = [thrower.throw_result(dexp, rng=seed) for dexp, seed in work]
+        results = [None] * len(work)
+
+        def worker(index):
+            for i in range(index, len(work), 8):
+                dexp, seed = work[i]
+                results[i] = thrower.throw_result(dexp, rng=seed)
+
+        run_threads(8, worker)
+        assert results == expected
+
+    def test_subrolls_stay_with_their_throw(self, shared):
+        thrower = uncached(*shared)
+
+        def worker(index):
+            for _ in range(300):
+                result = thrower.throw('6d6kh1d4')
+                assert len(result['modified']) == result['subrolls'][0]['result']
+                result = thrower.throw('2d6=+1d20')
+                assert int(result['total']) == sum(result['modified']) + result['subrolls'][0]['result']
+
+        run_threads(8, worker)
+
+    def test_batch_and_string_throws(self, shared):
+        thrower = uncached(*shared)
+        batch = thrower.throw_all(EXPRESSIONS, rng=1)
+        total, _ = thrower.throw_string('2d6 + 1d4 * 3', rng=2)
+
+        def worker(index):
+            for _ in range(50):
+                assert thrower.throw_all(EXPRESSIONS, rng=1).as_dicts() == batch.as_dicts()
+                assert thrower.throw_string('2d6 + 1d4 * 3', rng=2)[0] == total
+
+        run_threads(8, worker)
+
+    def test_first_grammar_build_races(self, monkeypatch):
+        import dice_roller.DiceParser as DiceParser_module
+        monkeypatch.setattr(DiceParser_module, '_grammar_cache', {})
+        parser = DiceParser(cache=ParseCache(maxsize=0))
+        expected = parser.parse_input('10d6x>=5kh3')
+        monkeypatch.setattr(DiceParser_module, '_grammar_cache', {})
+
+        def worker(index):
+            for _ in range(20):
+                assert parser.parse_input('10d6x>=5kh3') == expected
+
+        run_threads(8, worker)
+
+    def test_per_thread_streams_are_separate(self):
+        rng = PerThreadRandom(lambda: random.Random(5))
+        thrower = DiceThrower(rng=rng)
+        totals = {}
+
+        def worker(index):
+            totals[index] = thrower.throw_many('3d6', 200).column('total')
+
+        run_threads(4, worker)
+        # every thread starts its own Random(5), untouched by the others
+        assert all(values == totals[0] for values in totals.values())
+
+
+@pytest.mark.skipif(not FREE_THREADED, reason='needs a free-threaded (GIL disabled) CPython build')
+class TestFreeThreaded:
+    """Without the GIL, threads really do run throws at the same time."""
+
+    def test_correct_without_gil(self):
+        thrower = DiceThrower(rng=PerThreadRandom())
+        work = jobs(4000)
+        expected = [thrower.throw_result(dexp, rng=seed) for dexp, seed in work]
+        with ThreadPoolExecutor(16) as pool:
+            results = list(pool.map(lambda job: thrower.throw_result(job[0], rng=job[1]), work))
+        assert results == expected
+
+    @pytest.mark.skipif((os.cpu_count() or 1) < 4, reason='needs at least 4 cores')
+    def test_scales_across_cores(self):
+        thrower = DiceThrower(rng=PerThreadRandom())
+        thrower.throw_many('20d10x>=10kh5', 10)
+
+        def seconds(threads):
+            start = time.perf_counter()
+            run_threads(threads, lambda index: thrower.throw_many('20d10x>=10kh5', 20_000 // threads))
+            return time.perf_counter() - start
+
+        assert seconds(1) / seconds(4) > 1.5